@@ -9,10 +9,13 @@ Auto Yad2 MCP - סקריפט אוטומטי להפעלת שירות Yad2 MCP
 
 import os
 import sys
-import json
 import time
-import subprocess
+import heapq
+import random
 from datetime import datetime
+from yad2_server import get_client
+from yad2_config import get_config_manager
+from yad2_deadline import settings as deadline_settings
 
 def ensure_path():
     """וידוא שהסקריפט רץ מתוך תיקיית הפרויקט"""
@@ -26,24 +29,18 @@ def ensure_path():
 
 def ensure_config():
     """וידוא שקיים קובץ תצורה והוא תקין"""
-    if not os.path.exists('config.json'):
+    manager = get_config_manager()
+    if not manager.exists():
         print("קובץ config.json לא נמצא. מייצר קובץ ברירת מחדל...")
-        subprocess.run(['python', 'yad2_scraper.py', 'help'], check=True)
+        get_client().call('help')
     
     # בדיקה שקובץ התצורה תקין
     try:
-        with open('config.json', 'r', encoding='utf-8') as f:
-            config = json.load(f)
-        
-        # הפעלת מצב סריקה אוטומטית
-        config['auto_scan'] = True
-        
-        # שמירת ההגדרות המעודכנות
-        with open('config.json', 'w', encoding='utf-8') as f:
-            json.dump(config, f, ensure_ascii=False, indent=2)
+        # הפעלת מצב סריקה אוטומטית (כתיבה אטומית, תחת נעילה, רק אם השתנה)
+        manager.update(lambda config: config.__setitem__('auto_scan', True))
         
         print("קובץ תצורה תקין ומוכן לפעולה")
-        return config
+        return manager.get()
     
     except Exception as e:
         print(f"שגיאה בקובץ התצורה: {e}")
@@ -51,10 +48,14 @@ def ensure_config():
 
 def add_default_projects():
     """הוספת נושאים ברירת מחדל אם אין נושאים מוגדרים"""
-    with open('config.json', 'r', encoding='utf-8') as f:
-        config = json.load(f)
+    if get_config_manager().get().get('projects'):
+        return
     
-    if not config.get('projects'):
+    def add_defaults(config):
+        # ייתכן שתהליך אחר הוסיף נושאים בינתיים
+        if config.get('projects'):
+            return False
+        
         print("אין נושאים מוגדרים. מוסיף נושאים ברירת מחדל...")
         
         default_projects = [
@@ -76,10 +77,9 @@ def add_default_projects():
         ]
         
         config['projects'] = default_projects
-        
-        with open('config.json', 'w', encoding='utf-8') as f:
-            json.dump(config, f, ensure_ascii=False, indent=2)
-        
+        return True
+    
+    if get_config_manager().update(add_defaults):
         print("נוספו נושאים ברירת מחדל")
 
 def run_scans():
@@ -87,45 +87,173 @@ def run_scans():
     try:
         print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] מתחיל סריקה אוטומטית של כל הנושאים")
         
-        # הרצת הסקריפט במצב auto
-        result = subprocess.run(['python', 'yad2_scraper.py', 'auto'],
-                              stdout=subprocess.PIPE,
-                              stderr=subprocess.PIPE,
-                              encoding='utf-8')
+        # הרצת הסריקה בשרת ה-MCP התושב (נשאר פעיל בין הסריקות), עם זמן המתנה מרבי לתשובה
+        timeout = deadline_settings(get_config_manager().get())['client_seconds']
+        result = get_client().call('auto', timeout=timeout)
         
         # הדפסת התוצאות
-        print(result.stdout)
-        
-        if result.stderr:
-            print(f"שגיאות:\n{result.stderr}")
+        print(result)
         
-        return result.returncode == 0
+        return True
     
     except Exception as e:
         print(f"שגיאה בהרצת הסריקה: {e}")
         return False
 
+class ProjectScheduler:
+    """מתזמן לכל נושא בנפרד, עם תור עדיפויות לפי זמן הסריקה הבא
+    
+    מרווח הסריקה של כל נושא מותאם לקצב המודעות החדשות שנצפה בו (ממוצע נע),
+    בין מרווח מינימלי למרווחי מרבי ועם רעש אקראי. זמני הסריקה מעוגנים לשעון:
+    הסריקה הבאה נקבעת מזמן הסריקה המתוכנן הקודם ולא מסוף הסריקה, כך שסבב איטי
+    לא דוחה את כל הסבבים שאחריו.
+    """
+    
+    def __init__(self, config):
+        scheduler_config = config.get('scheduler', {})
+        base_minutes = config.get('check_interval_minutes', 15)
+        
+        self.base_interval = base_minutes * 60
+        self.min_interval = scheduler_config.get('min_interval_minutes', max(1, base_minutes / 3)) * 60
+        self.max_interval = scheduler_config.get('max_interval_minutes', base_minutes * 8) * 60
+        self.target_new_per_scan = scheduler_config.get('target_new_per_scan', 1.0)
+        self.smoothing = scheduler_config.get('rate_smoothing', 0.3)
+        self.jitter = scheduler_config.get('jitter', 0.1)
+        
+        self._queue = []      # (זמן סריקה, מספר סידורי, נושא)
+        self._state = {}      # נושא -> מצב התזמון שלו
+        self._counter = 0
+    
+    def sync(self, topics, now=None):
+        """עדכון רשימת הנושאים: נושא חדש נסרק מיד, נושא שהוסר יוצא מהתור"""
+        now = now if now is not None else time.time()
+        topics = set(topics)
+        
+        for topic in topics - set(self._state):
+            self._state[topic] = {'anchor': now, 'interval': self.base_interval, 'rate': None, 'last_scan': None}
+            self._push(topic, now)
+        
+        for topic in set(self._state) - topics:
+            del self._state[topic]
+        self._queue = [entry for entry in self._queue if entry[2] in topics]
+        heapq.heapify(self._queue)
+    
+    def _push(self, topic, due):
+        """הכנסת נושא לתור"""
+        self._counter += 1
+        heapq.heappush(self._queue, (due, self._counter, topic))
+    
+    def next_due(self):
+        """זמן הסריקה הקרובה, או None אם אין נושאים"""
+        return self._queue[0][0] if self._queue else None
+    
+    def pop_due(self, now=None):
+        """הוצאת כל הנושאים שהגיע זמנם"""
+        now = now if now is not None else time.time()
+        due_topics = []
+        while self._queue and self._queue[0][0] <= now:
+            due_topics.append(heapq.heappop(self._queue)[2])
+        return due_topics
+    
+    def record_scan(self, topic, new_items, ok=True, now=None, timed_out=False):
+        """עדכון קצב המודעות של נושא אחרי סריקה וקביעת הסריקה הבאה שלו
+        
+        נושא שהסריקה שלו חרגה מהזמן מצטרף לסבב הקרוב של הנושאים האחרים (ובשרת נסרק ראשון).
+        """
+        now = now if now is not None else time.time()
+        state = self._state.get(topic)
+        if state is None:
+            return
+        
+        # קצב מודעות חדשות לשנייה, ממוצע נע אקספוננציאלי
+        if ok and state['last_scan'] is not None:
+            elapsed = max(now - state['last_scan'], 1.0)
+            observed = new_items / elapsed
+            rate = state['rate']
+            state['rate'] = observed if rate is None else self.smoothing * observed + (1 - self.smoothing) * rate
+        if ok:
+            state['last_scan'] = now
+        
+        # מרווח שבו צפויות target_new_per_scan מודעות חדשות בכל סריקה
+        if state['rate'] is None:
+            interval = self.base_interval
+        elif state['rate'] <= 0:
+            interval = self.max_interval
+        else:
+            interval = self.target_new_per_scan / state['rate']
+        state['interval'] = min(max(interval, self.min_interval), self.max_interval)
+        
+        # עיגון לשעון: הסריקה הבאה מחושבת מהזמן המתוכנן הקודם; סבבים שהוחמצו מדולגים
+        anchor = state['anchor'] + state['interval']
+        if anchor < now:
+            anchor = now
+        state['anchor'] = anchor
+        
+        jitter = random.uniform(-self.jitter, self.jitter) * state['interval']
+        due = max(anchor + jitter, now)
+        if timed_out and self._queue:
+            due = min(due, self.next_due())
+        self._push(topic, due)
+    
+    def interval_minutes(self, topic):
+        """המרווח הנוכחי של נושא, בדקות"""
+        return self._state[topic]['interval'] / 60
+
+def load_active_topics():
+    """רשימת הנושאים הפעילים מקובץ התצורה (נקרא מחדש רק אם הקובץ השתנה)"""
+    config = get_config_manager().get()
+    
+    topics = [project.get('topic', '').strip() for project in config.get('projects', []) if not project.get('disabled', False)]
+    return config, [topic for topic in topics if topic]
+
 def run_continuously():
-    """הרצת סריקה באופן מחזורי"""
-    # טעינת הגדרות
-    with open('config.json', 'r', encoding='utf-8') as f:
-        config = json.load(f)
+    """הרצת סריקה באופן מחזורי, עם מרווח סריקה מותאם לכל נושא"""
+    config, topics = load_active_topics()
+    scheduler = ProjectScheduler(config)
     
-    # קבלת זמן ההמתנה בין סריקות
-    interval_minutes = config.get('check_interval_minutes', 15)
-    interval_seconds = interval_minutes * 60
+    print(f"מתחיל הרצה מחזורית. מרווח התחלתי: {config.get('check_interval_minutes', 15)} דקות, "
+          f"מותאם לכל נושא לפי קצב המודעות החדשות")
     
-    print(f"מתחיל הרצה מחזורית. סריקה תתבצע כל {interval_minutes} דקות")
+    announced_due = None
     
     try:
         while True:
-            success = run_scans()
+            # קליטת נושאים שנוספו או הוסרו מאז הסבב הקודם
+            config, topics = load_active_topics()
+            scheduler.sync(topics)
+            
+            due_topics = scheduler.pop_due()
+            if due_topics:
+                print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] סורק {len(due_topics)} נושאים")
+                try:
+                    timeout = deadline_settings(config)['client_seconds']
+                    summary = get_client().request('scan_topics', {'topics': due_topics}, timeout)
+                    print(summary['text'])
+                    results = {result['topic']: result for result in summary['results']}
+                except Exception as e:
+                    print(f"שגיאה בהרצת הסריקה: {e}")
+                    results = {}
+                
+                for topic in due_topics:
+                    result = results.get(topic, {'new_items': 0, 'ok': False})
+                    scheduler.record_scan(topic, result['new_items'], result['ok'],
+                                          timed_out=result.get('timed_out', False))
+                    print(f"  {topic}: {result['new_items']} חדשות, "
+                          f"סריקה הבאה בעוד {scheduler.interval_minutes(topic):.1f} דקות")
             
-            next_run = datetime.now().timestamp() + interval_seconds
-            formatted_time = datetime.fromtimestamp(next_run).strftime('%H:%M:%S')
-            print(f"\nהסריקה הבאה תהיה בשעה {formatted_time}")
+            next_due = scheduler.next_due()
+            if next_due is None:
+                time.sleep(60)
+                continue
             
-            time.sleep(interval_seconds)
+            if next_due > time.time():
+                if next_due != announced_due:
+                    announced_due = next_due
+                    formatted_time = datetime.fromtimestamp(next_due).strftime('%H:%M:%S')
+                    print(f"\nהסריקה הבאה תהיה בשעה {formatted_time}")
+                
+                # שינה עד הסריקה הבאה, עם בדיקת קובץ התצורה לפחות פעם בדקה
+                time.sleep(min(max(next_due - time.time(), 0), 60))
     
     except KeyboardInterrupt:
         print("\nהריצה המחזורית הופסקה ידנית")
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מדידת קצב החילוץ (מודעות לשנייה) של כל מנועי החילוץ הזמינים
+
+שימוש:
+    python benchmarks/bench_parsers.py [עמודים שמורים...] [--repeat N]
+
+ללא עמודים - נמדדים כל קבצי ה-HTML שבתיקייה benchmarks/fixtures.
+לפני המדידה נבדק שכל מנוע מחזיר בדיוק את אותן מודעות כמו html.parser.
+הנתיב המהיר next_data (JSON מוטמע, עם מעבר למנוע HTML בעמוד ללא JSON) נבדק
+לפי המזהה והשדות שבגיבוב - התאריך היחסי והשדות הנוספים שלו שונים מה-HTML.
+
+עם --workers נמדד גם מאגר תהליכי החילוץ: כל העמודים (כפול החזרות) נשלחים
+במקביל, כמו בסבב מלא של נושאים ועמודים רבים, עם 1, 2, 4... תהליכי עבודה.
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yad2_parsers import PARSERS, available_parsers, is_captcha_page, next_data_items, get_parser
+from yad2_listing import fields_hash
+from yad2_parse_pool import ParsePool
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def load_pages(paths):
+    """קריאת עמודי הפיד השמורים (דפי CAPTCHA לא נמדדים)"""
+    pages = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            html_content = f.read()
+        if not is_captcha_page(html_content):
+            pages.append((os.path.basename(path), html_content))
+    return pages
+
+def bench_parser(parse, pages, repeat):
+    """הרצת מנוע על כל העמודים repeat פעמים - החזרת (מודעות, שניות)"""
+    total_items = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, html_content in pages:
+            total_items += sum(1 for _ in parse(html_content))
+    return total_items, time.perf_counter() - start
+
+def bench_pool(workers, pages, repeat, parser):
+    """חילוץ כל העמודים במקביל דרך מאגר התהליכים - החזרת (מודעות, שניות)"""
+    pool = ParsePool(workers, 0)
+    jobs = [html_content for _ in range(repeat) for _, html_content in pages]
+    try:
+        # חימום - הפעלת תהליכי העבודה וייבוא המנועים בהם
+        with ThreadPoolExecutor(max_workers=workers) as threads:
+            list(threads.map(lambda html_content: pool.parse(html_content, parser), jobs[:workers]))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers * 2) as threads:
+            total_items = sum(len(items) for items in threads.map(lambda html_content: pool.parse(html_content, parser), jobs))
+        return total_items, time.perf_counter() - start
+    finally:
+        pool.shutdown()
+
+def _summary(items):
+    """המזהה וגיבוב השדות של כל מודעה - להשוואה בין הנתיב המהיר למנועי ה-HTML"""
+    return [(item.id, fields_hash(item)) for item in items]
+
+def main():
+    """נקודת הכניסה הראשית"""
+    parser = argparse.ArgumentParser(description='מדידת קצב החילוץ של מנועי החילוץ')
+    parser.add_argument('pages', nargs='*', help='קבצי HTML של עמודי פיד שמורים')
+    parser.add_argument('--repeat', type=int, default=20, help='מספר החזרות על כל העמודים')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='מדידת מאגר תהליכי החילוץ עד מספר תהליכים זה (0 - ללא מדידה)')
+    parser.add_argument('--parser', default='html.parser', help='מנוע החילוץ במדידת מאגר התהליכים')
+    args = parser.parse_args()
+
+    paths = args.pages or sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html')))
+    pages = load_pages(paths)
+    if not pages:
+        print("לא נמצאו עמודי פיד למדידה.")
+        return 1
+
+    # בדיקת זהות התוצאות מול מנוע הגיבוי
+    reference = {name: list(PARSERS['html.parser'][0](html_content)) for name, html_content in pages}
+    for backend in available_parsers():
+        for name, html_content in pages:
+            if list(PARSERS[backend][0](html_content)) != reference[name]:
+                print(f"אזהרה: המנוע {backend} מחזיר תוצאה שונה בעמוד {name}")
+
+    structured = [name for name, html_content in pages if next_data_items(html_content) is not None]
+    fast_path = get_parser('next_data')
+    for name, html_content in pages:
+        if _summary(fast_path(html_content)) != _summary(reference[name]):
+            print(f"אזהרה: הנתיב next_data מחזיר תוצאה שונה בעמוד {name}")
+
+    print(f"{len(pages)} עמודים, {sum(len(items) for items in reference.values())} מודעות, {args.repeat} חזרות")
+    print(f"עמודים עם JSON מוטמע (__NEXT_DATA__): {', '.join(structured) or 'אין'}")
+    print(f"{'מנוע':<14}{'מודעות/שנייה':>16}{'פי':>8}")
+
+    engines = [(backend, PARSERS[backend][0]) for backend in reversed(available_parsers())]
+    engines.append(('next_data', fast_path))
+
+    baseline_rate = None
+    for backend, parse in engines:
+        total_items, elapsed = bench_parser(parse, pages, args.repeat)
+        rate = total_items / elapsed if elapsed else 0.0
+        baseline_rate = baseline_rate or rate
+        print(f"{backend:<14}{rate:>16,.0f}{rate / baseline_rate:>8.1f}")
+
+    if args.workers > 0:
+        print(f"\nמאגר תהליכי חילוץ (מנוע {args.parser}, {os.cpu_count()} ליבות):")
+        print(f"{'תהליכים':<14}{'מודעות/שנייה':>16}{'פי':>8}")
+        total_items, elapsed = bench_parser(get_parser(args.parser), pages, args.repeat)
+        baseline_rate = total_items / elapsed if elapsed else 0.0
+        print(f"{'ללא מאגר':<14}{baseline_rate:>16,.0f}{1.0:>8.1f}")
+
+        workers = 1
+        while workers <= args.workers:
+            total_items, elapsed = bench_pool(workers, pages, args.repeat, args.parser)
+            rate = total_items / elapsed if elapsed else 0.0
+            print(f"{workers:<14}{rate:>16,.0f}{rate / baseline_rate:>8.1f}")
+            workers = workers * 2 if workers * 2 <= args.workers or workers == args.workers else args.workers
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מדידת ביצועים מקצה לקצה של צינור הסריקה
+
+העמודים המוקלטים שב-benchmarks/fixtures מוגשים משרת מקומי עם השהיה מוגדרת,
+והשלבים הבאים נמדדים, כל אחד בתהליך נפרד (כדי למדוד את שיא ה-RSS שלו):
+
+- check_for_new_items  - מול היסטוריה סינתטית של 1k/10k/100k מודעות
+- scrape_project       - עמוד פיד, דף CAPTCHA ועמוד ריק
+- run_all_scans        - סבב מלא של כמה פרויקטים
+
+לכל שלב מדווחים קצב (מודעות לשנייה), זמני השהיה p50/p99 ושיא RSS.
+התוצאות נשמרות כ-JSON כדי שניתן יהיה להשוות בין הרצות.
+
+שימוש:
+    python benchmarks/bench_scan.py [--output results.json] [--compare previous.json]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import zlib
+import shutil
+import platform
+import argparse
+import tempfile
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+FEED_FIXTURE = 'feed_forsale_tel_aviv'
+PAGE_SIZE = 40
+
+def percentile(values, fraction):
+    """אחוזון מתוך רשימת ערכים"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[int(round(fraction * (len(ordered) - 1)))]
+
+def peak_rss_mb():
+    """שיא ה-RSS של התהליך הנוכחי (מגה-בייט), אם ניתן למדוד"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ב-macOS הערך בבתים, בלינוקס בקילובייטים
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def bench_config(data_dir, parser):
+    """הגדרות סריקה לצורך המדידה - ללא מטמון, התראות, הגבלת קצב או השהיית CAPTCHA"""
+    return {
+        'email': {'enabled': False},
+        'projects': [],
+        'data_dir': data_dir,
+        'max_concurrent_scans': 8,
+        'max_concurrent_per_host': 8,
+        'html_parser': parser,
+        'incremental_stop_after_known': 0,
+        'max_pages': 1,
+        'page_prefetch': 0,
+        'scan_cache_ttl_seconds': 0,
+        'fetch_governor': {
+            'requests_per_second': 10000,
+            'burst': 10000,
+            'max_retries': 0,
+            'captcha_cooldown_minutes': 0,
+        },
+    }
+
+def synthetic_item(item_id):
+    """מודעה סינתטית להיסטוריה. המחיר נגזר מהמזהה ב-crc32 (ולא ב-hash(), שמשתנה בין
+    תהליכים), כך שהנתונים זהים בכל הרצה ובכל תהליך מדידה"""
+    return {
+        'id': item_id,
+        'title': f"רחוב סינתטי {item_id}",
+        'price': f"{1_000_000 + (zlib.crc32(item_id.encode('utf-8')) % 9_000_000):,} ₪",
+        'address': "דירה, שכונה סינתטית, תל אביב יפו",
+        'date': "עודכן היום",
+        'image': None,
+        'link': f"https://www.yad2.co.il/item/{item_id}",
+    }
+
+def seed_history(config, topic, size):
+    """מילוי המאגר ב-size מודעות סינתטיות לנושא"""
+    from yad2_store import get_store
+
+    store = get_store(config)
+    batch = []
+    for index in range(size):
+        batch.append(synthetic_item(f"h{index}"))
+        if len(batch) == 5000:
+            store.add_new_items(topic, batch)
+            batch = []
+    if batch:
+        store.add_new_items(topic, batch)
+
+def stage_check_for_new_items(config, params):
+    """check_for_new_items על עמוד של 40 מודעות (רובן מוכרות) מול היסטוריה בגודל נתון"""
+    from yad2_scraper import check_for_new_items
+
+    topic = 'bench'
+    seed_history(config, topic, params['history'])
+
+    latencies = []
+    items_total = 0
+    for call in range(params['repeat']):
+        known = [synthetic_item(f"h{(call * 7919 + index * 104729) % params['history']}") for index in range(PAGE_SIZE - 5)]
+        fresh = [synthetic_item(f"n{call}-{index}") for index in range(5)]
+        page = fresh + known
+
+        start = time.perf_counter()
+        check_for_new_items(page, topic, config)
+        latencies.append(time.perf_counter() - start)
+        items_total += len(page)
+
+    return latencies, items_total
+
+def stage_scrape_project(config, params):
+    """scrape_project מול השרת המקומי"""
+    from yad2_scraper import scrape_project
+
+    seed_history(config, 'bench', params.get('history', 0))
+
+    latencies = []
+    items_total = 0
+    for call in range(params['repeat']):
+        url = f"{params['base_url']}{params['path']}?project={call % params.get('distinct_pages', 1)}"
+        start = time.perf_counter()
+        scrape_project({'topic': 'bench', 'url': url}, config)
+        latencies.append(time.perf_counter() - start)
+        items_total += params.get('items_per_page', 0)
+
+    return latencies, items_total
+
+def stage_run_all_scans(config, params):
+    """סבבי run_all_scans מלאים על כמה פרויקטים"""
+    from yad2_scraper import run_all_scans
+
+    config['projects'] = [
+        {'topic': f"bench-{index}", 'url': f"{params['base_url']}/feed/{FEED_FIXTURE}?project={index}"}
+        for index in range(params['projects'])
+    ]
+    for project in config['projects']:
+        seed_history(config, project['topic'], params.get('history', 0))
+
+    latencies = []
+    for _ in range(params['repeat']):
+        start = time.perf_counter()
+        run_all_scans(config)
+        latencies.append(time.perf_counter() - start)
+
+    return latencies, PAGE_SIZE * params['projects'] * params['repeat']
+
+STAGES = {
+    'check_for_new_items': stage_check_for_new_items,
+    'scrape_project': stage_scrape_project,
+    'run_all_scans': stage_run_all_scans,
+}
+
+def run_stage(name, params, parser):
+    """הרצת שלב אחד (בתהליך נפרד) והחזרת המדדים שלו"""
+    data_dir = tempfile.mkdtemp(prefix='yad2-bench-')
+    try:
+        config = bench_config(data_dir, parser)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            latencies, items_total = STAGES[name](config, params)
+            total = time.perf_counter() - start
+
+        measured = sum(latencies)
+        return {
+            'stage': name,
+            'params': {key: value for key, value in params.items() if key != 'base_url'},
+            'calls': len(latencies),
+            'items': items_total,
+            'total_seconds': round(total, 6),
+            'throughput_items_per_sec': round(items_total / measured, 2) if measured else None,
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+            'peak_rss_mb': round(peak_rss_mb(), 1) if resource else None,
+        }
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+def build_plan(args, base_url):
+    """רשימת השלבים להרצה"""
+    plan = []
+    if 'check_for_new_items' in args.stages:
+        for size in args.history_sizes:
+            plan.append(('check_for_new_items', {'history': size, 'repeat': args.repeat}))
+
+    if 'scrape_project' in args.stages:
+        pages = [
+            ('feed', f"/feed/{FEED_FIXTURE}", PAGE_SIZE),
+            ('captcha', '/captcha', 0),
+            ('empty', '/empty', 0),
+        ]
+        for page, path, items_per_page in pages:
+            plan.append(('scrape_project', {
+                'page': page, 'path': path, 'items_per_page': items_per_page,
+                'history': args.history_sizes[0], 'repeat': args.repeat,
+                'distinct_pages': args.repeat, 'base_url': base_url,
+            }))
+
+    if 'run_all_scans' in args.stages:
+        plan.append(('run_all_scans', {
+            'projects': args.projects, 'history': args.history_sizes[0],
+            'repeat': max(1, args.repeat // 5), 'base_url': base_url,
+        }))
+
+    return plan
+
+def describe(result):
+    """תיאור קצר של שלב לטבלה"""
+    params = result['params']
+    details = ', '.join(f"{key}={value}" for key, value in params.items()
+                        if key in ('history', 'page', 'projects'))
+    return f"{result['stage']} [{details}]"
+
+def compare(results, previous_path):
+    """השוואת התוצאות להרצה קודמת"""
+    with open(previous_path, 'r', encoding='utf-8') as f:
+        previous = {describe(result): result for result in json.load(f)['results']}
+
+    print(f"\nהשוואה מול {previous_path}:")
+    for result in results:
+        old = previous.get(describe(result))
+        if not old or not old.get('p50_ms') or not result.get('p50_ms'):
+            continue
+        print(f"  {describe(result):<55} p50 x{old['p50_ms'] / result['p50_ms']:.2f}  "
+              f"p99 x{old['p99_ms'] / result['p99_ms']:.2f}")
+
+def main():
+    """נקודת הכניסה הראשית"""
+    parser = argparse.ArgumentParser(description='מדידת ביצועים של צינור הסריקה')
+    parser.add_argument('--stages', nargs='+', default=list(STAGES), choices=list(STAGES))
+    parser.add_argument('--history-sizes', nargs='+', type=int, default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=20, help='מספר הקריאות לכל שלב')
+    parser.add_argument('--projects', type=int, default=20, help='מספר הפרויקטים בסבב run_all_scans')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='השהיית השרת המקומי לכל בקשה')
+    parser.add_argument('--parser', default='auto', help='מנוע החילוץ (html_parser)')
+    parser.add_argument('--output', help='קובץ JSON לשמירת התוצאות')
+    parser.add_argument('--compare', help='קובץ JSON של הרצה קודמת להשוואה')
+    args = parser.parse_args()
+
+    from stub_server import start_stub_server
+
+    server, base_url = start_stub_server(latency=args.latency_ms / 1000)
+    results = []
+    try:
+        for name, params in build_plan(args, base_url):
+            # תהליך חדש לכל שלב, כדי ששיא ה-RSS יתייחס לשלב בלבד
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                result = executor.submit(run_stage, name, params, args.parser).result()
+            results.append(result)
+            print(f"{describe(result):<55} {result['throughput_items_per_sec'] or 0:>12,.0f} מודעות/ש'  "
+                  f"p50 {result['p50_ms']:>9.2f}ms  p99 {result['p99_ms']:>9.2f}ms  "
+                  f"RSS {result['peak_rss_mb'] if result['peak_rss_mb'] is not None else '-'}MB")
+    finally:
+        server.shutdown()
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'latency_ms': args.latency_ms,
+            'parser': args.parser,
+        },
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nהתוצאות נשמרו בקובץ {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+שרת HTTP מקומי שמגיש עמודי יד2 מוקלטים, לצורך מדידות ובדיקות ללא רשת
+
+כתובות:
+    /feed/<שם>?project=K&page=N   - העמוד benchmarks/fixtures/<שם>.html
+    /captcha                      - דף CAPTCHA
+    /empty                        - עמוד ללא מודעות
+
+כדי שכל פרויקט ועמוד יקבלו מודעות משלהם, מזהי המודעות בעמוד מקבלים
+סיומת לפי project ו-page (אם הועברו).
+
+שימוש:
+    python benchmarks/stub_server.py [--port 8765] [--latency-ms 50]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+_ITEM_ID_RE = re.compile(r'((?:data-)?item-id=")([^"]+)(")')
+
+def load_fixtures(fixtures_dir=FIXTURES_DIR):
+    """קריאת כל עמודי ה-HTML המוקלטים לפי שם הקובץ (ללא סיומת)"""
+    fixtures = {}
+    for name in os.listdir(fixtures_dir):
+        if name.endswith('.html'):
+            with open(os.path.join(fixtures_dir, name), 'r', encoding='utf-8') as f:
+                fixtures[name[:-5]] = f.read()
+    return fixtures
+
+def make_handler(fixtures, latency):
+    """מחלקת טיפול בבקשות עם העמודים והשהיה נתונים"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            query = parse_qs(parts.query)
+
+            if latency:
+                time.sleep(latency)
+
+            segments = [segment for segment in parts.path.split('/') if segment]
+            if segments[:1] == ['feed'] and len(segments) == 2:
+                name = segments[1]
+            elif segments in (['captcha'], ['empty']):
+                name = segments[0]
+            else:
+                name = None
+
+            if name not in fixtures:
+                self._send(404, b'not found')
+                return
+
+            html_content = fixtures[name]
+            suffix = ''.join(f"-{key[0]}{query[key][0]}" for key in ('project', 'page') if key in query)
+            if suffix:
+                html_content = _ITEM_ID_RE.sub(lambda m: m.group(1) + m.group(2) + suffix + m.group(3), html_content)
+
+            self._send(200, html_content.encode('utf-8'))
+
+        def _send(self, status, body):
+            self.send_response(status)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+def start_stub_server(port=0, latency=0.0, fixtures_dir=FIXTURES_DIR):
+    """הפעלת השרת בתהליכון רקע. מחזיר (שרת, כתובת בסיס)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(load_fixtures(fixtures_dir), latency))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='yad2-stub', daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main():
+    """נקודת הכניסה הראשית"""
+    parser = argparse.ArgumentParser(description='שרת מקומי לעמודי יד2 מוקלטים')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='השהיה לכל בקשה (מילישניות)')
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.port, args.latency_ms / 1000)
+    print(f"השרת פועל בכתובת {base_url} (Ctrl+C לעצירה)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,8 +8,8 @@
 
 import sys
 import os
-import subprocess
 import shlex
+from yad2_server import get_client
 
 def parse_mcp_command(message):
     """ניתוח פקודת MCP מתוך הודעה של המשתמש"""
@@ -63,38 +63,32 @@ def parse_mcp_command(message):
     
     # טיפול בפקודת scan עם נושא אופציונלי
     elif cmd == "scan":
+        # דגל --fresh - סריקה מחדש גם אם יש תוצאה שמורה במטמון
+        flags = []
+        if args_str.startswith("--fresh"):
+            flags = ["--fresh"]
+            args_str = args_str[len("--fresh"):].strip()
+            if not args_str:
+                return "scan", flags
+        
         # אם יש מרכאות, נחלץ את הנושא מתוכן
         if args_str.startswith('"'):
             topic_end = args_str.find('"', 1)
             if topic_end > 0:
                 topic = args_str[1:topic_end]
-                return "scan", [topic]
+                return "scan", flags + [topic]
         
         # אחרת נשתמש בארגומנט כמות שהוא
-        return "scan", [args_str]
+        return "scan", flags + [args_str]
     
-    # פקודות אחרות
+    # פקודות אחרות - שורת הארגומנטים נשלחת כמו שהיא ומפוצלת פעם אחת בשרת
     else:
-        return cmd, [args_str]
+        return cmd, args_str
 
 def execute_mcp_command(command, args=None):
-    """הרצת פקודת MCP באמצעות הסקריפט"""
+    """הרצת פקודת MCP בשרת התושב המשותף (מופעל ברקע בפעם הראשונה ונשאר פעיל בין הפקודות)"""
     try:
-        # בניית פקודה להרצה
-        cmd = ["python", "yad2_scraper.py", command]
-        
-        # הוספת ארגומנטים אם יש
-        if args:
-            cmd.extend(args)
-        
-        # הרצת הפקודה
-        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8')
-        
-        # בדיקה אם הפקודה הצליחה
-        if result.returncode == 0:
-            return result.stdout.strip()
-        else:
-            return f"שגיאה בהרצת הפקודה: {result.stderr.strip()}"
+        return get_client().call(command, args).strip()
     
     except Exception as e:
         return f"שגיאה בהרצת פקודת MCP: {str(e)}"
@@ -111,10 +105,11 @@ def handle_claude_request(message):
     result = execute_mcp_command(command, args)
     
     # החזרת התוצאה לתצוגה ב-Claude
+    shown_args = args if isinstance(args, str) else ' '.join(args or [])
     return f"""
 ## תוצאות סריקת יד2 MCP
 
-פקודה: `{command} {' '.join(args) if args else ''}`
+פקודה: `{command} {shown_args}`
 
 ```
 {result}
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+בדיקות מטמון תוצאות הסריקה - בקשה חוזרת מחזירה את התוצאה השמורה, מסומנת ככזו
+"""
+
+import pytest
+
+import yad2_scraper
+from yad2_scraper import scan_projects
+
+PROJECT = {'topic': 'דירות', 'url': 'https://www.yad2.co.il/realestate/forsale?city=5000'}
+RESULT = "סריקת נושא: דירות\nנמצאו 2 מודעות חדשות:\n1. דירת 3 חדרים\n2. דירת 4 חדרים"
+
+@pytest.fixture
+def fetches(monkeypatch):
+    fetches = []
+
+    def fake_fetch_planned(projects, indices, config):
+        if indices:
+            fetches.append(indices)
+        return [dict(projects[index], new_items=['a', 'b'], error=None, timed_out=False) for index in indices]
+
+    monkeypatch.setattr(yad2_scraper, 'fetch_planned', fake_fetch_planned)
+    monkeypatch.setattr(yad2_scraper, 'process_project', lambda scan, config: RESULT)
+    monkeypatch.setattr(yad2_scraper, 'compact_topics', lambda topics, config: None)
+    return fetches
+
+@pytest.fixture
+def config(tmp_path):
+    return {'data_dir': str(tmp_path / 'data'), 'projects': [PROJECT], 'scan_cache_ttl_seconds': 60}
+
+def test_cache_hit_returns_the_stored_result(config, fetches):
+    first = scan_projects([PROJECT], config, use_cache=True)[0]
+    second = scan_projects([PROJECT], config, use_cache=True)[0]
+
+    assert fetches == [[0]]
+    assert first['result'] == RESULT
+    assert second['cached'] and second['new_items'] == []
+    assert second['result'].startswith(RESULT + "\n\n(תוצאה שמורה מהסריקה של ")
+    assert second['result'].endswith("להרצה מחדש: scan --fresh)")
+
+def test_fresh_scan_bypasses_the_cache(config, fetches):
+    scan_projects([PROJECT], config, use_cache=True)
+    fresh = scan_projects([PROJECT], config, use_cache=True, fresh=True)[0]
+
+    assert fetches == [[0], [0]]
+    assert fresh['result'] == RESULT
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+בדיקות פירוק הארגומנטים של פקודות MCP - גם בשמות עם גרש וגרשיים (ת"א, ז'בוטינסקי)
+"""
+
+import json
+
+import pytest
+
+from yad2_archive import get_archive
+from yad2_listing import Listing
+from yad2_scraper import get_store, run_mcp_command, split_args
+
+TOPIC = "דירות למכירה בת\"א ליד ז'בוטינסקי"
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config = {'data_dir': str(tmp_path / 'data'), 'projects': [{'topic': TOPIC, 'url': 'https://www.yad2.co.il/x'}],
+              'raw_archive': {'enabled': True, 'max_age_days': 0}}
+    get_store(config).apply_scan(TOPIC, [
+        Listing.from_dict({'id': 'z1', 'title': 'דירת 3 חדרים', 'price': '2,000,000 ₪', 'address': "ז'בוטינסקי 10"}),
+    ])
+    get_store(config).apply_scan('נושא אחר', [Listing.from_dict({'id': 'o1', 'title': 'אחרת', 'price': '1 ₪'})])
+    return config
+
+def test_split_args_keeps_geresh_and_gershayim_inside_words():
+    assert split_args("ז'בוטינסקי days=7") == ["ז'בוטינסקי", 'days=7']
+    assert split_args('"דירות למכירה בת"א" days=30') == ['דירות למכירה בת"א', 'days=30']
+    assert split_args("0 topic='דירות בת\"א' limit=5") == ['0', 'topic=דירות בת"א', 'limit=5']
+    assert split_args('"לא נסגר') == ['"לא', 'נסגר']
+
+def test_search_with_geresh(config):
+    result = run_mcp_command('search', ["ז'בוטינסקי"], config=config)
+    assert "נמצאו 1 מודעות" in result
+
+def test_since_with_quoted_topic(config):
+    from_list = json.loads(run_mcp_command('since', ['0', f'topic={TOPIC}'], config=config))
+    assert [item['id'] for item in from_list['items']] == ['z1']
+
+    from_line = json.loads(run_mcp_command('since', f"0 'topic={TOPIC}'", config=config))
+    assert from_line == from_list
+
+def test_reprocess_with_gershayim_topic(config):
+    get_archive(config).record(TOPIC, 'https://www.yad2.co.il/x', '<html><body></body></html>')
+    result = run_mcp_command('reprocess', [TOPIC], config=config)
+    assert result.startswith("עובדו 1 עמודים")
+    assert f"- {TOPIC}: 0 מודעות" in result
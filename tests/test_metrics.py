@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+בדיקות המדדים (yad2_metrics) - פורמט Prometheus ותיוג השלבים לפי נושא
+"""
+
+import pytest
+
+import yad2_metrics as metrics
+
+def test_counter_renders_escaped_labels():
+    counter = metrics.Counter('test_total', 'Test counter', ('project',))
+    counter.inc(project='דירות "ת"א"')
+    counter.inc(2, project='דירות "ת"א"')
+    assert counter.render() == [
+        '# HELP test_total Test counter',
+        '# TYPE test_total counter',
+        'test_total{project="דירות \\"ת\\"א\\""} 3',
+    ]
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram('test_seconds', 'Test histogram', ('stage',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage='fetch')
+    histogram.observe(0.5, stage='fetch')
+    histogram.observe(5, stage='fetch')
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{stage="fetch",le="0.1"} 1',
+        'test_seconds_bucket{stage="fetch",le="1.0"} 2',
+        'test_seconds_bucket{stage="fetch",le="+Inf"} 3',
+        'test_seconds_sum{stage="fetch"} 5.55',
+        'test_seconds_count{stage="fetch"} 3',
+    ]
+
+def test_timed_stage_tags_the_current_project_and_counts_errors():
+    project = 'נושא-בדיקת-מדדים'
+    with metrics.project_context(project):
+        with metrics.timed_stage('parse'):
+            pass
+        with pytest.raises(ValueError), metrics.timed_stage('parse'):
+            raise ValueError('עמוד שבור')
+
+    assert metrics.STAGE_SECONDS.values()[('parse', project)][1] == 2
+    assert metrics.ERRORS.values()[('parse', project)] == 1
+    assert f'yad2_errors_total{{stage="parse",project="{project}"}} 1' in metrics.render_prometheus()
+    assert f"  {project}: " in metrics.format_stats()
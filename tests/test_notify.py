@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+בדיקות תור התראות הדוא"ל מול שרת SMTP מדומה (socket מקומי, ללא תלויות)
+"""
+
+import io
+import socket
+import threading
+
+import pytest
+
+from yad2_listing import Listing
+from yad2_notify import NotificationDispatcher
+import yad2_notify
+import yad2_server
+
+class SMTPStub:
+    """שרת SMTP מינימלי שמקבל כל הודעה ושומר את תוכנה"""
+
+    def __init__(self):
+        self.messages = []
+        self._socket = socket.socket()
+        self._socket.bind(('127.0.0.1', 0))
+        self._socket.listen()
+        self.port = self._socket.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._socket.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._session, args=(conn,), daemon=True).start()
+
+    def _session(self, conn):
+        with conn, conn.makefile('rb') as reader:
+            conn.sendall(b'220 stub\r\n')
+            for line in reader:
+                command = line.strip().upper()
+                if command.startswith(b'DATA'):
+                    conn.sendall(b'354 go ahead\r\n')
+                    data = []
+                    for data_line in reader:
+                        if data_line == b'.\r\n':
+                            break
+                        data.append(data_line)
+                    self.messages.append(b''.join(data).decode('utf-8', 'replace'))
+                    conn.sendall(b'250 queued\r\n')
+                elif command.startswith(b'QUIT'):
+                    conn.sendall(b'221 bye\r\n')
+                    return
+                else:
+                    conn.sendall(b'250 ok\r\n')
+
+    def close(self):
+        self._socket.close()
+
+@pytest.fixture
+def smtp():
+    stub = SMTPStub()
+    yield stub
+    stub.close()
+
+def email_config(port, digest=False):
+    return {
+        'enabled': True, 'smtp_server': '127.0.0.1', 'smtp_port': port, 'use_tls': False, 'use_login': False,
+        'sender_email': 'scanner@example.com', 'recipient_email': 'me@example.com', 'digest': digest,
+        'max_attempts': 2, 'retry_delay_seconds': 0,
+    }
+
+def listing(item_id):
+    return Listing.from_dict({'id': item_id, 'title': f"מודעה {item_id}", 'price': '1,000,000 ₪',
+                              'address': 'תל אביב', 'date': 'היום'})
+
+def test_enqueue_sends_after_drain(smtp):
+    dispatcher = NotificationDispatcher()
+    dispatcher.enqueue('נושא א', [listing('a1'), listing('a2')], email_config(smtp.port))
+
+    assert dispatcher.drain(10)
+    assert len(smtp.messages) == 1
+    assert 'scanner@example.com' in smtp.messages[0]
+
+def test_digest_sends_one_message_per_cycle(smtp):
+    dispatcher = NotificationDispatcher()
+    config = email_config(smtp.port, digest=True)
+    dispatcher.enqueue('נושא א', [listing('a1')], config)
+    dispatcher.enqueue('נושא ב', [listing('b1'), listing('a1')], config)
+
+    assert dispatcher.drain(10)
+    assert len(smtp.messages) == 1
+
+    dispatcher.enqueue('נושא א', [listing('a1')], config)
+    assert dispatcher.drain(10)
+    assert len(smtp.messages) == 2
+
+def test_serve_drains_queue_on_eof(smtp, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    dispatcher = NotificationDispatcher()
+    monkeypatch.setattr(yad2_notify, '_dispatcher', dispatcher)
+    dispatcher.enqueue('נושא א', [listing('a1')], email_config(smtp.port, digest=True))
+
+    yad2_server.serve(stdin=io.StringIO(''), stdout=io.StringIO())
+
+    assert len(smtp.messages) == 1
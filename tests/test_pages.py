@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+בדיקות הטעינה המוקדמת של עמודי החיפוש - עמוד 2 לא נטען לפני שעמוד 1 נבדק
+"""
+
+import threading
+
+import pytest
+
+import yad2_scraper
+from yad2_scraper import iter_project_pages
+
+URL = 'https://www.yad2.co.il/realestate/forsale?city=5000'
+
+@pytest.fixture
+def requested(monkeypatch):
+    requested = []
+    lock = threading.Lock()
+
+    def fake_fetch_page(url, config, conditional=True):
+        with lock:
+            requested.append(url)
+        return f"<html>{url}</html>"
+
+    monkeypatch.setattr(yad2_scraper, 'fetch_page', fake_fetch_page)
+    return requested
+
+def test_first_page_is_fetched_alone(requested):
+    pages = iter_project_pages(URL, {'page_prefetch': 2}, max_pages=5)
+    target, _ = next(pages)
+    pages.close()
+    assert target == URL
+    assert requested == [URL]
+
+def test_following_pages_are_fetched_once_each(requested):
+    pages = iter_project_pages(URL, {'page_prefetch': 2}, max_pages=4)
+    targets = [target for target, _ in pages]
+    assert targets == [URL] + [f"{URL}&page={n}" for n in (2, 3, 4)]
+    assert sorted(requested) == sorted(targets)
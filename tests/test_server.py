@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+בדיקות השרת התושב המשותף (serve_socket) והלקוח שלו, על פורט מקומי פנוי
+"""
+
+import os
+import json
+import time
+import socket
+import threading
+
+import pytest
+
+import yad2_server
+from yad2_server import Yad2ServerClient, serve_socket
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+@pytest.fixture
+def shared_server(tmp_path, monkeypatch):
+    """שרת משותף שרץ בתהליכון רקע, בתיקייה זמנית עם הגדרות ריקות"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'config.json').write_text(json.dumps({'projects': [], 'data_dir': 'data'}), encoding='utf-8')
+    port = free_port()
+    threading.Thread(target=serve_socket, args=(port,), daemon=True).start()
+
+    token_path = tmp_path / 'data' / yad2_server.TOKEN_FILE
+    deadline = time.monotonic() + 10
+    while not token_path.exists():
+        assert time.monotonic() < deadline, "השרת לא עלה"
+        time.sleep(0.05)
+    return port, token_path
+
+def client_for(port):
+    return Yad2ServerClient(port, log_path=os.path.join('data', yad2_server.LOG_FILE),
+                            token_path=os.path.join('data', yad2_server.TOKEN_FILE))
+
+def exchange(port, payload):
+    """שליחת בתים גולמיים לשרת וקריאת כל מה שחזר עד שהשרת סגר את החיבור"""
+    with socket.create_connection(('127.0.0.1', port), timeout=5) as conn:
+        conn.sendall(payload)
+        received = b''
+        while True:
+            chunk = conn.recv(4096)
+            if not chunk:
+                return received.decode('utf-8')
+            received += chunk
+
+def test_client_authenticates_and_runs_commands(shared_server):
+    port, _ = shared_server
+    client = client_for(port)
+    try:
+        assert "אין פרויקטים מוגדרים" in client.call('list')
+        assert "פקודות זמינות" in client.call('help')
+    finally:
+        client.close()
+
+@pytest.mark.skipif(os.name == 'nt', reason="הרשאות קבצים של POSIX")
+def test_token_file_is_private(shared_server):
+    _, token_path = shared_server
+    assert token_path.stat().st_mode & 0o777 == 0o600
+
+def test_http_request_is_rejected_and_closed(shared_server):
+    port, _ = shared_server
+    body = json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': 'list'})
+    payload = (f"POST / HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: text/plain\r\n"
+               f"Content-Length: {len(body)}\r\n\r\n{body}\n").encode('utf-8')
+
+    responses = [json.loads(line) for line in exchange(port, payload).splitlines()]
+    assert len(responses) == 1
+    assert responses[0]['error']['code'] == yad2_server.PARSE_ERROR
+
+def test_request_without_token_is_rejected(shared_server):
+    port, _ = shared_server
+    requests = [
+        {'jsonrpc': '2.0', 'id': 1, 'method': 'authenticate', 'params': {'token': 'wrong'}},
+        {'jsonrpc': '2.0', 'id': 2, 'method': 'list'},
+    ]
+    payload = ''.join(json.dumps(request) + '\n' for request in requests).encode('utf-8')
+
+    responses = [json.loads(line) for line in exchange(port, payload).splitlines()]
+    assert len(responses) == 1
+    assert responses[0]['error']['code'] == yad2_server.UNAUTHORIZED
+
+def test_timeout_closes_only_this_connection_and_runs_locally(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'config.json').write_text(json.dumps({'projects': [], 'data_dir': 'data'}), encoding='utf-8')
+    (tmp_path / 'data').mkdir()
+    (tmp_path / 'data' / yad2_server.TOKEN_FILE).write_text('secret', encoding='utf-8')
+
+    # שרת תקוע: מאשר את ההזדהות ולא עונה על הבקשה עצמה
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen()
+    closed = threading.Event()
+
+    def stuck_server():
+        conn, _ = listener.accept()
+        with conn, conn.makefile('rb') as reader:
+            request = json.loads(reader.readline())
+            conn.sendall((json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': {}}) + '\n').encode())
+            reader.readline()
+            if not conn.recv(1):
+                closed.set()
+
+    threading.Thread(target=stuck_server, daemon=True).start()
+    client = client_for(listener.getsockname()[1])
+    try:
+        assert "אין פרויקטים מוגדרים" in client.request('run', {'command': 'list'}, timeout=0.5)['text']
+        assert closed.wait(5)
+    finally:
+        client.close()
+        listener.close()
+
+def test_tool_call_marks_failures(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'config.json').write_text(json.dumps({'projects': [], 'data_dir': 'data'}), encoding='utf-8')
+    server = yad2_server.Yad2Server()
+
+    def tool_call(name, args):
+        request = {'jsonrpc': '2.0', 'id': 1, 'method': 'tools/call', 'params': {'name': name, 'arguments': {'args': args}}}
+        return server.handle(request)['result']
+
+    assert tool_call('list', [])['isError'] is False
+    assert tool_call('since', ['abc'])['isError'] is True
+    assert tool_call('no-such-command', [])['isError'] is True
+
+    def fail(command, args=None):
+        raise TimeoutError("חריגה מהזמן")
+    monkeypatch.setattr(server, 'run_command', fail)
+    result = tool_call('scan', [])
+    assert result['isError'] is True
+    assert "חריגה מהזמן" in result['content'][0]['text']
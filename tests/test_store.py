@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+בדיקות מאגר המודעות (ListingStore) - העברה להיסטוריה הדחוסה
+"""
+
+import json
+
+import pytest
+
+from yad2_listing import Listing
+from yad2_store import ListingStore
+
+def listing(item_id, price='1,000,000 ₪'):
+    return Listing.from_dict({'id': item_id, 'title': f"מודעה {item_id}", 'price': price})
+
+@pytest.fixture
+def store(tmp_path):
+    store = ListingStore(str(tmp_path / 'listings.db'))
+    yield store
+    store.close()
+
+def hot_ids(store, topic):
+    return {row[0] for row in store._conn.execute(
+        'SELECT l.item_id FROM memberships m JOIN listings l ON l.rowid = m.listing_id WHERE m.topic = ?', (topic,)
+    )}
+
+def test_compaction_keeps_max_items_when_all_share_one_timestamp(store, tmp_path):
+    legacy = tmp_path / 'legacy.json'
+    legacy.write_text(json.dumps([{'id': f"i{n}", 'title': 't', 'price': '1 ₪'} for n in range(300)]), encoding='utf-8')
+    assert store.import_legacy_json('T', str(legacy)) == 300
+
+    assert store.compact_history('T', max_items=5) == 295
+    assert hot_ids(store, 'T') == {f"i{n}" for n in range(295, 300)}
+    assert store.count('T') == 300
+
+def test_compaction_by_count_archives_exactly_the_oldest(store):
+    for n in range(250):
+        store.apply_scan('T', [listing(f"i{n}")], seen_at=1000 + n // 10)
+
+    assert store.compact_history('T', max_items=40) == 210
+    assert hot_ids(store, 'T') == {f"i{n}" for n in range(210, 250)}
+    assert store.is_known('T', listing('i0'))
+
+def test_since_cursor_does_not_skip_rows_written_during_the_read(store, tmp_path):
+    store.apply_scan('T', [listing('a'), listing('b')])
+    other = ListingStore(str(tmp_path / 'listings.db'))
+    read_sequence = store._sequence
+
+    def concurrent_write_then_sequence():
+        other.apply_scan('T', [listing('c')])
+        return read_sequence()
+
+    store._sequence = concurrent_write_then_sequence
+    seen = []
+    cursor = 0
+    for _ in range(2):
+        rows, cursor = store.since(cursor)
+        seen.extend(item['id'] for _, _, item, _ in rows)
+        store._sequence = read_sequence
+    other.close()
+    assert seen == ['a', 'b', 'c']
+    assert cursor == 3
+
+def test_since_pages_by_limit(store):
+    store.apply_scan('T', [listing(f"i{n}") for n in range(5)])
+    store.apply_scan('U', [listing('u0')])
+    seen = []
+    cursor = 0
+    while True:
+        rows, cursor = store.since(cursor, topics=['T'], limit=2)
+        if not rows:
+            break
+        seen.extend(item['id'] for _, _, item, _ in rows)
+    assert seen == [f"i{n}" for n in range(5)]
+    assert cursor == 6
+
+def test_since_keeps_compacted_and_restored_rows_at_their_seq(store):
+    for n in range(250):
+        store.apply_scan('T', [listing(f"i{n}")], seen_at=1000 + n)
+    assert store.compact_history('T', max_items=40) == 210
+
+    rows, cursor = store.since(0, limit=1000)
+    assert [(seq, item['id']) for seq, _, item, _ in rows] == [(n + 1, f"i{n}") for n in range(250)]
+    assert cursor == 250
+
+    new_items, changes = store.apply_scan('T', [listing('i7', price='900,000 ₪')], detect_changes=True)
+    assert not new_items and len(changes) == 1
+    assert 'i7' in hot_ids(store, 'T')
+    assert store.since(cursor) == ([], 250)
+
+    rows, _ = store.since(6, limit=2)
+    assert [(seq, item['id'], item['price']) for seq, _, item, _ in rows] == [(7, 'i6', '1,000,000 ₪'), (8, 'i7', '900,000 ₪')]
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ארכיון העמודים הגולמיים של Yad2 MCP
+
+כאשר raw_archive מופעל, כל עמוד שהתקבל מיד2 נשמר דחוס (gzip) בקובץ SQLite
+נפרד (data/raw_archive.db), לפי הגיבוב (SHA-256) של התוכן - עמוד זהה נשמר
+פעם אחת, וכל בקשה נרשמת עם הנושא, הכתובת והזמן. פקודת reprocess מעבירה את
+העמודים השמורים שוב דרך החילוץ וההשוואה, כך שאחרי תיקון של מנוע החילוץ
+אפשר להשלים את ההיסטוריה בלי לפנות לרשת.
+"""
+
+import os
+import gzip
+import time
+import sqlite3
+import hashlib
+import threading
+
+ARCHIVE_FILE = 'raw_archive.db'
+
+MIGRATIONS = [
+    """
+    CREATE TABLE pages (
+        sha256 TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        data BLOB NOT NULL
+    );
+    CREATE TABLE fetches (
+        id INTEGER PRIMARY KEY,
+        topic TEXT NOT NULL,
+        url TEXT NOT NULL,
+        fetched_at REAL NOT NULL,
+        sha256 TEXT NOT NULL
+    );
+    CREATE INDEX idx_fetches_time ON fetches (fetched_at);
+    CREATE INDEX idx_fetches_topic_time ON fetches (topic, fetched_at);
+    CREATE INDEX idx_fetches_sha ON fetches (sha256);
+    """,
+]
+
+# ניקוי עמודים ישנים (לפי max_age_days) לכל היותר פעם בזמן הזה
+_PRUNE_INTERVAL = 3600
+
+_archives = {}
+_archives_lock = threading.Lock()
+
+class RawArchive:
+    """עמודים גולמיים דחוסים לפי תוכן, ורישום של כל בקשה"""
+
+    def __init__(self, path, max_age_days=0):
+        self.path = path
+        self.max_age_days = max_age_days
+        self._last_prune = 0.0
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._migrate()
+
+    def _migrate(self):
+        with self._lock:
+            version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+            for index, script in enumerate(MIGRATIONS[version:], start=version + 1):
+                with self._conn:
+                    self._conn.executescript(script)
+                    self._conn.execute(f'PRAGMA user_version = {index}')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def record(self, topic, url, html_content, fetched_at=None):
+        """שמירת עמוד שהתקבל. התוכן נדחס ונשמר רק אם עמוד זהה עוד לא קיים. מחזיר את הגיבוב"""
+        data = html_content.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+
+        with self._lock:
+            exists = self._conn.execute('SELECT 1 FROM pages WHERE sha256 = ?', (digest,)).fetchone()
+        compressed = None if exists else gzip.compress(data)
+
+        with self._lock, self._conn:
+            if compressed is not None:
+                self._conn.execute(
+                    'INSERT OR IGNORE INTO pages (sha256, size, data) VALUES (?, ?, ?)', (digest, len(data), compressed)
+                )
+            self._conn.execute(
+                'INSERT INTO fetches (topic, url, fetched_at, sha256) VALUES (?, ?, ?, ?)',
+                (topic, url, fetched_at or time.time(), digest)
+            )
+
+        if self.max_age_days > 0 and time.time() - self._last_prune > _PRUNE_INTERVAL:
+            self.prune(self.max_age_days)
+        return digest
+
+    def prune(self, max_age_days):
+        """מחיקת הבקשות שישנות מ-max_age_days, והעמודים שאף בקשה כבר לא מפנה אליהם"""
+        self._last_prune = time.time()
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM fetches WHERE fetched_at < ?', (time.time() - max_age_days * 86400,))
+            self._conn.execute(
+                'DELETE FROM pages WHERE NOT EXISTS (SELECT 1 FROM fetches f WHERE f.sha256 = pages.sha256)'
+            )
+
+    def fetches(self, topics=None, since=None):
+        """הבקשות השמורות לפי סדר הזמן: [(נושא, כתובת, זמן, גיבוב)]"""
+        conditions = []
+        params = []
+        if topics:
+            conditions.append(f"topic IN ({','.join('?' * len(topics))})")
+            params.extend(topics)
+        if since is not None:
+            conditions.append('fetched_at >= ?')
+            params.append(since)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        with self._lock:
+            return self._conn.execute(
+                f'SELECT topic, url, fetched_at, sha256 FROM fetches {where} ORDER BY fetched_at, id', params
+            ).fetchall()
+
+    def load(self, digest):
+        """תוכן העמוד לפי הגיבוב (None אם לא קיים)"""
+        with self._lock:
+            row = self._conn.execute('SELECT data FROM pages WHERE sha256 = ?', (digest,)).fetchone()
+        return gzip.decompress(row[0]).decode('utf-8') if row else None
+
+    def stats(self):
+        """(בקשות, עמודים ייחודיים, בתים לפני דחיסה, בתים שמורים)"""
+        with self._lock:
+            fetches = self._conn.execute('SELECT COUNT(*) FROM fetches').fetchone()[0]
+            pages, size, stored = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM pages'
+            ).fetchone()
+        return fetches, pages, size, stored
+
+def archive_path(config):
+    return os.path.abspath(os.path.join(config.get('data_dir', 'data'), ARCHIVE_FILE))
+
+def get_archive(config, for_reading=False):
+    """קבלת ארכיון העמודים (נפתח פעם אחת לכל תהליך), או None אם raw_archive כבוי
+
+    for_reading - פתיחת ארכיון קיים גם כשהשמירה כבויה (לפקודת reprocess).
+    """
+    settings = config.get('raw_archive', {})
+    path = archive_path(config)
+    if not settings.get('enabled', False) and not (for_reading and os.path.exists(path)):
+        return None
+
+    with _archives_lock:
+        archive = _archives.get(path)
+        if archive is None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            archive = RawArchive(path)
+            _archives[path] = archive
+        archive.max_age_days = float(settings.get('max_age_days', 0) or 0)
+        return archive
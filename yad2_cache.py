@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מטמון תוצאות סריקה לפקודות MCP
+
+תוצאת הסריקה של כל פרויקט נשמרת לפי הנושא והכתובת המנורמלת שלו לזמן מוגבל (TTL), כך
+שבקשות scan/auto חוזרות בתוך חלון הזמן נענות מהזיכרון (או מהדיסק) בלי לפנות שוב ליד2.
+המטמון מוגבל בגודלו ומפנה את הרשומות שנעשה בהן שימוש לפני הכי הרבה זמן (LRU).
+"""
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+CACHE_FILE = 'scan_cache.json'
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+class ResultCache:
+    """מטמון LRU עם TTL, נשמר לקובץ JSON"""
+
+    def __init__(self, path, ttl_seconds, max_entries):
+        self.path = path
+        self.ttl = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    for key, entry in json.load(f):
+                        # מפתחות מורכבים (tuple) נשמרים ב-JSON כרשימה
+                        self._entries[tuple(key) if isinstance(key, list) else key] = entry
+            except Exception as e:
+                print(f"שגיאה בקריאת קובץ {path}: {e}")
+
+    def _save(self):
+        """שמירה אטומית של המטמון לדיסק. יש לקרוא בתוך הנעילה"""
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(list(self._entries.items()), f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key):
+        """הרשומה השמורה ({'value', 'time'}) אם היא עדיין טרייה, אחרת None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            if time.time() - entry['time'] > self.ttl:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, value):
+        """שמירת ערך, ופינוי הרשומות הישנות ביותר מעבר לגודל המרבי"""
+        with self._lock:
+            self._entries[key] = {'value': value, 'time': time.time()}
+            self._entries.move_to_end(key)
+
+            now = time.time()
+            for stale_key in [k for k, entry in self._entries.items() if now - entry['time'] > self.ttl]:
+                del self._entries[stale_key]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+            self._save()
+
+def get_result_cache(config):
+    """קבלת מטמון התוצאות של תיקיית הנתונים, או None אם המטמון כבוי (TTL 0)"""
+    ttl = float(config.get('scan_cache_ttl_seconds', 60))
+    if ttl <= 0:
+        return None
+
+    max_entries = int(config.get('scan_cache_max_entries', 128))
+    path = os.path.abspath(os.path.join(config.get('data_dir', 'data'), CACHE_FILE))
+
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = ResultCache(path, ttl, max_entries)
+            _caches[path] = cache
+        cache.ttl = ttl
+        cache.max_entries = max(1, max_entries)
+        return cache
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ניהול קובץ ההגדרות (config.json) של Yad2 MCP
+
+הקובץ מפוענח פעם אחת ונשמר בזיכרון; בכל גישה נבדק רק ה-mtime והגודל שלו,
+והוא נטען מחדש רק אם השתנה (למשל נושא שנוסף מתהליך אחר). כתיבות נעשות תחת
+נעילת קובץ (config.json.lock), על גרסה טרייה מהדיסק, ובאופן אטומי (קובץ זמני
+ו-os.replace), כך ששני תהליכים שכותבים בו-זמנית לא דורסים זה את זה.
+"""
+
+import os
+import json
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+CONFIG_FILE = 'config.json'
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+@contextmanager
+def file_lock(path):
+    """נעילה בלעדית בין תהליכים, דרך קובץ נעילה לצד path"""
+    with open(path + '.lock', 'a+') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+class ConfigManager:
+    """קובץ הגדרות עם מטמון, טעינה מחדש לפי mtime וכתיבה אטומית"""
+
+    def __init__(self, path):
+        self.path = path
+        self._config = None
+        self._signature = None
+        self._lock = threading.RLock()
+
+    def _stat_signature(self):
+        """(mtime, גודל) של הקובץ, או None אם אינו קיים"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write(self, config):
+        """כתיבה אטומית - קובץ זמני באותה תיקייה ואז החלפה. יש לקרוא תחת הנעילה"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self._config = config
+        self._signature = self._stat_signature()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def get(self):
+        """ההגדרות הנוכחיות (ללא פענוח מחדש אם הקובץ לא השתנה). אין לשנות את המילון - יש להשתמש ב-update"""
+        with self._lock:
+            signature = self._stat_signature()
+            if self._config is None or signature != self._signature:
+                self._config = self._read()
+                self._signature = signature
+            return self._config
+
+    def create(self, default_config):
+        """יצירת הקובץ עם הגדרות ברירת מחדל, אם עדיין לא קיים. מחזיר True אם נוצר"""
+        with self._lock, file_lock(self.path):
+            if self.exists():
+                return False
+            self._write(default_config)
+            return True
+
+    def update(self, mutate):
+        """עדכון ההגדרות: mutate מקבל עותק טרי מהדיסק ומשנה אותו במקום.
+        הקובץ נכתב רק אם משהו השתנה. מוחזר הערך ש-mutate החזיר"""
+        with self._lock, file_lock(self.path):
+            config = self._read()
+            before = json.dumps(config, sort_keys=True)
+            result = mutate(config)
+            if json.dumps(config, sort_keys=True) != before:
+                self._write(config)
+            else:
+                self._config = config
+                self._signature = self._stat_signature()
+            return result
+
+def get_config_manager(path=CONFIG_FILE):
+    """מנהל ההגדרות של קובץ (אחד לכל נתיב בתהליך)"""
+    abs_path = os.path.abspath(path)
+
+    with _managers_lock:
+        manager = _managers.get(abs_path)
+        if manager is None:
+            manager = ConfigManager(abs_path)
+            _managers[abs_path] = manager
+        return manager
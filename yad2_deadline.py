@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מועדי סיום (deadlines) לסריקה ב-Yad2 MCP
+
+לכל סבב סריקה יש תקציב זמן (cycle_seconds) ולכל פרויקט מועד סיום משלו
+(project_seconds). המועד נשמר ב-contextvar ועובר עם ההקשר לתהליכוני הסריקה
+והטעינה המוקדמת; deadline() מקונן לוקח את המוקדם מבין המועדים, כך שפרויקט
+לא חורג מתקציב הסבב. כל בקשת HTTP מקבלת timeout להתחברות ולקריאה, מוגבל
+לזמן שנותר.
+"""
+
+import time
+import contextvars
+from contextlib import contextmanager
+
+DEFAULTS = {
+    'connect_timeout_seconds': 5,
+    'read_timeout_seconds': 20,
+    'project_seconds': 180,
+    'cycle_seconds': 600,
+    'client_seconds': 900,
+}
+
+_deadline = contextvars.ContextVar('yad2_deadline', default=None)
+
+class DeadlineExceeded(Exception):
+    """העבודה חרגה מהזמן שהוקצב לה"""
+
+def settings(config):
+    """הגדרות מועדי הסיום (deadlines) עם ערכי ברירת מחדל"""
+    return dict(DEFAULTS, **config.get('deadlines', {}))
+
+@contextmanager
+def deadline(seconds):
+    """הגבלת הקוד שבבלוק ל-seconds שניות (0 או None - ללא מגבלה נוספת על המועד הקיים)"""
+    current = _deadline.get()
+    if seconds and seconds > 0:
+        limit = time.monotonic() + seconds
+        current = limit if current is None else min(current, limit)
+    token = _deadline.set(current)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining():
+    """השניות שנותרו עד מועד הסיום, או None אם אין מועד"""
+    current = _deadline.get()
+    return None if current is None else max(current - time.monotonic(), 0.0)
+
+def expired():
+    return remaining() == 0.0
+
+def check():
+    """DeadlineExceeded אם מועד הסיום עבר"""
+    if expired():
+        raise DeadlineExceeded("חריגה מהזמן המוקצב")
+
+def clip(seconds):
+    """seconds, ולא יותר מהזמן שנותר"""
+    left = remaining()
+    return seconds if left is None else min(seconds, left)
+
+def request_timeout(config):
+    """(התחברות, קריאה) לבקשת HTTP, מוגבלים לזמן שנותר. יש לקרוא אחרי check()"""
+    values = settings(config)
+    return tuple(max(clip(float(values[key])), 0.001) for key in ('connect_timeout_seconds', 'read_timeout_seconds'))
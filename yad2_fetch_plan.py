@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+תכנון הבקשות של סבב סריקה ב-Yad2 MCP
+
+כתובות הפרויקטים מנורמלות (סדר פרמטרים, אותיות קטנות בשרת, פרמטרים ריקים
+ופרמטרי מעקב), ופרויקטים עם אותה כתובת נסרקים בבקשה אחת בסבב (fetch_plan
+"dedupe"). במצב "derive" גם פרויקט שהוא גרסה מצומצמת של חיפוש אחר - אותם
+פרמטרים ועוד מסננים שאפשר לבדוק על המודעות עצמן (מחיר, חדרים, קומה, מ"ר) -
+נגזר מהמודעות של החיפוש הרחב במקום לשלוח בקשה משלו.
+"""
+
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+PLAN_MODES = ('off', 'dedupe', 'derive')
+
+# פרמטרים שלא משנים את תוצאות החיפוש
+IGNORED_PARAMS = {'page', 'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content', 'fbclid', 'gclid'}
+
+# מסננים שאפשר להחיל על המודעות: פרמטר -> (שדה, 'range' / 'min' / 'max')
+CLIENT_FILTERS = {
+    'price': ('price', 'range'),
+    'minPrice': ('price', 'min'),
+    'maxPrice': ('price', 'max'),
+    'rooms': ('rooms', 'range'),
+    'minRooms': ('rooms', 'min'),
+    'maxRooms': ('rooms', 'max'),
+    'floor': ('floor', 'range'),
+    'minFloor': ('floor', 'min'),
+    'maxFloor': ('floor', 'max'),
+    'squaremeter': ('square_meters', 'range'),
+    'minSquaremeter': ('square_meters', 'min'),
+    'maxSquaremeter': ('square_meters', 'max'),
+}
+
+# טווח בפורמט של יד2: "3-4", "1000000-2500000"; ‎-1 הוא גבול פתוח ("-1-2000000")
+_RANGE_RE = re.compile(r'^(-1|\d+(?:\.\d+)?)-(-1|\d+(?:\.\d+)?)$')
+
+def _split_url(url):
+    """(scheme, שרת, נתיב) מנורמלים ופרמטרי החיפוש הממוינים - ללא ערכים ריקים ופרמטרים
+    שלא משפיעים על התוצאות"""
+    scheme, netloc, path, query, _ = urlsplit(url.strip())
+    params = sorted((key, value) for key, value in parse_qsl(query, keep_blank_values=True)
+                    if value != '' and key not in IGNORED_PARAMS)
+    return (scheme.lower() or 'https', netloc.lower(), path.rstrip('/') or '/'), params
+
+def canonical_url(url):
+    """כתובת מנורמלת - שתי כתובות שמחזירות את אותן תוצאות מקבלות אותה כתובת"""
+    base, params = _split_url(url)
+    return urlunsplit(base + (urlencode(params), ''))
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def parse_filters(params):
+    """מסנני הלקוח מתוך פרמטרים: [(שדה, מינימום, מקסימום)], או None אם פרמטר אינו ניתן לבדיקה"""
+    filters = []
+    for key, value in params:
+        if key not in CLIENT_FILTERS:
+            return None
+        field, kind = CLIENT_FILTERS[key]
+        if kind == 'range':
+            match = _RANGE_RE.match(value)
+            if not match:
+                return None
+            low, high = (None if bound == '-1' else float(bound) for bound in match.groups())
+        else:
+            number = _number(value)
+            if number is None:
+                return None
+            low, high = (number, None) if kind == 'min' else (None, number)
+        filters.append((field, low, high))
+    return filters
+
+def _field_value(item, field):
+    if field == 'price':
+        return getattr(item, 'price_value', None)
+    return _number(item.get(field))
+
+def item_matches(item, filters):
+    """True/False - האם המודעה עוברת את המסננים; None אם שדה נדרש אינו ידוע במודעה"""
+    for field, low, high in filters:
+        value = _field_value(item, field)
+        if value is None:
+            # מודעה ללא מחיר לא מופיעה בחיפוש עם טווח מחירים; שדה אחר חסר - לא ניתן להחליט
+            if field == 'price':
+                return False
+            return None
+        if (low is not None and value < low) or (high is not None and value > high):
+            return False
+    return True
+
+def derive_items(items, filters):
+    """המודעות שעוברות את המסננים, או None אם לא ניתן להחליט לגבי חלק מהן"""
+    derived = []
+    for item in items:
+        matches = item_matches(item, filters)
+        if matches is None:
+            return None
+        if matches:
+            derived.append(item)
+    return derived
+
+class FetchGroup:
+    """בקשה אחת בסבב: הפרויקט שנסרק (lead), והפרויקטים שנגזרים ממנו עם המסננים שלהם"""
+
+    def __init__(self, lead):
+        self.lead = lead
+        self.members = []  # [(אינדקס, מסננים)]; מסננים ריקים - אותה כתובת בדיוק
+
+    def __repr__(self):
+        return f"FetchGroup(lead={self.lead}, members={self.members})"
+
+def build_fetch_plan(projects, mode='dedupe', can_derive=None):
+    """חלוקת הפרויקטים (לפי אינדקס ברשימה) לבקשות
+
+    mode - 'off' (בקשה לכל פרויקט), 'dedupe' (כתובות זהות) או 'derive' (גם פרויקטים מצומצמים).
+    can_derive(project) - האם מותר לגזור פרויקט מסונן (למשל לא בסריקה הראשונה שלו).
+    """
+    if mode not in PLAN_MODES:
+        mode = 'dedupe'
+
+    parsed = []
+    for index, project in enumerate(projects):
+        base, params = _split_url(project.get('url', ''))
+        parsed.append((index, base, params))
+
+    groups = []
+    leads = []  # (קבוצה, כתובת בסיס, פרמטרים)
+
+    # מהחיפוש הרחב (מעט פרמטרים) לצר, כדי שחיפוש רחב ייבחר לבקשה לפני הגרסאות המסוננות שלו
+    order = sorted(parsed, key=lambda entry: (len(entry[2]), entry[0])) if mode == 'derive' else parsed
+    for index, base, params in order:
+        found = None
+        if mode != 'off':
+            found = _find_lead(leads, base, params, mode, lambda: can_derive is None or can_derive(projects[index]))
+
+        if found is None:
+            group = FetchGroup(index)
+            groups.append(group)
+            leads.append((group, base, params))
+        else:
+            group, filters = found
+            group.members.append((index, filters))
+
+    groups.sort(key=lambda group: group.lead)
+    return groups
+
+def _find_lead(leads, base, params, mode, can_derive):
+    """(קבוצה, מסננים) של הבקשה שאפשר לגזור ממנה את הפרויקט - כתובת זהה (ללא מסננים), או
+    (במצב derive) חיפוש רחב יותר שההבדל ממנו הוא רק מסנני לקוח. מועדף הצר ביותר מבין המתאימים"""
+    best = None
+    for group, lead_base, lead_params in leads:
+        if lead_base != base:
+            continue
+        if lead_params == params:
+            return group, []
+        if mode != 'derive' or not set(lead_params) < set(params):
+            continue
+        # פרמטר שמופיע פעמיים (למשל property=1&property=3) - רק התאמה מדויקת
+        keys = [key for key, _ in params]
+        if len(set(keys)) != len(keys):
+            continue
+        filters = parse_filters([param for param in params if param not in lead_params])
+        if filters is None:
+            continue
+        if best is None or len(lead_params) > best[2]:
+            best = (group, filters, len(lead_params))
+
+    if best is not None and can_derive():
+        return best[0], best[1]
+    return None
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+בקר הבקשות המשותף ליד2
+
+- הגבלת קצב (token bucket) לכל שרת
+- המתנה אקספוננציאלית עם רעש אקראי בין ניסיונות חוזרים על שגיאות זמניות
+- מפסק (circuit breaker) שנפתח כאשר מתקבל דף CAPTCHA ועוצר את כל הסריקות
+  לזמן קירור. מצב המפסק נשמר בדיסק ונשמר גם אחרי הפעלה מחדש.
+"""
+
+import os
+import json
+import time
+import random
+import threading
+from datetime import datetime
+from urllib.parse import urlparse
+
+STATE_FILE = 'circuit_breaker.json'
+
+# סטטוסים שמצדיקים ניסיון חוזר
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+DEFAULTS = {
+    'requests_per_second': 2.0,
+    'burst': 5,
+    'max_retries': 3,
+    'backoff_base_seconds': 1.0,
+    'backoff_max_seconds': 30.0,
+    'captcha_cooldown_minutes': 15,
+    'captcha_cooldown_max_minutes': 360,
+}
+
+_governors = {}
+_governors_lock = threading.Lock()
+
+class TokenBucket:
+    """דלי אסימונים - קצב ממוצע rate לשנייה עם פרץ של עד burst בקשות"""
+
+    def __init__(self, rate, burst):
+        self.rate = max(float(rate), 0.001)
+        self.burst = max(float(burst), 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """שריון אסימון, והמתנה עד שהוא זמין"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+
+class FetchGovernor:
+    """בקר הבקשות: הגבלת קצב לכל שרת, המתנה בין ניסיונות ומפסק CAPTCHA"""
+
+    def __init__(self, settings, state_path):
+        self.settings = dict(DEFAULTS, **settings)
+        self.state_path = state_path
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._state = {'open_until': 0, 'trips': 0}
+
+        if os.path.exists(state_path):
+            try:
+                with open(state_path, 'r', encoding='utf-8') as f:
+                    self._state.update(json.load(f))
+            except Exception as e:
+                print(f"שגיאה בקריאת קובץ {state_path}: {e}")
+
+    def _save_state(self):
+        """שמירה אטומית של מצב המפסק. יש לקרוא בתוך הנעילה"""
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def throttle(self, url):
+        """המתנה לפי מגבלת הקצב של השרת של url"""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.settings['requests_per_second'], self.settings['burst'])
+                self._buckets[host] = bucket
+        bucket.acquire()
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """זמן ההמתנה לפני ניסיון חוזר מספר attempt (full jitter), או Retry-After של השרת"""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.settings['backoff_max_seconds'])
+            except ValueError:
+                pass
+
+        ceiling = min(self.settings['backoff_max_seconds'], self.settings['backoff_base_seconds'] * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    @property
+    def max_retries(self):
+        return int(self.settings['max_retries'])
+
+    def blocked_until(self):
+        """זמן סיום הקירור אם המפסק פתוח, אחרת None"""
+        with self._lock:
+            open_until = self._state['open_until']
+        return open_until if open_until > time.time() else None
+
+    def trip(self):
+        """פתיחת המפסק אחרי CAPTCHA. זמן הקירור מוכפל בכל פתיחה רצופה"""
+        with self._lock:
+            now = time.time()
+            if self._state['open_until'] > now:
+                return self._state['open_until']
+
+            base = self.settings['captcha_cooldown_minutes'] * 60
+            cooldown = min(base * (2 ** self._state['trips']), self.settings['captcha_cooldown_max_minutes'] * 60)
+            self._state['trips'] += 1
+            self._state['open_until'] = now + cooldown
+            self._save_state()
+
+        resume = datetime.fromtimestamp(now + cooldown).strftime('%H:%M')
+        print(f"זוהה דף CAPTCHA - כל הסריקות מושהות עד {resume}.")
+        return now + cooldown
+
+    def record_success(self):
+        """איפוס מונה הפתיחות אחרי עמוד תקין"""
+        with self._lock:
+            if self._state['trips'] and self._state['open_until'] <= time.time():
+                self._state['trips'] = 0
+                self._save_state()
+
+def get_governor(config):
+    """קבלת בקר הבקשות של תיקיית הנתונים (נוצר פעם אחת לכל תהליך)"""
+    state_path = os.path.abspath(os.path.join(config.get('data_dir', 'data'), STATE_FILE))
+
+    with _governors_lock:
+        governor = _governors.get(state_path)
+        if governor is None:
+            governor = FetchGovernor(config.get('fetch_governor', {}), state_path)
+            _governors[state_path] = governor
+        return governor
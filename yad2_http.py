@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+שכבת HTTP משותפת לכל הבקשות ליד2
+
+מחזיקה Session ארוך-חיים עם מאגר חיבורים (keep-alive), דחיסה (gzip/brotli)
+ושמירת ETag/Last-Modified לכל נושא ו-URL לצורך בקשות מותנות (If-None-Match/If-Modified-Since).
+ה-validators נשמרים לכל נושא בנפרד - תשובת 304 אומרת רק שהעמוד לא השתנה מאז הבקשה
+הקודמת של אותו נושא, ולא שנושא אחר עם אותה כתובת כבר ראה את המודעות שבו.
+"""
+
+import os
+import json
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+
+# ערך מיוחד שמוחזר כאשר השרת ענה 304 - התוכן לא השתנה מאז הסריקה הקודמת
+NOT_MODIFIED = object()
+
+VALIDATORS_FILE = 'http_validators.json'
+
+_session = None
+_session_lock = threading.Lock()
+
+_validators = None
+_validators_path = None
+_validators_lock = threading.Lock()
+
+def get_session(config=None):
+    """קבלת ה-Session המשותף (נוצר פעם אחת לכל תהליך)"""
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            config = config or {}
+            pool_size = max(int(config.get('max_concurrent_scans', 8)), int(config.get('max_concurrent_per_host', 4)))
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+
+            # gzip/deflate תמיד, brotli/zstd רק אם המודול המתאים מותקן ו-urllib3 יודע לפענח אותו
+            session.headers.update(make_headers(accept_encoding=True))
+            _session = session
+
+        return _session
+
+def close_session():
+    """סגירת ה-Session המשותף וכל החיבורים הפתוחים"""
+    global _session
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def _load_validators(config):
+    """טעינת ה-validators מהדיסק (פעם אחת לכל תיקיית נתונים). יש לקרוא בתוך הנעילה"""
+    global _validators, _validators_path
+
+    path = os.path.join(config.get('data_dir', 'data'), VALIDATORS_FILE)
+    if _validators is not None and _validators_path == path:
+        return _validators
+
+    _validators = {}
+    _validators_path = path
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                _validators = json.load(f)
+        except Exception as e:
+            print(f"שגיאה בקריאת קובץ {path}: {e}")
+
+    # קובץ בפורמט הישן ({url: validators}, ללא נושא) לא תקף - הבקשות הבאות יהיו מלאות
+    for key in [key for key, value in _validators.items() if 'etag' in value or 'last_modified' in value]:
+        del _validators[key]
+
+    return _validators
+
+def _save_validators():
+    """שמירה אטומית של ה-validators לדיסק. יש לקרוא בתוך הנעילה"""
+    os.makedirs(os.path.dirname(_validators_path) or '.', exist_ok=True)
+    tmp_path = _validators_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(_validators, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, _validators_path)
+
+def conditional_headers(url, config, topic=''):
+    """כותרות If-None-Match/If-Modified-Since עבור URL, לפי התשובה הקודמת שנשמרה לנושא"""
+    with _validators_lock:
+        saved = _load_validators(config).get(topic, {}).get(url, {})
+
+    headers = {}
+    if saved.get('etag'):
+        headers['If-None-Match'] = saved['etag']
+    if saved.get('last_modified'):
+        headers['If-Modified-Since'] = saved['last_modified']
+    return headers
+
+def remember_validators(url, response, config, topic=''):
+    """שמירת ETag/Last-Modified מתשובה מוצלחת"""
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+
+    if not etag and not last_modified:
+        forget_validators(url, config, topic)
+        return
+
+    with _validators_lock:
+        validators = _load_validators(config).setdefault(topic, {})
+        entry = {'etag': etag, 'last_modified': last_modified}
+        if validators.get(url) != entry:
+            validators[url] = entry
+            _save_validators()
+
+def forget_validators(url, config, topic=''):
+    """מחיקת ה-validators של URL בנושא, כך שהבקשה הבאה תוריד את העמוד במלואו"""
+    with _validators_lock:
+        validators = _load_validators(config)
+        saved = validators.get(topic, {})
+        if saved.pop(url, None) is not None:
+            if not saved:
+                del validators[topic]
+            _save_validators()
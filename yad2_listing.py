@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+רשומת מודעה קומפקטית של Yad2 MCP
+
+Listing מחליפה את מילון המודעה (id, title, price, address, date, image, link)
+ברשומה עם __slots__:
+- המחיר נשמר כמספר כאשר הטקסט בפורמט הרגיל של יד2 ("2,350,000 ₪")
+- הקישור נגזר מהמזהה ולא נשמר
+- חלקי הכתובת (סוג נכס, שכונה, עיר), התאריך וטקסטי ברירת המחדל עוברים
+  sys.intern, כך שמחרוזות חוזרות נשמרות בזיכרון פעם אחת
+
+ההמרה ל-JSON ובחזרה (to_dict / from_dict) משחזרת בדיוק את המילון המקורי, וכך גם
+ההמרה ל-tuple קומפקטי ובחזרה (to_tuple / from_tuple) שמשמשת להעברה בין תהליכים.
+הרשומה תומכת גם בגישה בסגנון מילון (get, [...]), כך שקוד קיים ממשיך לעבוד.
+"""
+
+import re
+import sys
+import hashlib
+
+ITEM_LINK_PREFIX = "https://www.yad2.co.il/item/"
+
+FIELDS = ('id', 'title', 'price', 'address', 'date', 'image', 'link')
+
+ADDRESS_SEPARATOR = ', '
+
+# השדות שנכללים בגיבוב לזיהוי שינויים (התאריך היחסי "עודכן לפני X ימים" משתנה מעצמו ולכן לא נכלל)
+HASHED_FIELDS = ('title', 'price', 'address', 'image')
+
+FIELD_LABELS = {
+    'title': "כותרת",
+    'price': "מחיר",
+    'address': "כתובת",
+    'image': "תמונה",
+}
+
+# פרטי הנכס שנשמרים כשדות נוספים (כשהם זמינים - בחילוץ מה-JSON המוטמע), לפי סדר התצוגה
+DETAIL_FIELDS = ('rooms', 'floor', 'square_meters')
+
+_PRICE_RE = re.compile(r'^(\d{1,3}(?:,\d{3})*) ₪$')
+
+# סימון לקישור שלא נשמר (נגזר מהמזהה)
+_MISSING = object()
+
+def parse_price(text):
+    """המחיר כמספר שלם, אם הטקסט בפורמט "2,350,000 ₪" (אחרת None)"""
+    if not isinstance(text, str):
+        return None
+    match = _PRICE_RE.match(text)
+    return int(match.group(1).replace(',', '')) if match else None
+
+def format_price(value):
+    """טקסט המחיר בפורמט של יד2"""
+    return f"{value:,} ₪"
+
+def item_link(item_id):
+    """קישור למודעה לפי המזהה"""
+    return f"{ITEM_LINK_PREFIX}{item_id}" if item_id else None
+
+def fields_hash(item):
+    """גיבוב קומפקטי (מספר שלם של 64 ביט) של השדות שבהם נבדקים שינויים"""
+    text = '\x1f'.join('' if item.get(field) is None else str(item.get(field)) for field in HASHED_FIELDS)
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+def field_changes(old, new):
+    """השדות ששונו בין שתי גרסאות של מודעה: {שדה: [ערך ישן, ערך חדש]}"""
+    return {field: [old.get(field), new.get(field)] for field in HASHED_FIELDS if old.get(field) != new.get(field)}
+
+def describe_change(field, old, new):
+    """תיאור שינוי בשדה לתצוגה. לשינוי מחיר מצוין גם הפרש הסכום"""
+    label = FIELD_LABELS.get(field, field)
+    if field == 'price':
+        old_value, new_value = parse_price(old), parse_price(new)
+        if old_value is not None and new_value is not None and old_value != new_value:
+            direction = "ירד" if new_value < old_value else "עלה"
+            return f"{label} {direction} מ-{old} ל-{new} ({new_value - old_value:+,} ₪)"
+    return f"{label} שונה מ-{old or '-'} ל-{new or '-'}"
+
+def describe_details(item):
+    """פרטי הנכס לתצוגה ("3 חדרים | קומה 2 | 80 מ"ר"), או None אם אינם ידועים"""
+    rooms, floor, square_meters = (item.get(field) for field in DETAIL_FIELDS)
+    parts = []
+    if rooms is not None:
+        parts.append(f"{rooms:g} חדרים" if isinstance(rooms, (int, float)) else f"{rooms} חדרים")
+    if floor is not None:
+        parts.append(f"קומה {floor}")
+    if square_meters is not None:
+        parts.append(f"{square_meters} מ\"ר")
+    return ' | '.join(parts) or None
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+class Listing:
+    """מודעה אחת מיד2"""
+
+    __slots__ = ('id', 'title', 'price_value', 'date', 'image', '_price_text', '_address', '_link', '_extra')
+
+    def __init__(self, id, title=None, price=None, address=None, date=None, image=None, link=_MISSING, extra=None):
+        self.id = id
+        self.title = title
+        self.date = _intern(date)
+        self.image = image
+
+        # מחיר - מספר כאשר הטקסט משוחזר במדויק, אחרת הטקסט עצמו (למשל "לא צוין מחיר")
+        self.price_value = parse_price(price)
+        if self.price_value is not None and format_price(self.price_value) == price:
+            self._price_text = None
+        else:
+            self.price_value = None
+            self._price_text = _intern(price)
+
+        # כתובת - חלקים משותפים בין מודעות, כל עוד החיבור משחזר את הטקסט
+        if isinstance(address, str):
+            parts = tuple(sys.intern(part) for part in address.split(ADDRESS_SEPARATOR))
+            self._address = parts if ADDRESS_SEPARATOR.join(parts) == address else address
+        else:
+            self._address = address
+
+        # קישור - נשמר רק אם אינו הקישור הנגזר מהמזהה
+        self._link = _MISSING if link is _MISSING or link == item_link(id) else link
+        self._extra = extra or None
+
+    @property
+    def price(self):
+        """טקסט המחיר כפי שהופיע במודעה"""
+        return format_price(self.price_value) if self.price_value is not None else self._price_text
+
+    @property
+    def address(self):
+        if isinstance(self._address, tuple):
+            return ADDRESS_SEPARATOR.join(self._address)
+        return self._address
+
+    @property
+    def address_parts(self):
+        """חלקי הכתובת (סוג נכס, שכונה, עיר)"""
+        if isinstance(self._address, tuple):
+            return self._address
+        return (self._address,) if self._address else ()
+
+    @property
+    def city(self):
+        parts = self.address_parts
+        return parts[-1] if parts else None
+
+    @property
+    def link(self):
+        return item_link(self.id) if self._link is _MISSING else self._link
+
+    @classmethod
+    def from_dict(cls, data):
+        """בניית רשומה ממילון בסכמת ה-JSON (מפתחות לא מוכרים נשמרים כמו שהם)"""
+        if isinstance(data, Listing):
+            return data
+        extra = {key: value for key, value in data.items() if key not in FIELDS}
+        return cls(
+            data.get('id'), data.get('title'), data.get('price'), data.get('address'),
+            data.get('date'), data.get('image'), data.get('link', _MISSING), extra
+        )
+
+    def to_dict(self):
+        """המודעה כמילון בסכמת ה-JSON המקורית"""
+        data = {
+            'id': self.id,
+            'title': self.title,
+            'price': self.price,
+            'address': self.address,
+            'date': self.date,
+            'image': self.image,
+            'link': self.link,
+        }
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    def to_tuple(self):
+        """המודעה כ-tuple קומפקטי (למעבר בין תהליכים). קישור שנגזר מהמזהה לא נשמר"""
+        return (self.id, self.title, self.price, self.address, self.date, self.image,
+                () if self._link is _MISSING else (self._link,), self._extra)
+
+    @classmethod
+    def from_tuple(cls, data):
+        """בניית רשומה מ-tuple שנוצר ב-to_tuple"""
+        item_id, title, price, address, date, image, link, extra = data
+        return cls(item_id, title, price, address, date, image, link[0] if link else _MISSING, extra)
+
+    # גישה בסגנון מילון, לתאימות עם הקוד שעובד עם מילוני מודעות
+    def get(self, key, default=None):
+        if key in FIELDS:
+            return getattr(self, key)
+        if self._extra:
+            return self._extra.get(key, default)
+        return default
+
+    def __getitem__(self, key):
+        if key in FIELDS:
+            return getattr(self, key)
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in FIELDS or bool(self._extra) and key in self._extra
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def __eq__(self, other):
+        if isinstance(other, Listing):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Listing({self.to_dict()!r})"
+
+def as_dict(item):
+    """מילון בסכמת ה-JSON ממודעה (Listing או מילון)"""
+    return item.to_dict() if isinstance(item, Listing) else item
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מדדי ביצועים של Yad2 MCP
+
+זמני השלבים (fetch, parse, diff, persist, compact, notify) נמדדים כהיסטוגרמות, ולצדם
+מונים של בתים שהורדו, מודעות שנותחו, מודעות חדשות, דפי CAPTCHA ושגיאות - לכל נושא.
+המדדים זמינים בפורמט הטקסט של Prometheus דרך פורט HTTP מקומי (metrics_port)
+ובפקודת MCP בשם stats.
+"""
+
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# הנושא שבסריקתו נמצא הקוד הנוכחי (עובר גם לתהליכוני טעינה מוקדמת דרך copy_context)
+_current_project = contextvars.ContextVar('yad2_project', default='')
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+def _format_labels(names, values):
+    """תוויות בפורמט Prometheus"""
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+class Counter:
+    """מונה מצטבר עם תוויות"""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(label, '') for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+class Histogram:
+    """היסטוגרמה עם גבולות קבועים ותוויות"""
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # תוויות -> [מונים לכל גבול, סכום, כמות]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(label, '') for label in self.labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def values(self):
+        """(סכום, כמות) לכל צירוף תוויות"""
+        with self._lock:
+            return {key: (entry[1], entry[2]) for key, entry in self._values.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((key, [list(entry[0]), entry[1], entry[2]]) for key, entry in self._values.items())
+
+        for key, (counts, total, count) in snapshot:
+            for bound, bucket_count in zip(self.buckets, counts):
+                labels = _format_labels(self.labels + ('le',), key + (repr(bound),))
+                lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels + ('le',), key + ('+Inf',))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+STAGE_SECONDS = Histogram('yad2_stage_duration_seconds', 'Duration of each scan pipeline stage', ('stage', 'project'))
+FETCHED_BYTES = Counter('yad2_fetched_bytes_total', 'Bytes of page content fetched from Yad2', ('project',))
+ITEMS_PARSED = Counter('yad2_items_parsed_total', 'Listings extracted from fetched pages', ('project',))
+NEW_ITEMS = Counter('yad2_new_items_total', 'New listings found', ('project',))
+CHANGED_ITEMS = Counter('yad2_changed_items_total', 'Known listings whose fields changed', ('project',))
+CAPTCHA_HITS = Counter('yad2_captcha_total', 'CAPTCHA pages received', ('project',))
+ERRORS = Counter('yad2_errors_total', 'Errors by pipeline stage', ('stage', 'project'))
+TIMEOUTS = Counter('yad2_timeouts_total', 'Scans cut short by the project deadline or cycle budget', ('project',))
+
+REGISTRY = [STAGE_SECONDS, FETCHED_BYTES, ITEMS_PARSED, NEW_ITEMS, CHANGED_ITEMS, CAPTCHA_HITS, ERRORS, TIMEOUTS]
+
+STAGES = ('fetch', 'parse', 'diff', 'persist', 'compact', 'notify')
+
+def current_project():
+    """שם הנושא שנסרק כעת בהקשר הנוכחי"""
+    return _current_project.get()
+
+@contextmanager
+def project_context(topic):
+    """קביעת הנושא הנוכחי לצורך תיוג המדדים"""
+    token = _current_project.set(topic)
+    try:
+        yield
+    finally:
+        _current_project.reset(token)
+
+@contextmanager
+def timed_stage(stage, project=None):
+    """מדידת משך שלב, ורישום שגיאה אם השלב זרק חריגה"""
+    project = current_project() if project is None else project
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORS.inc(stage=stage, project=project)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage, project=project)
+
+def render_prometheus():
+    """כל המדדים בפורמט הטקסט של Prometheus"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+def format_stats():
+    """סיכום המדדים לתצוגה (פקודת stats)"""
+    stage_values = STAGE_SECONDS.values()
+    if not stage_values:
+        return "עדיין לא נאספו נתונים. הרץ סריקה ונסה שוב."
+
+    result = "סטטיסטיקות סריקה (מאז הפעלת השירות):\n\nזמני שלבים:\n"
+    for stage in STAGES:
+        total = sum(value[0] for key, value in stage_values.items() if key[0] == stage)
+        count = sum(value[1] for key, value in stage_values.items() if key[0] == stage)
+        if count:
+            result += f"  {stage}: {count} פעמים, ממוצע {total / count * 1000:.1f}ms, סה\"כ {total:.2f} שניות\n"
+
+    counters = {metric.name: metric.values()
+                for metric in (FETCHED_BYTES, ITEMS_PARSED, NEW_ITEMS, CHANGED_ITEMS, CAPTCHA_HITS, TIMEOUTS)}
+    errors = {}
+    for (stage, project), value in ERRORS.values().items():
+        errors[project] = errors.get(project, 0) + value
+
+    projects = sorted({key[1] for key in stage_values} | set(errors) |
+                      {key[0] for key in counters[TIMEOUTS.name]} - {''})
+    result += "\nלפי נושא:\n"
+    for project in projects:
+        if not project:
+            continue
+        key = (project,)
+        result += (f"  {project}: "
+                   f"{counters[FETCHED_BYTES.name].get(key, 0) / 1024:.0f}KB הורדו, "
+                   f"{counters[ITEMS_PARSED.name].get(key, 0)} מודעות נותחו, "
+                   f"{counters[NEW_ITEMS.name].get(key, 0)} חדשות, "
+                   f"{counters[CHANGED_ITEMS.name].get(key, 0)} עודכנו, "
+                   f"{counters[CAPTCHA_HITS.name].get(key, 0)} CAPTCHA, "
+                   f"{counters[TIMEOUTS.name].get(key, 0)} חריגות זמן, "
+                   f"{errors.get(project, 0)} שגיאות\n")
+
+    return result
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """הגשת /metrics"""
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(config):
+    """הפעלת נקודת הקצה של המדדים (פעם אחת לכל תהליך), אם metrics_port מוגדר"""
+    global _metrics_server
+
+    port = int(config.get('metrics_port', 0) or 0)
+    if port <= 0:
+        return None
+
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            try:
+                server = ThreadingHTTPServer(('127.0.0.1', port), _MetricsHandler)
+            except OSError as e:
+                print(f"לא ניתן להפעיל את שרת המדדים בפורט {port}: {e}")
+                return None
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name='yad2-metrics', daemon=True).start()
+            _metrics_server = server
+            print(f"המדדים זמינים בכתובת http://127.0.0.1:{port}/metrics")
+        return _metrics_server
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+תור התראות הדוא"ל של Yad2 MCP
+
+ההתראות נשלחות מתהליכון רקע, כך ששרת דוא"ל איטי לא מעכב את הסריקה.
+חיבור SMTP מאומת אחד נשמר פתוח בין הודעות (ונסגר אחרי זמן סרק),
+שליחה שנכשלה מנוסה שוב, ובמצב digest כל הנושאים של סבב סריקה מאוחדים להודעה אחת.
+מודעה שנמצאה בכמה נושאים באותו סבב מדווחת פעם אחת בלבד (בנושא הראשון).
+"""
+
+import time
+import queue
+import smtplib
+import threading
+from datetime import datetime
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+import yad2_metrics as metrics
+from yad2_listing import describe_change, describe_details
+
+# זמן סרק (שניות) שאחריו חיבור ה-SMTP נסגר
+SMTP_IDLE_SECONDS = 60
+
+# חיבור שלא היה בשימוש זמן זה נבדק עם NOOP לפני שליחה
+SMTP_CHECK_AFTER_SECONDS = 15
+
+EMAIL_STYLE = """
+            <style>
+                body { font-family: Arial, sans-serif; direction: rtl; }
+                .item { border: 1px solid #ddd; margin: 10px 0; padding: 15px; border-radius: 5px; }
+                .title { font-size: 18px; font-weight: bold; color: #3366cc; }
+                .price { font-size: 16px; color: #e63946; font-weight: bold; }
+                .link { color: #3366cc; }
+                .address { color: #666; }
+                .details { color: #666; font-size: 14px; }
+                .date { color: #888; font-size: 14px; }
+                .change { color: #2a9d8f; font-weight: bold; }
+            </style>"""
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def email_settings_missing(email_config):
+    """בדיקה אם חסרים פרטי שליחה חיוניים (סיסמה נדרשת רק כאשר מוגדרת התחברות)"""
+    required = ['smtp_server', 'smtp_port', 'sender_email', 'recipient_email']
+    if email_config.get('use_login', True):
+        required.append('sender_password')
+    return not all(email_config.get(key) for key in required)
+
+def _items_html(new_items):
+    """בלוקי HTML של המודעות"""
+    parts = []
+    for item in new_items:
+        changes = ''.join(f"""
+                <div class="change">{describe_change(field, old, new)}</div>"""
+                          for field, (old, new) in (item.get('changes') or {}).items())
+        details = describe_details(item)
+        details = f"""
+                <div class="details">{details}</div>""" if details else ''
+        parts.append(f"""
+            <div class="item">
+                <div class="title">{item.get('title', 'אין כותרת')}</div>{changes}
+                <div class="price">{item.get('price', 'מחיר לא צוין')}</div>
+                <div class="address">{item.get('address', 'כתובת לא צוינה')}</div>{details}
+                <div class="date">{item.get('date', 'תאריך לא צוין')}</div>
+                <p><a class="link" href="{item.get('link', '#')}">צפייה במודעה</a></p>
+            </div>
+            """)
+    return ''.join(parts)
+
+def _count_text(items):
+    """"N מודעות חדשות" או "N מודעות חדשות ו-M עדכונים" (מודעות עם 'changes' הן עדכונים)"""
+    changed = sum(1 for item in items if item.get('changes'))
+    if not changed:
+        return f"{len(items)} מודעות חדשות"
+    return f"{len(items) - changed} מודעות חדשות ו-{changed} עדכונים"
+
+def build_message(sections, email_config):
+    """בניית הודעת דוא"ל מרשימת (נושא, מודעות). נושא יחיד - ההודעה הרגילה; כמה נושאים - תקציר"""
+    all_items = [item for _, items in sections for item in items]
+
+    msg = MIMEMultipart('alternative')
+    if len(sections) == 1:
+        msg['Subject'] = f"🔍 נמצאו {_count_text(all_items)} ב{sections[0][0]}"
+    else:
+        msg['Subject'] = f"🔍 נמצאו {_count_text(all_items)} ב-{len(sections)} נושאים"
+    msg['From'] = email_config.get('sender_email')
+    msg['To'] = email_config.get('recipient_email')
+
+    body = []
+    for topic, items in sections:
+        body.append(f"""
+            <h2>נמצאו {_count_text(items)} ב{topic}</h2>""")
+        if len(sections) == 1:
+            body.append(f"""
+            <p>הסריקה בוצעה בתאריך: {datetime.now().strftime('%d/%m/%Y %H:%M')}</p>""")
+        body.append(_items_html(items))
+
+    if len(sections) > 1:
+        body.insert(0, f"""
+            <p>הסריקה בוצעה בתאריך: {datetime.now().strftime('%d/%m/%Y %H:%M')}</p>""")
+
+    html = f"""
+        <html dir="rtl">
+        <head>
+            <meta charset="utf-8">{EMAIL_STYLE}
+        </head>
+        <body>{''.join(body)}
+            <p>סורק יד2 הפשוט</p>
+        </body>
+        </html>
+        """
+
+    msg.attach(MIMEText(html, 'html', 'utf-8'))
+    return msg
+
+class NotificationDispatcher:
+    """תור התראות עם תהליכון שליחה יחיד וחיבור SMTP משותף"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+        # נגישים רק מתהליכון השליחה
+        self._smtp = None
+        self._smtp_key = None
+        self._smtp_used = 0.0
+        self._digest = []
+        self._digest_config = None
+        self._cycle_seen = set()
+
+    def _ensure_worker(self):
+        """הפעלת תהליכון השליחה בפעם הראשונה"""
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='yad2-notify', daemon=True)
+                self._thread.start()
+
+    def enqueue(self, topic, new_items, email_config):
+        """הוספת התראה לתור. במצב digest היא תישלח בסוף הסבב"""
+        self._ensure_worker()
+        self._queue.put(('notify', topic, list(new_items), dict(email_config)))
+
+    def end_cycle(self):
+        """סוף סבב סריקה - שליחת התקציר המצטבר (במצב digest). מחזיר אירוע שמסומן בסיום"""
+        done = threading.Event()
+        self._ensure_worker()
+        self._queue.put(('flush', None, None, done))
+        return done
+
+    def drain(self, timeout=None):
+        """המתנה עד שכל ההתראות שבתור נשלחו (או נכשלו סופית)"""
+        return self.end_cycle().wait(timeout)
+
+    def _run(self):
+        """לולאת תהליכון השליחה"""
+        while True:
+            try:
+                job = self._queue.get(timeout=SMTP_IDLE_SECONDS)
+            except queue.Empty:
+                self._close_smtp()
+                continue
+
+            kind, topic, items, extra = job
+            try:
+                if kind == 'notify':
+                    items = self._unseen_in_cycle(items)
+                    if not items:
+                        continue
+                    if extra.get('digest', False):
+                        self._digest.append((topic, items))
+                        self._digest_config = extra
+                    else:
+                        self._send([(topic, items)], extra)
+                elif kind == 'flush':
+                    self._cycle_seen = set()
+                    if self._digest:
+                        sections, self._digest = self._digest, []
+                        self._send(sections, self._digest_config)
+                    extra.set()
+            except Exception as e:
+                print(f"שגיאה בתור ההתראות: {e}")
+                if kind == 'flush':
+                    extra.set()
+            finally:
+                self._queue.task_done()
+
+    def _unseen_in_cycle(self, items):
+        """המודעות שעוד לא דווחו בסבב הנוכחי (בנושא אחר)"""
+        unseen = []
+        for item in items:
+            item_id = item.get('id')
+            if item_id is None:
+                unseen.append(item)
+            elif item_id not in self._cycle_seen:
+                self._cycle_seen.add(item_id)
+                unseen.append(item)
+        return unseen
+
+    def _connect(self, email_config):
+        """חיבור SMTP מאומת - שימוש חוזר בחיבור הקיים כשאפשר"""
+        use_tls = email_config.get('use_tls', True)
+        key = (email_config.get('smtp_server'), email_config.get('smtp_port'),
+               email_config.get('sender_email'), use_tls)
+
+        if self._smtp is not None and self._smtp_key == key:
+            if time.time() - self._smtp_used < SMTP_CHECK_AFTER_SECONDS:
+                return self._smtp
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+
+        self._close_smtp()
+        server = smtplib.SMTP(key[0], key[1], timeout=email_config.get('smtp_timeout', 30))
+        try:
+            if use_tls:
+                server.starttls()
+            if email_config.get('use_login', True):
+                server.login(email_config.get('sender_email'), email_config.get('sender_password'))
+        except Exception:
+            server.close()
+            raise
+
+        self._smtp = server
+        self._smtp_key = key
+        self._smtp_used = time.time()
+        return server
+
+    def _close_smtp(self):
+        """סגירת חיבור ה-SMTP הפתוח"""
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
+        self._smtp_key = None
+
+    def _send(self, sections, email_config):
+        """שליחת הודעה, עם ניסיונות חוזרים והמתנה הולכת וגדלה"""
+        msg = build_message(sections, email_config)
+        max_attempts = max(1, int(email_config.get('max_attempts', 3)))
+        retry_delay = float(email_config.get('retry_delay_seconds', 5))
+        project = sections[0][0] if len(sections) == 1 else 'digest'
+
+        with metrics.timed_stage('notify', project):
+            for attempt in range(max_attempts):
+                try:
+                    self._connect(email_config).send_message(msg)
+                    self._smtp_used = time.time()
+                    print(f"נשלחה התראה לכתובת {email_config.get('recipient_email')}")
+                    return True
+                except (smtplib.SMTPException, OSError) as e:
+                    self._close_smtp()
+                    if attempt + 1 == max_attempts:
+                        print(f"שגיאה בשליחת דוא\"ל: {e}")
+                        metrics.ERRORS.inc(stage='notify', project=project)
+                        return False
+                    time.sleep(retry_delay * (2 ** attempt))
+
+def get_dispatcher():
+    """קבלת תור ההתראות המשותף של התהליך"""
+    global _dispatcher
+
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = NotificationDispatcher()
+        return _dispatcher
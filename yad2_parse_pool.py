@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מאגר תהליכים לשלב החילוץ של Yad2 MCP
+
+פענוח ה-HTML תלוי מעבד ומוגבל ב-GIL, כך שבסבב עם נושאים ועמודים רבים כל
+החילוץ רץ על ליבה אחת. עמוד גדול מ-parse_pool_min_bytes נשלח כבתים לאחד
+מתהליכי העבודה (parse_workers, ברירת מחדל - מספר הליבות), והמודעות חוזרות
+כ-tuple קומפקטי של Listing. עמוד קטן מזה מפוענח בתהליך הנוכחי, כי התקורה
+של המעבר בין התהליכים גדולה מהחיסכון.
+"""
+
+import os
+import sys
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from yad2_listing import Listing
+from yad2_parsers import get_parser
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _init_worker():
+    """אתחול תהליך עבודה - הפלט עובר ל-stderr (ב-stdout של השרת התושב עוברות רק תשובות)"""
+    sys.stdout = sys.stderr
+
+def _parse_page(data, parser):
+    """פענוח עמוד בתהליך העבודה: בתי HTML -> רשימת tuple של מודעות"""
+    return [item.to_tuple() for item in get_parser(parser)(data.decode('utf-8'))]
+
+class ParsePool:
+    """תהליכי עבודה לפענוח עמודים, עם סף גודל לפענוח בתהליך הנוכחי"""
+
+    def __init__(self, workers, min_bytes):
+        self.workers = workers
+        self.min_bytes = min_bytes
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn ולא fork - התהליך הראשי מריץ תהליכונים שעלולים להחזיק נעילות ברגע ה-fork
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    def parse(self, html_content, parser=None):
+        """המודעות שבעמוד (רשומות Listing), בתהליך עבודה או בתהליך הנוכחי לפי גודל העמוד.
+        בתהליך הנוכחי מוחזר generator, כך שהחילוץ המצטבר עדיין יכול לעצור מוקדם"""
+        data = html_content.encode('utf-8')
+        if len(data) < self.min_bytes:
+            return get_parser(parser)(html_content)
+
+        try:
+            rows = self._get_executor().submit(_parse_page, data, parser).result()
+        except BrokenProcessPool as e:
+            # תהליך עבודה קרס - המאגר ייבנה מחדש בפעם הבאה, והעמוד הזה מפוענח כאן
+            print(f"מאגר תהליכי החילוץ קרס ({e}). מפענח בתהליך הנוכחי.")
+            with self._lock:
+                self._executor = None
+            return list(get_parser(parser)(html_content))
+        return [Listing.from_tuple(row) for row in rows]
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+def get_parse_pool(config):
+    """קבלת מאגר תהליכי החילוץ (אחד לכל תהליך), או None אם יש תהליך עבודה אחד בלבד"""
+    global _pool
+
+    workers = int(config.get('parse_workers', 0) or 0) or os.cpu_count() or 1
+    if workers <= 1:
+        return None
+
+    min_bytes = int(config.get('parse_pool_min_bytes', 131072))
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ParsePool(workers, min_bytes)
+        _pool.min_bytes = min_bytes
+        return _pool
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מנועי חילוץ המודעות מעמודי הפיד של יד2
+
+כל מנוע מקבל את תוכן ה-HTML ומחזיר (כ-generator) רשומות Listing עם השדות
+id, title, price, address, date, image, link.
+המנועים המהירים (selectolax, lxml) עוברים פעם אחת על צאצאי כל מודעה במקום
+להריץ שאילתת CSS נפרדת לכל שדה. BeautifulSoup עם html.parser נשאר כגיבוי.
+
+לפני כל מנועי ה-HTML נבדק הנתיב המהיר (next_data): עמודי יד2 מוטמעים עם הפיד
+כ-JSON בבלוק <script id="__NEXT_DATA__">. הבלוק נמצא בחיפוש מחרוזת ישיר, מפוענח
+ב-json.loads וממופה לאותה סכמה - עם שדות נוספים (חדרים, קומה, מ"ר). עמוד
+ללא הבלוק (או ללא מודעות בו) עובר אוטומטית למנוע ה-HTML.
+"""
+
+import re
+import json
+from datetime import date, datetime
+from bs4 import BeautifulSoup
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from yad2_listing import Listing, format_price
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as SelectolaxParser
+    except ImportError:
+        SelectolaxParser = None
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+# גודל המקטע שמוזן למפענח הזורם של lxml
+LXML_FEED_CHUNK = 16 * 1024
+
+# מחלקות ה-CSS של שדות המודעה, לפי השדה שהן ממלאות
+FIELD_CLASSES = {
+    'title': 'title',
+    'price': 'price',
+    'subtitle': 'address',
+    'date': 'date',
+}
+
+DEFAULT_TEXTS = {
+    'title': "אין כותרת",
+    'price': "מחיר לא צוין",
+    'address': "כתובת לא צוינה",
+    'date': "תאריך לא צוין",
+}
+
+# טקסטים שהאתר מציג כאשר שדה חסר במודעה
+NO_PRICE_TEXT = "לא צוין מחיר"
+
+
+NEXT_DATA_MARKER = 'id="__NEXT_DATA__"'
+
+_TITLE_RE = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+
+def is_captcha_page(html_content):
+    """בדיקה מהירה (ללא בניית עץ) אם העמוד הוא דף CAPTCHA"""
+    match = _TITLE_RE.search(html_content)
+    return bool(match) and "ShieldSquare Captcha" in match.group(1)
+
+def _build_item(item_id, texts, img_url):
+    """בניית רשומת מודעה מהשדות שנאספו (הקישור נגזר מהמזהה)"""
+    return Listing(
+        item_id,
+        texts.get('title', DEFAULT_TEXTS['title']),
+        texts.get('price', DEFAULT_TEXTS['price']),
+        texts.get('address', DEFAULT_TEXTS['address']),
+        texts.get('date', DEFAULT_TEXTS['date']),
+        img_url,
+    )
+
+def _class_list(value):
+    """פירוק ערך מאפיין class לרשימת מחלקות"""
+    return value.split() if value else []
+
+def iter_items_bs4(html_content):
+    """מנוע הגיבוי - BeautifulSoup עם html.parser ושאילתות CSS"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    for item in soup.select('div.feeditem'):
+        try:
+            # מזהה מודעה
+            item_id = item.get('item-id') or item.get('data-item-id')
+
+            texts = {}
+            for css_class, field in FIELD_CLASSES.items():
+                elem = item.select_one(f'.{css_class}')
+                if elem:
+                    texts[field] = elem.text.strip()
+
+            # תמונה
+            img_elem = item.select_one('.image img')
+            img_url = img_elem.get('src') if img_elem else None
+
+            yield _build_item(item_id, texts, img_url)
+        except Exception as e:
+            print(f"שגיאה בחילוץ פרטי מודעה: {e}")
+
+def _lxml_item(item):
+    """חילוץ מודעה מאלמנט lxml - מעבר יחיד על צאצאי המודעה"""
+    item_id = item.get('item-id') or item.get('data-item-id')
+    texts = {}
+    img_url = None
+    found_img = False
+
+    for elem in item.iterdescendants():
+        if not isinstance(elem.tag, str):
+            continue  # הערות והוראות עיבוד
+
+        for css_class in _class_list(elem.get('class')):
+            field = FIELD_CLASSES.get(css_class)
+            if field and field not in texts:
+                texts[field] = elem.text_content().strip()
+
+        if not found_img and elem.tag == 'img':
+            parent = elem.getparent()
+            while parent is not None:
+                if 'image' in _class_list(parent.get('class')):
+                    img_url = elem.get('src')
+                    found_img = True
+                    break
+                if parent is item:
+                    break
+                parent = parent.getparent()
+
+    return _build_item(item_id, texts, img_url)
+
+def _lxml_feed_items(events):
+    """המודעות מתוך אירועי הסגירה של אלמנטי div שהמפענח הזורם סיים לקרוא"""
+    for _, elem in events:
+        if 'feeditem' not in _class_list(elem.get('class')):
+            continue
+
+        try:
+            yield _lxml_item(elem)
+        except Exception as e:
+            print(f"שגיאה בחילוץ פרטי מודעה: {e}")
+
+def iter_items_lxml(html_content):
+    """מנוע lxml - פענוח זורם: כל מודעה מוחזרת ברגע שהאלמנט שלה נסגר
+
+    אם הצרכן מפסיק לקרוא מה-generator, שאר העמוד לא מפוענח כלל.
+    """
+    parser = etree.HTMLPullParser(events=('end',), tag='div', encoding='utf-8')
+    parser.set_element_class_lookup(lxml.html.HtmlElementClassLookup())
+    data = html_content.encode('utf-8')
+
+    for start in range(0, len(data), LXML_FEED_CHUNK):
+        parser.feed(data[start:start + LXML_FEED_CHUNK])
+        yield from _lxml_feed_items(parser.read_events())
+
+    parser.close()
+    yield from _lxml_feed_items(parser.read_events())
+
+def iter_items_selectolax(html_content):
+    """מנוע selectolax - מעבר יחיד על צאצאי כל מודעה"""
+    tree = SelectolaxParser(html_content)
+
+    for item in tree.css('div.feeditem'):
+        try:
+            attributes = item.attributes
+            item_id = attributes.get('item-id') or attributes.get('data-item-id')
+            texts = {}
+            img_url = None
+            found_img = False
+
+            for elem in item.traverse():
+                if elem.mem_id == item.mem_id or elem.tag.startswith('-'):
+                    continue  # המודעה עצמה, טקסט והערות
+
+                elem_attributes = elem.attributes
+                for css_class in _class_list(elem_attributes.get('class')):
+                    field = FIELD_CLASSES.get(css_class)
+                    if field and field not in texts:
+                        texts[field] = elem.text(deep=True).strip()
+
+                if not found_img and elem.tag == 'img':
+                    parent = elem.parent
+                    while parent is not None:
+                        if 'image' in _class_list(parent.attributes.get('class')):
+                            img_url = elem_attributes.get('src')
+                            found_img = True
+                            break
+                        if parent.mem_id == item.mem_id:
+                            break
+                        parent = parent.parent
+
+            yield _build_item(item_id, texts, img_url)
+        except Exception as e:
+            print(f"שגיאה בחילוץ פרטי מודעה: {e}")
+
+def _text(value):
+    """טקסט מערך JSON - ערכי יד2 מגיעים לעתים כ-{"text": ...}"""
+    if isinstance(value, dict):
+        value = value.get('text')
+    return str(value).strip() if value not in (None, '') else None
+
+def _relative_date(value):
+    """תאריך העדכון בפורמט שמוצג בפיד ("עודכן היום", "עודכן לפני 3 ימים")"""
+    try:
+        updated = datetime.fromisoformat(str(value).replace('Z', '+00:00')).date()
+    except ValueError:
+        return None
+    days = (date.today() - updated).days
+    return "עודכן היום" if days <= 0 else f"עודכן לפני {days} ימים"
+
+def _is_feed_item(value):
+    return isinstance(value, dict) and ('token' in value or 'link_token' in value)
+
+def _iter_feed_lists(data):
+    """רשימות המודעות שבתוך ה-JSON, לפי סדר הופעתן (מבנה הדף משתנה בין סוגי הפיד)"""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, list):
+            if value and _is_feed_item(value[0]):
+                yield value
+            else:
+                stack.extend(reversed(value))
+        elif isinstance(value, dict):
+            stack.extend(reversed(list(value.values())))
+
+def _json_item(data):
+    """מיפוי מודעה מה-JSON של יד2 לרשומת Listing"""
+    item_id = data.get('token') or data.get('link_token') or data.get('id')
+    address = data.get('address') or {}
+    house = address.get('house') or {}
+    details = data.get('additionalDetails') or {}
+    meta = data.get('metaData') or {}
+
+    title = ' '.join(part for part in (_text(address.get('street')), _text(house.get('number'))) if part)
+
+    price = data.get('price')
+    if isinstance(price, (int, float)):
+        price = format_price(int(price))
+    price = _text(price) or NO_PRICE_TEXT
+
+    address_parts = (_text(details.get('property')), _text(address.get('neighborhood')), _text(address.get('city')))
+    address_text = ', '.join(part for part in address_parts if part)
+
+    updated = (data.get('dates') or {}).get('updatedAt') or data.get('updatedAt')
+    images = meta.get('images')
+    image = meta.get('coverImage') or (images[0] if images else None)
+
+    extra = {}
+    for field, value in (('rooms', details.get('roomsCount')), ('floor', house.get('floor')),
+                         ('square_meters', details.get('squareMeter'))):
+        if value is not None:
+            extra[field] = value
+
+    return Listing(
+        str(item_id) if item_id is not None else None,
+        title or DEFAULT_TEXTS['title'],
+        price,
+        address_text or DEFAULT_TEXTS['address'],
+        (_relative_date(updated) if updated else None) or DEFAULT_TEXTS['date'],
+        image,
+        extra=extra,
+    )
+
+def find_next_data(html_content):
+    """ה-JSON המוטמע בבלוק __NEXT_DATA__ (None אם אין בלוק או שאינו תקין)
+
+    חיפוש מחרוזת ישיר של הסימון ושל סוף הבלוק - בלי לבנות עץ של העמוד.
+    """
+    marker = html_content.find(NEXT_DATA_MARKER)
+    if marker < 0:
+        return None
+    start = html_content.find('>', marker) + 1
+    end = html_content.find('</script>', start)
+    if start <= 0 or end < 0:
+        return None
+
+    try:
+        return orjson.loads(html_content[start:end]) if orjson is not None else json.loads(html_content[start:end])
+    except ValueError:
+        return None
+
+def next_data_items(html_content):
+    """רשימת המודעות מה-JSON המוטמע, או None אם בעמוד אין פיד כזה"""
+    data = find_next_data(html_content)
+    if data is None:
+        return None
+
+    items = []
+    seen = set()
+    for feed_list in _iter_feed_lists(data):
+        for entry in feed_list:
+            if not _is_feed_item(entry):
+                continue
+            try:
+                item = _json_item(entry)
+            except Exception as e:
+                print(f"שגיאה בחילוץ פרטי מודעה: {e}")
+                continue
+            if item.id not in seen:
+                seen.add(item.id)
+                items.append(item)
+    return items or None
+
+def with_next_data(html_parser):
+    """מנוע שמנסה קודם את הנתיב המהיר (__NEXT_DATA__) ועובר ל-html_parser אם אין בעמוד פיד מוטמע"""
+    def iter_items(html_content):
+        items = next_data_items(html_content)
+        if items is None:
+            yield from html_parser(html_content)
+        else:
+            yield from items
+
+    return iter_items
+
+# המנועים לפי סדר העדפה במצב 'auto'
+PARSERS = {
+    'selectolax': (iter_items_selectolax, lambda: SelectolaxParser is not None),
+    'lxml': (iter_items_lxml, lambda: lxml is not None),
+    'html.parser': (iter_items_bs4, lambda: True),
+}
+
+_warned_parsers = set()
+
+def available_parsers():
+    """שמות המנועים הזמינים בסביבה הנוכחית, לפי סדר העדפה"""
+    return [name for name, (_, is_available) in PARSERS.items() if is_available()]
+
+def get_parser(name=None):
+    """בחירת מנוע חילוץ לפי שם. מנוע לא זמין או 'auto' - המנוע הזמין המועדף
+
+    'auto' ו-'next_data' מנסים קודם את ה-JSON המוטמע; שם של מנוע HTML מסוים
+    משתמש רק בו.
+    """
+    name = name or 'auto'
+    if name not in ('auto', 'next_data'):
+        if name in PARSERS and PARSERS[name][1]():
+            return PARSERS[name][0]
+        if name not in _warned_parsers:
+            _warned_parsers.add(name)
+            print(f"מנוע החילוץ '{name}' אינו זמין. משתמש במנוע ברירת המחדל.")
+
+    return with_next_data(PARSERS[available_parsers()[0]][0])
@@ -7,14 +7,30 @@ Yad2 MCP Service - שירות MCP לסריקת מודעות חדשות ביד2
 """
 
 import os
+import re
+import sys
 import json
 import time
-import smtplib
 import argparse
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from urllib.parse import urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
 import requests
-from bs4 import BeautifulSoup
+from yad2_parsers import get_parser, is_captcha_page
+from yad2_parse_pool import get_parse_pool
+from yad2_fetch_plan import build_fetch_plan, canonical_url, derive_items, item_matches
+from yad2_archive import get_archive
+from yad2_store import get_store, legacy_json_path
+from yad2_listing import Listing, as_dict, describe_change, describe_details
+from yad2_governor import get_governor, RETRY_STATUSES
+from yad2_notify import get_dispatcher, email_settings_missing
+from yad2_cache import get_result_cache
+from yad2_config import CONFIG_FILE, get_config_manager
+from yad2_http import NOT_MODIFIED, get_session, conditional_headers, remember_validators, forget_validators
+import yad2_metrics as metrics
+import yad2_deadline as deadlines
 from datetime import datetime
 import random
 import traceback
@@ -26,11 +42,27 @@ USER_AGENTS = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:90.0) Gecko/20100101 Firefox/90.0'
 ]
 
-def load_config():
-    """טעינת הגדרות מקובץ התצורה"""
+# סמפורים להגבלת מספר הבקשות המקבילות לכל שרת, לפי (שרת, מגבלה)
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+# מילה בשורת פקודה: ערך במירכאות (גם אחרי key=) שנסגרות רק לפני רווח או בסוף השורה, או רצף ללא רווחים.
+# כך גרש וגרשיים בתוך מילה (ז'בוטינסקי, ת"א) נשארים חלק ממנה
+_ARG_RE = re.compile(r"""(\S*?=)?(["'])(.*?)\2(?=\s|$)|\S+""")
+
+# נושאים שהסריקה שלהם חרגה מהזמן בסבב הקודם - נסרקים ראשונים בסבב הבא
+_overdue_topics = set()
+
+# מאגר תהליכונים משותף לטעינה מוקדמת של עמודי חיפוש
+_prefetch_executor = None
+_prefetch_executor_lock = threading.Lock()
+
+def load_config(config_path=CONFIG_FILE):
+    """טעינת הגדרות מקובץ התצורה (מהמטמון, אלא אם הקובץ השתנה מאז הטעינה הקודמת)"""
+    manager = get_config_manager(config_path)
     
     # אם אין קובץ הגדרות, נייצר אחד עם הגדרות ברירת מחדל
-    if not os.path.exists('config.json'):
+    if not manager.exists():
         default_config = {
             "email": {
                 "enabled": False,
@@ -38,7 +70,10 @@ def load_config():
                 "smtp_port": 587,
                 "sender_email": "your-email@gmail.com",
                 "sender_password": "your-app-password",
-                "recipient_email": "your-email@gmail.com"
+                "recipient_email": "your-email@gmail.com",
+                "use_tls": True,
+                "digest": False,
+                "max_attempts": 3
             },
             "projects": [
                 {
@@ -49,23 +84,62 @@ def load_config():
             ],
             "data_dir": "data",
             "check_interval_minutes": 15,
+            "max_concurrent_scans": 8,
+            "max_concurrent_per_host": 4,
+            "html_parser": "auto",
+            "parse_workers": 0,
+            "parse_pool_min_bytes": 131072,
+            "incremental_stop_after_known": 5,
+            "detect_changes": True,
+            "history_retention": {
+                "max_age_days": 90,
+                "max_items_per_topic": 5000
+            },
+            "max_pages": 3,
+            "page_prefetch": 1,
+            "fetch_plan": "dedupe",
+            "deadlines": {
+                "connect_timeout_seconds": 5,
+                "read_timeout_seconds": 20,
+                "project_seconds": 180,
+                "cycle_seconds": 600,
+                "client_seconds": 900
+            },
+            "raw_archive": {
+                "enabled": False,
+                "max_age_days": 30
+            },
+            "scan_cache_ttl_seconds": 60,
+            "scan_cache_max_entries": 128,
+            "metrics_port": 0,
+            "server_port": 47892,
+            "server_idle_minutes": 120,
+            "fetch_governor": {
+                "requests_per_second": 2.0,
+                "burst": 5,
+                "max_retries": 3,
+                "captcha_cooldown_minutes": 15,
+                "captcha_cooldown_max_minutes": 360
+            },
             "auto_scan": True  # הוספת הגדרה לסריקה אוטומטית
         }
         
         os.makedirs('data', exist_ok=True)
         
-        with open('config.json', 'w', encoding='utf-8') as f:
-            json.dump(default_config, f, ensure_ascii=False, indent=2)
-        
-        print("נוצר קובץ הגדרות חדש (config.json). אנא ערוך אותו לפני הרצה.")
-        return default_config
+        if manager.create(default_config):
+            print("נוצר קובץ הגדרות חדש (config.json). אנא ערוך אותו לפני הרצה.")
     
     # טעינת הגדרות מהקובץ
-    with open('config.json', 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return manager.get()
 
-def get_yad2_response(url):
-    """קבלת תוכן העמוד מיד2"""
+def get_yad2_response(url, config=None, conditional=True):
+    """קבלת תוכן העמוד מיד2
+    
+    כאשר מועברות הגדרות (ו-conditional), נשלחת בקשה מותנית לפי ה-ETag/Last-Modified
+    הקודמים, ואם העמוד לא השתנה מוחזר NOT_MODIFIED.
+    לכל בקשה יש timeout להתחברות ולקריאה (deadlines), מוגבל לזמן שנותר עד מועד הסיום של
+    הפרויקט או הסבב; אחרי מועד הסיום נזרקת DeadlineExceeded במקום ניסיון נוסף.
+    """
     headers = {
         'User-Agent': random.choice(USER_AGENTS),
         'Accept-Language': 'he-IL,he;q=0.9,en-US;q=0.8,en;q=0.7',
@@ -74,237 +148,732 @@ def get_yad2_response(url):
         'sec-ch-ua': '"Chromium";v="110", "Not A(Brand";v="24", "Google Chrome";v="110"'
     }
     
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.text
-    except requests.exceptions.RequestException as e:
-        print(f"שגיאה בקבלת תוכן מיד2: {e}")
-        return None
-
-def extract_items(html_content):
-    """חילוץ פרטי המודעות מתוך תוכן ה-HTML"""
-    if not html_content:
-        return []
-    
-    soup = BeautifulSoup(html_content, 'html.parser')
+    governor = get_governor(config or {})
+    project = metrics.current_project()
     
-    # בדיקה אם יש דף CAPTCHA
-    if soup.title and "ShieldSquare Captcha" in soup.title.text:
-        print("זוהה דף CAPTCHA - יד2 חוסם את הגישה. נסה שוב מאוחר יותר.")
-        return []
+    conditional = conditional and config is not None
+    if conditional:
+        headers.update(conditional_headers(url, config, project))
     
-    items = []
-    feed_items = soup.select('div.feeditem')
-    
-    for item in feed_items:
-        try:
-            # מזהה מודעה
-            item_id = item.get('item-id') or item.get('data-item-id')
+    with metrics.timed_stage('fetch', project):
+        for attempt in range(governor.max_retries + 1):
+            # המפסק פתוח (CAPTCHA לאחרונה) - לא שולחים בקשות עד סוף הקירור
+            blocked_until = governor.blocked_until()
+            if blocked_until:
+                print(f"הסריקה מושהית בגלל CAPTCHA עד {datetime.fromtimestamp(blocked_until).strftime('%H:%M')}. מדלג על {url}")
+                return None
             
-            # כותרת המודעה
-            title_elem = item.select_one('.title')
-            title = title_elem.text.strip() if title_elem else "אין כותרת"
+            governor.throttle(url)
+            deadlines.check()
+            try:
+                response = get_session(config).get(url, headers=headers, timeout=deadlines.request_timeout(config or {}))
+            except requests.exceptions.RequestException as e:
+                if attempt < governor.max_retries and not deadlines.expired():
+                    time.sleep(deadlines.clip(governor.backoff_delay(attempt)))
+                    continue
+                deadlines.check()
+                print(f"שגיאה בקבלת תוכן מיד2: {e}")
+                metrics.ERRORS.inc(stage='fetch', project=project)
+                return None
             
-            # מחיר
-            price_elem = item.select_one('.price')
-            price = price_elem.text.strip() if price_elem else "מחיר לא צוין"
+            # שגיאה זמנית בצד השרת - ניסיון חוזר אחרי המתנה
+            if response.status_code in RETRY_STATUSES and attempt < governor.max_retries:
+                time.sleep(deadlines.clip(governor.backoff_delay(attempt, response.headers.get('Retry-After'))))
+                continue
             
-            # תמונה
-            img_elem = item.select_one('.image img')
-            img_url = img_elem.get('src') if img_elem else None
+            if response.status_code == 304:
+                governor.record_success()
+                return NOT_MODIFIED
             
-            # קישור למודעה
-            link = f"https://www.yad2.co.il/item/{item_id}" if item_id else None
+            try:
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                print(f"שגיאה בקבלת תוכן מיד2: {e}")
+                metrics.ERRORS.inc(stage='fetch', project=project)
+                return None
             
-            # כתובת
-            address_elem = item.select_one('.subtitle')
-            address = address_elem.text.strip() if address_elem else "כתובת לא צוינה"
+            metrics.FETCHED_BYTES.inc(len(response.content), project=project)
             
-            # תאריך פרסום
-            date_elem = item.select_one('.date')
-            date = date_elem.text.strip() if date_elem else "תאריך לא צוין"
+            # דף CAPTCHA פותח את המפסק ועוצר את שאר הבקשות לזמן הקירור
+            if is_captcha_page(response.text):
+                metrics.CAPTCHA_HITS.inc(project=project)
+                governor.trip()
+                return response.text
             
-            items.append({
-                'id': item_id,
-                'title': title,
-                'price': price,
-                'address': address,
-                'date': date,
-                'image': img_url,
-                'link': link
-            })
-        except Exception as e:
-            print(f"שגיאה בחילוץ פרטי מודעה: {e}")
+            governor.record_success()
+            if conditional:
+                remember_validators(url, response, config, project)
+            
+            # שמירת העמוד הגולמי בארכיון (raw_archive), לעיבוד מחדש ללא גישה לרשת
+            archive = get_archive(config or {})
+            if archive is not None:
+                try:
+                    archive.record(project or '', url, response.text)
+                except Exception as e:
+                    print(f"שגיאה בשמירת העמוד בארכיון: {e}")
+            return response.text
+
+def iter_extract_items(html_content, parser=None, pool=None):
+    """חילוץ עצל של המודעות מתוך תוכן ה-HTML - מודעה אחר מודעה, לפי סדר הופעתן בעמוד
+    
+    parser - שם מנוע החילוץ (next_data, selectolax, lxml, html.parser או auto)
+    pool - מאגר תהליכי החילוץ (get_parse_pool). עמוד גדול מפוענח כולו בתהליך עבודה
+    """
+    if not html_content:
+        return
+    
+    # בדיקה אם יש דף CAPTCHA
+    if is_captcha_page(html_content):
+        print("זוהה דף CAPTCHA - יד2 חוסם את הגישה. נסה שוב מאוחר יותר.")
+        return
+    
+    if pool is not None:
+        yield from pool.parse(html_content, parser)
+    else:
+        yield from get_parser(parser)(html_content)
+
+def extract_items(html_content, parser=None, pool=None):
+    """חילוץ פרטי המודעות מתוך תוכן ה-HTML"""
+    with metrics.timed_stage('parse'):
+        items = list(iter_extract_items(html_content, parser, pool))
+    metrics.ITEMS_PARSED.inc(len(items), project=metrics.current_project())
     
     print(f"נמצאו {len(items)} מודעות בעמוד.")
     return items
 
+def extract_new_items_prefix(html_content, topic, config, is_known=None):
+    """חילוץ מודעות עד לרצף של מודעות שכבר שמורות בנושא
+    
+    הפיד של יד2 ממוין מהחדש לישן, ולכן אחרי incremental_stop_after_known מודעות
+    מוכרות ברצף אין טעם להמשיך לפענח את העמוד (או לבקש עמודים נוספים).
+    is_known - בדיקת מודעה מוכרת (ברירת מחדל - לפי הנושא; בסריקה משותפת - לפי כל הנושאים).
+    מוחזרים (המודעות שנקראו, האם החילוץ נעצר מוקדם).
+    """
+    parser = config.get('html_parser', 'auto')
+    pool = get_parse_pool(config)
+    stop_after = int(config.get('incremental_stop_after_known', 0))
+    if stop_after <= 0:
+        return extract_items(html_content, parser, pool), False
+    
+    is_known = is_known or known_checker(topic, config)
+    items = []
+    known_run = 0
+    stopped = False
+    
+    with metrics.timed_stage('parse', topic):
+        for item in iter_extract_items(html_content, parser, pool):
+            items.append(item)
+            known_run = known_run + 1 if is_known(item) else 0
+            if known_run >= stop_after:
+                stopped = True
+                break
+    metrics.ITEMS_PARSED.inc(len(items), project=topic)
+    
+    if stopped:
+        print(f"נבדקו {len(items)} מודעות. החילוץ נעצר לאחר {known_run} מודעות מוכרות ברצף.")
+    else:
+        print(f"נמצאו {len(items)} מודעות בעמוד.")
+    return items, stopped
+
+def get_topic_store(topic, config):
+    """קבלת מאגר המודעות, אחרי ייבוא חד-פעמי של קובץ ה-JSON הישן של הנושא (אם קיים)"""
+    store = get_store(config)
+    store.import_legacy_json(topic, legacy_json_path(topic, config))
+    return store
+
+def known_checker(topic, config, shared=()):
+    """פונקציה שבודקת אם מודעה כבר מוכרת (וללא שינויים, במצב detect_changes)
+    
+    shared - [(פרויקט, מסננים)] שנגזרים מאותה סריקה: המודעה נחשבת מוכרת רק אם היא מוכרת
+    גם בכל נושא שהיא מתאימה למסננים שלו.
+    """
+    store = get_topic_store(topic, config)
+    same_fields = config.get('detect_changes', True)
+    topics = [(topic, [])]
+    for project, filters in shared:
+        member_topic = project.get('topic', '').strip()
+        get_topic_store(member_topic, config)
+        topics.append((member_topic, filters))
+    
+    def is_known(item):
+        for known_topic, filters in topics:
+            if filters and item_matches(item, filters) is False:
+                continue
+            if not store.is_known(known_topic, item, same_fields):
+                return False
+        return True
+    
+    return is_known
+
 def check_for_new_items(items, topic, config):
     """בדיקה אם יש מודעות חדשות"""
-    data_dir = config.get('data_dir', 'data')
-    os.makedirs(data_dir, exist_ok=True)
-    file_path = os.path.join(data_dir, f"{topic.replace(' ', '_')}.json")
+    return check_for_updates(items, topic, config)[0]
+
+def check_for_updates(items, topic, config):
+    """בדיקה אם יש מודעות חדשות או מודעות מוכרות שהשתנו (detect_changes)
     
-    saved_items = []
-    if os.path.exists(file_path):
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                saved_items = json.load(f)
-        except Exception as e:
-            print(f"שגיאה בקריאת קובץ {file_path}: {e}")
+    מוחזרים (מודעות חדשות, מודעות ששונו). לכל מודעה ששונתה מצורף השדה 'changes'
+    עם {שדה: [ערך ישן, ערך חדש]}.
+    """
+    store = get_topic_store(topic, config)
     
-    # זיהוי מודעות חדשות לפי מזהה
-    saved_ids = [item.get('id') for item in saved_items]
-    new_items = [item for item in items if item.get('id') not in saved_ids]
+    # זיהוי ושמירת מודעות חדשות לפי מזהה, ומודעות ששונו לפי גיבוב השדות
+    new_items, changes = store.apply_scan(topic, items, config.get('detect_changes', True))
+    changed_items = [Listing.from_dict(dict(as_dict(item), changes=delta)) for item, delta in changes]
+    metrics.NEW_ITEMS.inc(len(new_items), project=topic)
+    metrics.CHANGED_ITEMS.inc(len(changed_items), project=topic)
     
-    # עדכון הקובץ אם יש מודעות חדשות
     if new_items:
-        updated_items = saved_items + new_items
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(updated_items, f, ensure_ascii=False, indent=2)
-        
         print(f"נמצאו {len(new_items)} מודעות חדשות בנושא '{topic}'.")
     else:
         print(f"לא נמצאו מודעות חדשות בנושא '{topic}'.")
+    if changed_items:
+        print(f"{len(changed_items)} מודעות מוכרות עודכנו בנושא '{topic}'.")
     
-    return new_items
+    return new_items, changed_items
+
+def compact_topics(topics, config):
+    """העברת ההיסטוריה הישנה של הנושאים לקטעים דחוסים (לפי history_retention) - פעם אחת בסוף הסבב"""
+    retention = config.get('history_retention', {})
+    store = get_store(config)
+    for topic in dict.fromkeys(topics):
+        try:
+            store.compact_history(topic, retention.get('max_age_days', 0), retention.get('max_items_per_topic', 0))
+        except Exception as e:
+            print(f"שגיאה בהעברת ההיסטוריה של '{topic}': {e}")
 
 def send_email_notification(new_items, topic, config):
-    """שליחת התראה בדוא"ל על מודעות חדשות"""
+    """הוספת התראה בדוא"ל על מודעות חדשות לתור השליחה (השליחה עצמה ברקע)"""
     if not config.get('email', {}).get('enabled', False):
         return False
     
     email_config = config.get('email', {})
-    smtp_server = email_config.get('smtp_server')
-    smtp_port = email_config.get('smtp_port')
-    sender_email = email_config.get('sender_email')
-    sender_password = email_config.get('sender_password')
-    recipient_email = email_config.get('recipient_email')
     
-    if not all([smtp_server, smtp_port, sender_email, sender_password, recipient_email]):
+    if email_settings_missing(email_config):
         print("חסרים פרטי דוא\"ל בהגדרות. לא נשלחה התראה.")
         return False
     
+    get_dispatcher().enqueue(topic, new_items, email_config)
+    return True
+
+def listing_lines(index, item, title_suffix=''):
+    """שורות התצוגה של מודעה, עם שורה ריקה בסוף"""
+    lines = [
+        f"{index}. {item.get('title', 'אין כותרת')}{title_suffix}",
+        f"   מחיר: {item.get('price', 'מחיר לא צוין')}",
+        f"   כתובת: {item.get('address', 'כתובת לא צוינה')}",
+    ]
+    details = describe_details(item)
+    if details:
+        lines.append(f"   פרטים: {details}")
+    lines.append(f"   תאריך: {item.get('date', 'תאריך לא צוין')}")
+    lines.append(f"   קישור: {item.get('link', '#')}")
+    lines.append('')
+    return lines
+
+def format_items_for_response(new_items, topic, changed_items=()):
+    """פרמוט המודעות החדשות (והמודעות ששונו) לתצוגה"""
+    if not new_items and not changed_items:
+        return f"לא נמצאו מודעות חדשות בנושא '{topic}'."
+    
+    # השורות נאספות לרשימה ומחוברות פעם אחת בסוף
+    if new_items:
+        lines = [f"נמצאו {len(new_items)} מודעות חדשות בנושא '{topic}':", '']
+    else:
+        lines = [f"לא נמצאו מודעות חדשות בנושא '{topic}'.", '']
+    
+    for i, item in enumerate(new_items, 1):
+        lines.extend(listing_lines(i, item))
+    
+    if changed_items:
+        lines.extend([f"{len(changed_items)} מודעות מוכרות עודכנו בנושא '{topic}':", ''])
+    
+    for i, item in enumerate(changed_items, 1):
+        lines.append(f"{i}. {item.get('title', 'אין כותרת')}")
+        for field, (old, new) in item.get('changes', {}).items():
+            lines.append(f"   {describe_change(field, old, new)}")
+        lines.extend([f"   קישור: {item.get('link', '#')}", ''])
+    
+    return '\n'.join(lines) + '\n'
+
+def parse_amount(text):
+    """סכום מטקסט כמו 2500000, 2,500,000, 2.5M או 900K"""
+    text = text.strip().replace(',', '').replace('₪', '').lower()
+    multiplier = 1
+    if text.endswith('m'):
+        multiplier, text = 1_000_000, text[:-1]
+    elif text.endswith('k'):
+        multiplier, text = 1_000, text[:-1]
+    return int(float(text) * multiplier)
+
+def split_args(text):
+    """פיצול שורת ארגומנטים גולמית למילים, עם מירכאות לערכים שיש בהם רווחים"""
+    return [(match.group(1) or '') + match.group(3) if match.group(2) else match.group(0)
+            for match in _ARG_RE.finditer(text)]
+
+def command_args(args):
+    """ארגומנטי הפקודה כרשימה: מחרוזת גולמית אחת (למשל מ-claude_interface) מפוצלת עם split_args,
+    ורשימה שכבר פוצלה (שורת הפקודה, MCP) נשארת כמו שהיא"""
+    if isinstance(args, str):
+        return split_args(args)
+    return list(args or [])
+
+def parse_search_args(args):
+    """פירוק הארגומנטים של פקודת search למסננים
+    
+    מפתחות: topic=, min_price=, max_price=, days=, sort=(newest/oldest/price/-price), limit=
+    כל מילה אחרת מחופשת בכתובת ובכותרת המודעה.
+    """
+    filters = {'topics': [], 'min_price': None, 'max_price': None, 'since': None,
+               'text': [], 'order': 'newest', 'limit': 20}
+    
+    for token in args:
+        key, separator, value = token.partition('=')
+        if not separator:
+            filters['text'].append(token)
+        elif key == 'topic':
+            filters['topics'].append(value)
+        elif key in ('min_price', 'max_price'):
+            filters[key] = parse_amount(value)
+        elif key == 'days':
+            filters['since'] = time.time() - float(value) * 86400
+        elif key == 'sort':
+            filters['order'] = value
+        elif key == 'limit':
+            filters['limit'] = int(value)
+        else:
+            raise ValueError(f"מסנן לא מוכר: '{key}'")
+    
+    filters['text'] = ' '.join(filters['text'])
+    return filters
+
+def search_listings(args, config):
+    """חיפוש במודעות השמורות מכל הנושאים (פקודת search)"""
+    try:
+        filters = parse_search_args(args)
+    except ValueError as e:
+        return f"שימוש שגוי בפקודת search: {e}"
+    
+    # ייבוא קבצי JSON ישנים של הנושאים, כדי שגם הם ייכללו בחיפוש
+    for project in config.get('projects', []):
+        if project.get('topic', '').strip():
+            get_topic_store(project['topic'].strip(), config)
+    
+    start = time.perf_counter()
+    results = get_store(config).search(**filters)
+    elapsed = (time.perf_counter() - start) * 1000
+    
+    if not results:
+        return f"לא נמצאו מודעות מתאימות ({elapsed:.1f}ms)."
+    
+    lines = [f"נמצאו {len(results)} מודעות ({elapsed:.1f}ms):", '']
+    for i, (topics, item, first_seen) in enumerate(results, 1):
+        lines.extend([
+            f"{i}. {item.get('title', 'אין כותרת')} [{topics}]",
+            f"   מחיר: {item.get('price', 'מחיר לא צוין')}",
+            f"   כתובת: {item.get('address', 'כתובת לא צוינה')}",
+            f"   נמצאה לראשונה: {datetime.fromtimestamp(first_seen).strftime('%d/%m/%Y %H:%M')}",
+            f"   קישור: {item.get('link', '#')}",
+            '',
+        ])
+    
+    return '\n'.join(lines) + '\n'
+
+def listings_since(cursor, config, topics=None, limit=100):
+    """המודעות שנשמרו אחרי cursor, כמבנה JSON - ללא סריקה ובלי לקרוא את כל ההיסטוריה
+
+    מוחזר {'cursor': ה-cursor לקריאה הבאה, 'more': האם נשארו מודעות, 'items': [...]};
+    לכל מודעה מצורפים המספר הסידורי ('seq'), הנושא וזמן השמירה ('first_seen').
+    """
+    # ייבוא קבצי JSON ישנים של הנושאים, כדי שהמספור יכלול גם אותם
+    for project in config.get('projects', []):
+        if project.get('topic', '').strip():
+            get_topic_store(project['topic'].strip(), config)
+    
+    limit = max(1, int(limit))
+    rows, next_cursor = get_store(config).since(int(cursor), topics, limit)
+    items = [dict(as_dict(item), seq=seq, topic=topic, first_seen=first_seen) for seq, topic, item, first_seen in rows]
+    return {'cursor': next_cursor, 'more': len(rows) == limit, 'items': items}
+
+def since_command(args, config):
+    """מודעות שנשמרו מאז cursor (פקודת since) - JSON, או טקסט עם format=text"""
+    cursor = 0
+    topics = []
+    limit = 100
+    output = 'json'
     try:
-        # יצירת הודעה
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = f"🔍 נמצאו {len(new_items)} מודעות חדשות ב{topic}"
-        msg['From'] = sender_email
-        msg['To'] = recipient_email
+        for arg in args:
+            key, separator, value = arg.partition('=')
+            if not separator:
+                cursor = int(arg)
+            elif key == 'topic':
+                topics.append(value.strip())
+            elif key == 'limit':
+                limit = int(value)
+            elif key == 'format' and value in ('json', 'text'):
+                output = value
+            else:
+                raise ValueError(f"ארגומנט לא מוכר: '{arg}'")
+    except ValueError as e:
+        return f"שימוש שגוי בפקודת since: {e}"
+    
+    result = listings_since(cursor, config, topics, limit)
+    if output == 'json':
+        return json.dumps(result, ensure_ascii=False)
+    
+    if not result['items']:
+        return f"אין מודעות חדשות מאז {cursor}. cursor: {result['cursor']}"
+    
+    lines = [f"{len(result['items'])} מודעות נשמרו מאז {cursor}:", '']
+    for i, item in enumerate(result['items'], 1):
+        lines.extend(listing_lines(i, item, f" [{item['topic']}]"))
+    lines.append(f"cursor: {result['cursor']}" + (" (יש מודעות נוספות)" if result['more'] else ''))
+    return '\n'.join(lines)
+
+def reprocess_archive(args, config):
+    """עיבוד מחדש של העמודים השמורים בארכיון (פקודת reprocess), ללא גישה לרשת
+    
+    העמודים נפרסים ומפוענחים במקביל (עד max_concurrent_scans, ועמודים גדולים במאגר
+    תהליכי החילוץ), ומוזנים להשוואה מול המאגר לפי סדר הבקשות המקורי. מודעות שחסרות
+    בנושא נוספות עם זמן הבקשה כזמן ההופעה הראשונה; מודעות קיימות לא משתנות (העמוד
+    השמור ישן מהמאגר) ולא נשלחות התראות.
+    """
+    words = []
+    since = None
+    for arg in args:
+        if arg.startswith('days='):
+            try:
+                since = time.time() - float(arg[len('days='):]) * 86400
+            except ValueError:
+                return f"שימוש שגוי בפקודת reprocess: מספר ימים לא תקין '{arg}'"
+        else:
+            words.append(arg)
+    # שם נושא יכול להגיע במירכאות או כמה מילים בלי מירכאות
+    topic = ' '.join(words).strip() or None
+    
+    archive = get_archive(config, for_reading=True)
+    if archive is None:
+        return "אין ארכיון עמודים. להפעלת השמירה: raw_archive.enabled בקובץ ההגדרות."
+    
+    # העמוד משויך לנושא שביקש אותו ולכל פרויקט עם אותה כתובת מנורמלת
+    topics_by_url = {}
+    for project in config.get('projects', []):
+        project_topic = project.get('topic', '').strip()
+        if project_topic and project.get('url', '').strip():
+            topics_by_url.setdefault(canonical_url(project['url']), set()).add(project_topic)
+    
+    jobs = []
+    skipped = 0
+    last_page = {}
+    for fetch_topic, url, fetched_at, digest in archive.fetches(since=since):
+        targets = ({fetch_topic} | topics_by_url.get(canonical_url(url), set())) - {''}
+        if topic:
+            targets &= {topic}
+        if not targets:
+            continue
         
-        # יצירת תוכן HTML
-        html = f"""
-        <html dir="rtl">
-        <head>
-            <meta charset="utf-8">
-            <style>
-                body {{ font-family: Arial, sans-serif; direction: rtl; }}
-                .item {{ border: 1px solid #ddd; margin: 10px 0; padding: 15px; border-radius: 5px; }}
-                .title {{ font-size: 18px; font-weight: bold; color: #3366cc; }}
-                .price {{ font-size: 16px; color: #e63946; font-weight: bold; }}
-                .link {{ color: #3366cc; }}
-                .address {{ color: #666; }}
-                .date {{ color: #888; font-size: 14px; }}
-            </style>
-        </head>
-        <body>
-            <h2>נמצאו {len(new_items)} מודעות חדשות ב{topic}</h2>
-            <p>הסריקה בוצעה בתאריך: {datetime.now().strftime('%d/%m/%Y %H:%M')}</p>
-        """
+        # עמוד זהה לבקשה הקודמת של אותה כתובת לא יכול להוסיף מודעות
+        key = (url, tuple(sorted(targets)))
+        if last_page.get(key) == digest:
+            skipped += 1
+            continue
+        last_page[key] = digest
+        jobs.append((key[1], fetched_at, digest))
+    
+    if not jobs:
+        return "לא נמצאו עמודים מתאימים בארכיון."
+    
+    parser = config.get('html_parser', 'auto')
+    pool = get_parse_pool(config)
+    
+    def parse_job(job):
+        return list(iter_extract_items(archive.load(job[2]), parser, pool))
+    
+    added = {}
+    errors = 0
+    start = time.perf_counter()
+    workers = max(1, int(config.get('max_concurrent_scans', 8)))
+    
+    def apply_job(job, future):
+        nonlocal errors
+        try:
+            items = future.result()
+        except Exception as e:
+            errors += 1
+            print(f"שגיאה בחילוץ עמוד מהארכיון: {e}")
+            return
+        targets, fetched_at, _ = job
+        for target in targets:
+            new_items, _ = get_topic_store(target, config).apply_scan(target, items, seen_at=fetched_at)
+            added[target] = added.get(target, 0) + len(new_items)
+    
+    # חלון חסום של עמודים בפענוח, כדי שהזיכרון לא יגדל עם גודל הארכיון
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for job in jobs:
+            pending.append((job, executor.submit(parse_job, job)))
+            if len(pending) >= workers * 2:
+                apply_job(*pending.popleft())
+        while pending:
+            apply_job(*pending.popleft())
+    
+    compact_topics(added, config)
+    
+    elapsed = time.perf_counter() - start
+    lines = [f"עובדו {len(jobs)} עמודים מהארכיון ב-{elapsed:.1f} שניות"
+             + (f" ({skipped} עמודים זהים לבקשה הקודמת דולגו)." if skipped else ".")]
+    if errors:
+        lines.append(f"{errors} עמודים לא חולצו בגלל שגיאה.")
+    lines.extend(f"- {target}: {count} מודעות נוספו להיסטוריה" for target, count in added.items())
+    return '\n'.join(lines) + '\n'
+
+def acquire_host_slot(url, config):
+    """קבלת סמפור המגביל את מספר הבקשות המקבילות לאותו שרת"""
+    host = urlparse(url).netloc.lower()
+    limit = max(1, int(config.get('max_concurrent_per_host', 4)))
+    
+    with _host_semaphores_lock:
+        semaphore = _host_semaphores.get((host, limit))
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(limit)
+            _host_semaphores[(host, limit)] = semaphore
+    
+    return semaphore
+
+def page_url(url, page):
+    """כתובת עמוד מספר page של חיפוש (עמוד 1 הוא הכתובת המקורית)"""
+    if page <= 1:
+        return url
+    
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if key != 'page']
+    query.append(('page', str(page)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def fetch_page(url, config, conditional=True):
+    """קבלת עמוד אחד, בכפוף למגבלת הבקשות המקבילות לשרת ולמועד הסיום"""
+    slot = acquire_host_slot(url, config)
+    if not slot.acquire(timeout=deadlines.remaining()):
+        raise deadlines.DeadlineExceeded(f"לא התפנה מקום לבקשה ל-{url} עד מועד הסיום")
+    try:
+        return get_yad2_response(url, config, conditional=conditional)
+    finally:
+        slot.release()
+
+def get_prefetch_executor(config):
+    """מאגר התהליכונים המשותף לטעינה מוקדמת של עמודים"""
+    global _prefetch_executor
+    
+    with _prefetch_executor_lock:
+        if _prefetch_executor is None:
+            depth = max(0, int(config.get('page_prefetch', 1)))
+            workers = max(1, int(config.get('max_concurrent_scans', 8))) * (depth + 1)
+            _prefetch_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='yad2-page')
+        return _prefetch_executor
+
+def iter_project_pages(url, config, max_pages):
+    """מעבר על עמודי החיפוש לפי הסדר, עם טעינה מוקדמת חסומה
+    
+    עמוד 1 נטען לבד: הטעינה המוקדמת מתחילה רק כשמבקשים את עמוד 2, כלומר אחרי שעמוד 1
+    התקבל ונמצאו בו מודעות לא מוכרות - בסריקה הרגילה (304 או עמוד מוכר) נשלחת בקשה אחת.
+    משם עד page_prefetch עמודים נטענים ברקע בזמן שהעמוד הנוכחי מפוענח.
+    סגירת ה-generator מבטלת את הטעינות שעוד לא התחילו. עמוד שלא הגיע עד מועד הסיום
+    זורק DeadlineExceeded.
+    רק עמוד 1 נשלח כבקשה מותנית - עמודים שנטענו מראש ולא נקראו לא ישמרו ETag.
+    """
+    depth = max(0, int(config.get('page_prefetch', 1)))
+    executor = get_prefetch_executor(config)
+    pending = deque()
+    next_page = 1
+    window = 0
+    
+    try:
+        while pending or next_page <= max_pages:
+            while next_page <= max_pages and len(pending) <= window:
+                target = page_url(url, next_page)
+                # ההקשר (הנושא הנסרק, לתיוג המדדים) עובר לתהליכון הטעינה
+                context = contextvars.copy_context()
+                pending.append((target, executor.submit(context.run, fetch_page, target, config, next_page == 1)))
+                next_page += 1
+            
+            target, future = pending.popleft()
+            try:
+                html_content = future.result(timeout=deadlines.remaining())
+            except FutureTimeoutError:
+                raise deadlines.DeadlineExceeded(f"העמוד {target} לא התקבל עד מועד הסיום")
+            yield target, html_content
+            window = depth
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+def fetch_project(project, config, shared=()):
+    """שלב הרשת של סריקת פרויקט - קבלת העמודים וחילוץ המודעות, ללא כתיבה לדיסק
+    
+    העמודים נסרקים לפי הסדר עד max_pages (לפרויקט או כללי), והסריקה נעצרת
+    בעמוד שכל המודעות בו מוכרות או כשהחילוץ המצטבר הגיע לרצף מודעות מוכרות.
+    shared - [(פרויקט, מסננים)] שיגזרו מהסריקה הזו (תוכנית הבקשות). הסריקה נעצרת רק
+    כשהמודעות מוכרות גם בנושאים שלהם.
+    סריקה שחורגת מ-project_seconds (או מתקציב הסבב) מופסקת, עם 'timed_out' והמודעות
+    מהעמודים שכבר התקבלו.
+    """
+    topic = project.get('topic', '').strip()
+    url = project.get('url', '').strip()
+    fetched = {'topic': topic, 'url': url, 'html': None, 'items': [], 'pages': 0, 'not_modified': False,
+               'blocked_until': None, 'new_items': [], 'changed_items': [], 'error': None, 'cached': False,
+               'timed_out': False}
+    
+    if not topic or not url:
+        return fetched
+    
+    # תקציב הזמן של הסבב נגמר לפני שהגיע תור הפרויקט
+    if deadlines.expired():
+        fetched['timed_out'] = True
+        metrics.TIMEOUTS.inc(project=topic)
+        return fetched
+    
+    # המפסק פתוח בגלל CAPTCHA - לא שולחים בקשות לנושא בסבב הזה
+    fetched['blocked_until'] = get_governor(config).blocked_until()
+    if fetched['blocked_until']:
+        return fetched
+    
+    max_pages = max(1, int(project.get('max_pages', config.get('max_pages', 1))))
+    
+    # נושא שעוד אין לו מודעות במאגר (חדש, או שהמאגר נמחק) צריך את העמוד המלא גם אם לא השתנה
+    group_topics = [topic] + [member.get('topic', '').strip() for member, _ in shared]
+    if any(get_topic_store(group_topic, config).count(group_topic) == 0 for group_topic in group_topics):
+        forget_validators(url, config, topic)
+    
+    # הנושא ומועד הסיום עוברים לכל המדדים והבקשות של הסריקה (גם בתהליכוני הטעינה)
+    with metrics.project_context(topic), deadlines.deadline(deadlines.settings(config)['project_seconds']):
+        pages = iter_project_pages(url, config, max_pages)
+        is_known = known_checker(topic, config, shared)
         
-        for item in new_items:
-            html += f"""
-            <div class="item">
-                <div class="title">{item.get('title', 'אין כותרת')}</div>
-                <div class="price">{item.get('price', 'מחיר לא צוין')}</div>
-                <div class="address">{item.get('address', 'כתובת לא צוינה')}</div>
-                <div class="date">{item.get('date', 'תאריך לא צוין')}</div>
-                <p><a class="link" href="{item.get('link', '#')}">צפייה במודעה</a></p>
-            </div>
-            """
+        try:
+            for page_number, (target, html_content) in enumerate(pages, 1):
+                # העמוד הראשון לא השתנה מאז הסריקה הקודמת (304) - אין צורך לחלץ ולהשוות
+                if html_content is NOT_MODIFIED:
+                    fetched['not_modified'] = page_number == 1
+                    break
+                
+                if page_number == 1:
+                    fetched['html'] = html_content
+                if not html_content:
+                    break
+                
+                # חילוץ פרטי המודעות (עד לרצף מודעות מוכרות, אם מוגדר)
+                fetched['pages'] = page_number
+                page_items, stopped = extract_new_items_prefix(html_content, topic, config, is_known)
+                fetched['items'].extend(page_items)
+                if stopped or not page_items or page_number == max_pages:
+                    break
+                
+                # עמוד שכל המודעות בו כבר מוכרות (וללא שינויים) - אין צורך בעמודים הבאים
+                if all(is_known(item) for item in page_items):
+                    print(f"כל המודעות בעמוד {page_number} של '{topic}' מוכרות. מפסיק לסרוק עמודים.")
+                    break
         
-        html += """
-            <p>סורק יד2 הפשוט</p>
-        </body>
-        </html>
-        """
+        except deadlines.DeadlineExceeded:
+            fetched['timed_out'] = True
+            metrics.TIMEOUTS.inc(project=topic)
+            print(f"הסריקה של '{topic}' חרגה מהזמן המוקצב אחרי {fetched['pages']} עמודים.")
         
-        # הוספת תוכן HTML להודעה
-        msg.attach(MIMEText(html, 'html', 'utf-8'))
+        except Exception as e:
+            metrics.ERRORS.inc(stage='scan', project=topic)
+            fetched['error'] = f"שגיאה בסריקת הנושא '{topic}':\n{str(e)}\n\n{traceback.format_exc()}"
         
-        # שליחת הדוא"ל
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
+        finally:
+            pages.close()
         
-        print(f"נשלחה התראה לכתובת {recipient_email}")
-        return True
     
-    except Exception as e:
-        print(f"שגיאה בשליחת דוא\"ל: {e}")
-        return False
+    return fetched
 
-def format_items_for_response(new_items, topic):
-    """פרמוט המודעות החדשות לתצוגה"""
-    if not new_items:
-        return f"לא נמצאו מודעות חדשות בנושא '{topic}'."
+def derive_fetched(fetched, project, filters):
+    """רשומת סריקה של פרויקט מתוך סריקה של חיפוש רחב יותר (או זהה), לפי מסנני הלקוח.
+    None אם לא ניתן להחליט על חלק מהמודעות (למשל מספר חדרים שלא חולץ מה-HTML)"""
+    items = fetched['items']
+    if filters and items:
+        items = derive_items(items, filters)
+        if items is None:
+            return None
     
-    response = f"נמצאו {len(new_items)} מודעות חדשות בנושא '{topic}':\n\n"
-    
-    for i, item in enumerate(new_items, 1):
-        response += f"{i}. {item.get('title', 'אין כותרת')}\n"
-        response += f"   מחיר: {item.get('price', 'מחיר לא צוין')}\n"
-        response += f"   כתובת: {item.get('address', 'כתובת לא צוינה')}\n"
-        response += f"   תאריך: {item.get('date', 'תאריך לא צוין')}\n"
-        response += f"   קישור: {item.get('link', '#')}\n\n"
-    
-    return response
+    return dict(fetched, topic=project.get('topic', '').strip(), url=project.get('url', '').strip(),
+                items=list(items), new_items=[], changed_items=[], derived_from=fetched['topic'])
 
-def scrape_project(project, config):
-    """סריקת פרויקט יחיד"""
-    topic = project.get('topic', '').strip()
-    url = project.get('url', '').strip()
+def process_project(fetched, config):
+    """שלב העיבוד של סריקת פרויקט - זיהוי מודעות חדשות, שמירה והתראה"""
+    topic = fetched['topic']
+    url = fetched['url']
     
     if not topic or not url:
         return "חסרים פרטי נושא או URL. מדלג."
     
+    if fetched['error']:
+        forget_validators(url, config, topic)
+        return fetched['error']
+    
     try:
-        result = f"סריקת נושא: {topic}\nURL: {url}\n\n"
+        result = f"סריקת נושא: {topic}\nURL: {url}\n"
+        if fetched.get('derived_from'):
+            result += f"(נגזר מהסריקה של '{fetched['derived_from']}', ללא בקשה נוספת ליד2)\n"
+        result += "\n"
+        
+        if fetched['blocked_until']:
+            resume = datetime.fromtimestamp(fetched['blocked_until']).strftime('%H:%M')
+            return result + f"יד2 הציג CAPTCHA לאחרונה. הסריקה מושהית עד {resume}."
         
-        # קבלת תוכן העמוד
-        html_content = get_yad2_response(url)
-        if not html_content:
+        # סריקה חלקית - הסריקה הבאה תתחיל מחדש (ללא בקשה מותנית) ותהיה ראשונה בסבב
+        if fetched['timed_out']:
+            forget_validators(url, config, topic)
+            if not fetched['items']:
+                return result + f"הסריקה של '{topic}' חרגה מהזמן המוקצב ותתבצע ראשונה בסבב הבא."
+            result += (f"הסריקה של '{topic}' חרגה מהזמן המוקצב אחרי {fetched['pages']} עמודים "
+                       f"ותושלם ראשונה בסבב הבא.\n\n")
+        
+        if fetched['not_modified']:
+            return result + f"העמוד לא השתנה מאז הסריקה הקודמת. לא נמצאו מודעות חדשות בנושא '{topic}'."
+        
+        if not fetched['html']:
             return result + f"לא הצלחנו לקבל תוכן מהURL: {url}"
         
-        # חילוץ פרטי המודעות
-        items = extract_items(html_content)
+        items = fetched['items']
         if not items:
+            # ייתכן שזה דף CAPTCHA - לא נסתמך על ה-ETag שלו בסריקה הבאה
+            forget_validators(url, config, topic)
             return result + "לא נמצאו מודעות בעמוד."
         
-        # בדיקה אם יש מודעות חדשות
-        new_items = check_for_new_items(items, topic, config)
+        # בדיקה אם יש מודעות חדשות או מודעות ששונו
+        new_items, changed_items = check_for_updates(items, topic, config)
+        fetched['new_items'] = new_items
+        fetched['changed_items'] = changed_items
         
         # הוספת פרטי המודעות החדשות לתוצאה
-        result += format_items_for_response(new_items, topic)
+        result += format_items_for_response(new_items, topic, changed_items)
         
-        # שליחת התראה בדוא"ל אם יש מודעות חדשות ואם מופעל
-        if new_items and config.get('email', {}).get('enabled', False):
-            send_email_notification(new_items, topic, config)
-            result += "\nנשלחה התראה בדוא\"ל על המודעות החדשות."
+        # שליחת התראה בדוא"ל אם יש מודעות חדשות (או שינויים) ואם מופעל
+        if (new_items or changed_items) and config.get('email', {}).get('enabled', False):
+            if send_email_notification(new_items + changed_items, topic, config):
+                result += "\nהתראה בדוא\"ל על המודעות החדשות נוספה לתור השליחה."
         
         return result
     
     except Exception as e:
         error_traceback = traceback.format_exc()
+        metrics.ERRORS.inc(stage='process', project=topic)
+        forget_validators(url, config, topic)
         return f"שגיאה בסריקת הנושא '{topic}':\n{str(e)}\n\n{error_traceback}"
 
-def add_project(topic, url, config_path="config.json"):
+def scrape_project(project, config):
+    """סריקת פרויקט יחיד"""
+    fetched = fetch_project(project, config)
+    result = process_project(fetched, config)
+    get_dispatcher().end_cycle()
+    compact_topics([fetched['topic']] if fetched['topic'] else [], config)
+    return result
+
+def add_project(topic, url, config_path=CONFIG_FILE):
     """הוספת פרויקט חדש לקובץ ההגדרות"""
-    try:
-        config = load_config()
-        
+    def upsert(config):
         # בדיקה אם הפרויקט כבר קיים
         for project in config.get('projects', []):
             if project.get('topic', '').strip() == topic.strip():
@@ -318,42 +887,188 @@ def add_project(topic, url, config_path="config.json"):
                 'url': url,
                 'disabled': False
             })
+    
+    try:
+        load_config(config_path)
         
-        # שמירת ההגדרות המעודכנות
-        with open(config_path, 'w', encoding='utf-8') as f:
-            json.dump(config, f, ensure_ascii=False, indent=2)
+        # עדכון ההגדרות תחת נעילה, על הגרסה העדכנית שבדיסק, וכתיבה אטומית
+        get_config_manager(config_path).update(upsert)
         
         return f"הפרויקט '{topic}' נוסף בהצלחה לקובץ ההגדרות."
     
     except Exception as e:
         return f"שגיאה בהוספת הפרויקט: {str(e)}"
 
-def run_all_scans(config):
-    """הרצת כל הסריקות המוגדרות"""
-    results = []
+def cache_key(project):
+    """מפתח המטמון של פרויקט - הנושא והכתובת המנורמלת"""
+    return (project.get('topic', '').strip(), canonical_url(project.get('url', '').strip()))
+
+def cached_scan(project, entry):
+    """רשומת סריקה לפרויקט שנסרק לאחרונה (לפי המטמון)
     
-    for project in config.get('projects', []):
-        if not project.get('disabled', False):
-            results.append(scrape_project(project, config))
+    מוחזרת תוצאת הטקסט השמורה במלואה, עם שורה שמסמנת שזו תוצאה שמורה. המודעות החדשות
+    כבר דווחו בסריקה השמורה, ולכן 'new_items' ריק ולא נשלחות התראות נוספות.
+    """
+    topic = project.get('topic', '').strip()
+    url = project.get('url', '').strip()
+    scanned_at = datetime.fromtimestamp(entry['time']).strftime('%H:%M:%S')
+    return {
+        'topic': topic, 'url': url,
+        'html': None, 'items': [], 'pages': 0, 'not_modified': True, 'blocked_until': None,
+        'new_items': [], 'changed_items': [], 'error': None, 'cached': True, 'timed_out': False,
+        'result': f"{entry['value']}\n\n(תוצאה שמורה מהסריקה של {scanned_at}. להרצה מחדש: scan --fresh)"
+    }
+
+def run_parallel(function, values, config):
+    """הרצת function על כל ערך במקביל (עד max_concurrent_scans), עם שמירה על הסדר"""
+    max_workers = min(max(1, int(config.get('max_concurrent_scans', 8))), max(len(values), 1))
+    if max_workers == 1:
+        return [function(value) for value in values]
+    # כל משימה רצה בעותק של ההקשר הנוכחי (למשל מועד הסיום של הסבב)
+    contexts = [contextvars.copy_context() for _ in values]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda context, value: context.run(function, value), contexts, values))
+
+def fetch_planned(projects, indices, config):
+    """שלב הרשת של הפרויקטים (לפי אינדקסים) לפי תוכנית הבקשות (fetch_plan)
     
-    if not results:
+    כתובות זהות נסרקות פעם אחת, ובמצב 'derive' פרויקט מסונן נגזר מחיפוש רחב יותר.
+    פרויקט מסונן נסרק בעצמו בסריקה הראשונה שלו, או כשאי אפשר להחיל עליו את המסננים.
+    בקשות של פרויקטים שחרגו מהזמן בסבב הקודם נשלחות ראשונות.
+    מוחזרת רשומת סריקה לכל אינדקס, לפי הסדר.
+    """
+    selected = [projects[index] for index in indices]
+    
+    def has_history(project):
+        topic = project.get('topic', '').strip()
+        return get_topic_store(topic, config).count(topic) > 0
+    
+    groups = build_fetch_plan(selected, config.get('fetch_plan', 'dedupe'), has_history)
+    
+    def fetch_group(group):
+        shared = [(selected[member], filters) for member, filters in group.members]
+        return fetch_project(selected[group.lead], config, shared)
+    
+    def overdue(group):
+        indices = [group.lead] + [member for member, _ in group.members]
+        return any(selected[index].get('topic', '').strip() in _overdue_topics for index in indices)
+    
+    groups.sort(key=lambda group: not overdue(group))
+    
+    # שלב הרשת רץ במקביל; הסדר נשמר לפי הפרויקטים שבקובץ ההגדרות
+    results = [None] * len(selected)
+    direct = []
+    for group, fetched in zip(groups, run_parallel(fetch_group, groups, config)):
+        results[group.lead] = fetched
+        for member, filters in group.members:
+            results[member] = derive_fetched(fetched, selected[member], filters)
+            if results[member] is None:
+                direct.append(member)
+    
+    if direct:
+        for member, fetched in zip(direct, run_parallel(lambda member: fetch_project(selected[member], config), direct, config)):
+            results[member] = fetched
+    
+    if len(groups) < len(selected):
+        print(f"תוכנית הבקשות: {len(groups) + len(direct)} סריקות עבור {len(selected)} פרויקטים.")
+    
+    return results
+
+def scan_projects(projects, config, use_cache=False, fresh=False):
+    """סריקת רשימת פרויקטים - שלב הרשת במקביל ושלב העיבוד לפי הסדר
+    
+    מחזיר רשומת סריקה לכל פרויקט (לפי סדר הרשימה), עם תוצאת הטקסט ב-'result'
+    והמודעות החדשות ב-'new_items'.
+    use_cache - דילוג על פרויקטים שנסרקו בחלון הזמן של המטמון (לפי נושא וכתובת);
+    fresh - סריקה מחדש ושמירה במטמון.
+    שלב הרשת מוגבל לתקציב הזמן של הסבב (deadlines.cycle_seconds); פרויקטים שלא הסתיימו
+    בזמן מסומנים ב-'timed_out' ונסרקים ראשונים בסבב הבא.
+    """
+    if not projects:
+        return []
+    
+    cache = get_result_cache(config) if use_cache else None
+    scans = [None] * len(projects)
+    
+    if cache is not None and not fresh:
+        for index, project in enumerate(projects):
+            entry = cache.get(cache_key(project))
+            # רשומה מגרסה קודמת שמרה רק את מספר המודעות החדשות - נסרקת מחדש
+            if entry is not None and isinstance(entry['value'], str):
+                scans[index] = cached_scan(project, entry)
+    
+    pending = [index for index, scan in enumerate(scans) if scan is None]
+    with deadlines.deadline(deadlines.settings(config)['cycle_seconds']):
+        fetched = fetch_planned(projects, pending, config)
+    
+    # שלב העיבוד (כתיבה למאגר והתראות) רץ לפי הסדר כדי שהתוצאה תהיה דטרמיניסטית
+    for index, scan in zip(pending, fetched):
+        scan['result'] = process_project(scan, config)
+        scans[index] = scan
+        if scan['timed_out']:
+            _overdue_topics.add(scan['topic'])
+        else:
+            _overdue_topics.discard(scan['topic'])
+        if cache is not None and not scan['error'] and scan['url']:
+            cache.put(cache_key(scan), scan['result'])
+    
+    # סוף הסבב - שליחת תקציר ההתראות המצטבר (במצב digest), ודחיסת ההיסטוריה של הנושאים שנסרקו
+    get_dispatcher().end_cycle()
+    compact_topics([scans[index]['topic'] for index in pending if scans[index]['topic'] and not scans[index]['error']],
+                   config)
+    
+    return scans
+
+def run_all_scans(config, use_cache=False, fresh=False):
+    """הרצת כל הסריקות המוגדרות"""
+    projects = [project for project in config.get('projects', []) if not project.get('disabled', False)]
+    
+    if not projects:
         return "אין פרויקטים זמינים לסריקה. הוספת פרויקט חדש באמצעות פקודת 'add'."
     
+    results = [scan['result'] for scan in scan_projects(projects, config, use_cache, fresh)]
+    
     return "\n" + "="*50 + "\n".join(results)
 
-def run_mcp_command(command, args=None):
-    """הרצת פקודה עבור MCP"""
-    config = load_config()
+# תחילת התשובה של פקודה שנכשלה (שימוש שגוי, פקודה או נושא לא מוכרים, שגיאה בביצוע)
+ERROR_PREFIXES = ("שגיאה", "שימוש שגוי", "פקודה לא מוכרת", "לא נמצא פרויקט")
+
+def is_error_result(text):
+    """האם התשובה של run_mcp_command מדווחת על כישלון הפקודה"""
+    return text.lstrip().startswith(ERROR_PREFIXES)
+
+def run_mcp_command(command, args=None, config=None, fresh=False):
+    """הרצת פקודה עבור MCP
+    
+    config - הגדרות טעונות מראש (למשל בשרת התושב). ללא ערך, ההגדרות נטענות מהקובץ.
+    fresh - סריקה מחדש גם אם יש תוצאה שמורה במטמון (או הארגומנט --fresh)
+    """
+    if config is None:
+        config = load_config()
+    
+    args = command_args(args)
+    if '--fresh' in args:
+        fresh = True
+        args = [arg for arg in args if arg != '--fresh']
     
     if command == "help":
         return """פקודות זמינות ב-MCP:
 1. scan - סריקת כל הפרויקטים או פרויקט ספציפי
    דוגמה: scan [שם נושא]
+   תוצאות שמורות מוחזרות מהמטמון; להרצה מחדש: scan --fresh [שם נושא]
 2. add - הוספת פרויקט חדש
    דוגמה: add [שם נושא] [URL]
 3. list - הצגת רשימת הפרויקטים
 4. auto - הפעלת סריקה אוטומטית של כל הפרויקטים
-5. help - הצגת עזרה זו
+5. search - חיפוש במודעות שנשמרו בכל הנושאים
+   דוגמה: search צפון max_price=2.5M days=7 sort=price limit=10
+   מסננים: topic=, min_price=, max_price=, days=, sort=(newest/oldest/price/-price), limit=
+6. stats - זמני שלבי הסריקה ומוני ביצועים לכל נושא
+7. reprocess - חילוץ מחדש של העמודים השמורים בארכיון והשלמת ההיסטוריה, ללא גישה לרשת
+   דוגמה: reprocess [שם נושא] days=30
+8. since - המודעות שנשמרו מאז cursor (JSON), ללא סריקה
+   דוגמה: since 1520 topic=[שם נושא] limit=50 format=text
+9. help - הצגת עזרה זו
 """
     
     elif command == "scan":
@@ -362,7 +1077,7 @@ def run_mcp_command(command, args=None):
             topic = args[0].strip()
             for project in config.get('projects', []):
                 if project.get('topic', '').strip() == topic and not project.get('disabled', False):
-                    return scrape_project(project, config)
+                    return scan_projects([project], config, use_cache=True, fresh=fresh)[0]['result']
             
             # אם לא נמצא, בדוק אם זה URL ונסה להוסיף אוטומטית
             if topic.startswith("http"):
@@ -374,7 +1089,7 @@ def run_mcp_command(command, args=None):
             return f"לא נמצא פרויקט בשם '{topic}' או שהוא מושבת."
         else:
             # סריקת כל הנושאים
-            return run_all_scans(config)
+            return run_all_scans(config, use_cache=True, fresh=fresh)
     
     elif command == "add":
         if args and len(args) >= 2:
@@ -405,7 +1120,19 @@ def run_mcp_command(command, args=None):
         return result
     
     elif command == "auto":
-        return run_all_scans(config)
+        return run_all_scans(config, use_cache=True, fresh=fresh)
+    
+    elif command == "search":
+        return search_listings(args, config)
+    
+    elif command == "stats":
+        return metrics.format_stats()
+    
+    elif command == "reprocess":
+        return reprocess_archive(args, config)
+    
+    elif command == "since":
+        return since_command(args, config)
     
     else:
         return f"פקודה לא מוכרת: '{command}'. הקלד 'help' לקבלת רשימת הפקודות."
@@ -413,8 +1140,9 @@ def run_mcp_command(command, args=None):
 def main():
     """נקודת הכניסה הראשית"""
     parser = argparse.ArgumentParser(description='שירות MCP לסריקת מודעות חדשות ביד2')
-    parser.add_argument('command', nargs='?', default='help', help='הפקודה להרצה (scan, add, list, auto, help)')
+    parser.add_argument('command', nargs='?', default='help', help='הפקודה להרצה (scan, add, list, auto, search, stats, reprocess, since, help)')
     parser.add_argument('args', nargs='*', help='פרמטרים נוספים לפקודה')
+    parser.add_argument('--fresh', action='store_true', help='סריקה מחדש גם אם יש תוצאה שמורה במטמון')
     
     args = parser.parse_args()
     config = load_config()
@@ -423,10 +1151,12 @@ def main():
     if args.command == 'auto' or (len(sys.argv) == 1 and config.get('auto_scan', False)):
         result = run_all_scans(config)
     else:
-        result = run_mcp_command(args.command, args.args)
+        result = run_mcp_command(args.command, args.args, config=config, fresh=args.fresh)
+    
+    # המתנה לשליחת ההתראות שבתור לפני סיום התהליך
+    get_dispatcher().drain()
     
     print(result)
 
 if __name__ == "__main__":
-    import sys
     main()
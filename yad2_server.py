@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+שרת MCP תושב עבור Yad2 MCP
+
+תהליך ארוך-חיים שמקבל בקשות JSON-RPC 2.0 (שורה אחת לכל הודעה). ההגדרות,
+חיבורי ה-HTTP, מאגר המודעות והמדדים נשארים טעונים בין הבקשות, כך שכל פקודה
+לא משלמת על הפעלת מפרש, ייבוא מודולים וחיבורים קרים.
+
+- python yad2_server.py - דרך stdin/stdout, ללקוח MCP שמפעיל את השרת (למשל Claude Desktop)
+- python yad2_server.py --listen - שרת משותף בחיבור TCP מקומי (server_port). claude_interface
+  ו-auto_yad2 מתחברים אליו, ומפעילים אותו ברקע אם עוד לא רץ; הוא נסגר אחרי
+  server_idle_minutes ללא חיבורים, והפלט שלו נכתב ל-data/yad2_server.log.
+  ההודעה הראשונה בכל חיבור היא authenticate עם הסוד שהשרת כותב ל-data/yad2_server.token
+  (קובץ שרק המשתמש יכול לקרוא), כך שמשתמשים אחרים ודפי אינטרנט לא יכולים להריץ פקודות.
+
+שיטות נתמכות:
+- initialize, tools/list, tools/call - פרוטוקול MCP
+- run - {"command": "scan", "args": [...]} (או "args" כשורת ארגומנטים גולמית אחת)
+- scan_topics - {"topics": [...]} - סריקה עם סיכום מובנה (מספר מודעות חדשות לכל נושא)
+- since - {"cursor": 0, "topics": [...], "limit": 100} - המודעות שנשמרו מאז cursor, כמבנה JSON
+- scan, add, list, auto, search, stats, reprocess, since, help - {"args": [...]}
+
+אם מוגדר metrics_port, המדדים זמינים גם ב-http://127.0.0.1:<port>/metrics.
+
+כל הפלט של התהליך (print, גם מתהליכוני רקע כמו תור ההתראות והטעינה המוקדמת)
+מופנה ל-stderr לכל אורך חיי השרת; התשובות נכתבות לעותק של ה-stdout המקורי.
+
+שימוש:
+    python yad2_server.py [--listen]
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import socket
+import atexit
+import secrets
+import threading
+import subprocess
+import contextlib
+from datetime import datetime
+
+from yad2_metrics import start_metrics_server
+from yad2_notify import get_dispatcher
+from yad2_config import get_config_manager
+
+PROTOCOL_VERSION = '2024-11-05'
+
+SERVER_SCRIPT = os.path.abspath(__file__)
+
+# זמן ההמתנה המרבי (שניות) לשליחת ההתראות שבתור כשהשרת נסגר
+DRAIN_TIMEOUT_SECONDS = 120
+
+# השרת המשותף (serve_socket): פורט ברירת מחדל, קובץ הלוג וקובץ ה-PID (בתיקיית הנתונים)
+DEFAULT_PORT = 47892
+LOG_FILE = 'yad2_server.log'
+PID_FILE = 'yad2_server.pid'
+TOKEN_FILE = 'yad2_server.token'
+CONNECT_TIMEOUT_SECONDS = 2
+START_TIMEOUT_SECONDS = 30
+
+TOOLS = [
+    ('scan', "סריקת כל הפרויקטים או פרויקט ספציפי (args: [שם נושא או URL])"),
+    ('add', "הוספת פרויקט חדש (args: [שם נושא, URL])"),
+    ('list', "הצגת רשימת הפרויקטים"),
+    ('auto', "סריקה של כל הפרויקטים הפעילים"),
+    ('search', "חיפוש במודעות השמורות (args: [מילים, topic=, min_price=, max_price=, days=, sort=, limit=])"),
+    ('stats', "זמני שלבי הסריקה ומוני ביצועים לכל נושא"),
+    ('reprocess', "חילוץ מחדש של העמודים השמורים בארכיון, ללא גישה לרשת (args: [שם נושא, days=])"),
+    ('since', "המודעות שנשמרו מאז cursor, כ-JSON עם ה-cursor הבא (args: [cursor, topic=, limit=, format=text])"),
+    ('help', "הצגת רשימת הפקודות"),
+]
+
+# פקודות שסורקות או כותבות - רצות אחת בכל פעם גם כשכמה לקוחות מחוברים לשרת המשותף
+EXCLUSIVE_COMMANDS = {'scan', 'scan_topics', 'add', 'auto', 'reprocess'}
+
+# קודי שגיאה של JSON-RPC
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+UNAUTHORIZED = -32001
+
+class Yad2Server:
+    """מצב השרת התושב - הגדרות טעונות וטיפול בבקשות"""
+
+    def __init__(self, config_path='config.json'):
+        self.config_path = config_path
+        self._exclusive_lock = threading.Lock()
+
+    def _lock_for(self, method, params):
+        """נעילה לפקודות סריקה וכתיבה; פקודות קריאה (stats, search, since...) לא ממתינות להן"""
+        command = {'run': params.get('command'), 'tools/call': params.get('name')}.get(method, method)
+        return self._exclusive_lock if command in EXCLUSIVE_COMMANDS else contextlib.nullcontext()
+
+    def get_config(self):
+        """ההגדרות הטעונות, עם טעינה מחדש רק כאשר קובץ ההגדרות השתנה"""
+        from yad2_scraper import load_config
+
+        return load_config(self.config_path)
+
+    def run_command(self, command, args=None):
+        """הרצת פקודת MCP בתוך התהליך (args - רשימת ארגומנטים, או שורת ארגומנטים גולמית אחת)"""
+        from yad2_scraper import run_mcp_command
+
+        return run_mcp_command(command, args, config=self.get_config())
+
+    def call_tool(self, name, args=None):
+        """tools/call - כישלון של הפקודה (חריגה, או תשובת שגיאה כמו שימוש שגוי) מסומן ב-isError"""
+        from yad2_scraper import is_error_result
+
+        try:
+            text = self.run_command(name, args)
+        except Exception as e:
+            return {'content': [{'type': 'text', 'text': f"שגיאה בהרצת הפקודה '{name}': {e}"}], 'isError': True}
+        return {'content': [{'type': 'text', 'text': text}], 'isError': is_error_result(text)}
+
+    def scan_topics(self, topics=None):
+        """סריקת נושאים פעילים (או כולם) והחזרת סיכום מובנה לכל נושא"""
+        from yad2_scraper import scan_projects
+
+        config = self.get_config()
+        projects = [
+            project for project in config.get('projects', [])
+            if not project.get('disabled', False) and (topics is None or project.get('topic', '').strip() in topics)
+        ]
+        scans = scan_projects(projects, config)
+
+        return {
+            'text': "\n".join(scan['result'] for scan in scans),
+            'results': [
+                {
+                    'topic': scan['topic'],
+                    'new_items': len(scan['new_items']),
+                    'ok': not scan['error'] and (scan['not_modified'] or bool(scan['html'])),
+                    'timed_out': scan['timed_out'],
+                }
+                for scan in scans
+            ],
+        }
+
+    def since(self, cursor=0, topics=None, limit=100):
+        """המודעות שנשמרו מאז cursor (ללא סריקה), עם ה-cursor לקריאה הבאה"""
+        from yad2_scraper import listings_since
+
+        return listings_since(cursor, self.get_config(), topics, limit)
+
+    def handle(self, request):
+        """טיפול בבקשת JSON-RPC אחת. מחזיר את התשובה, או None להודעה ללא id"""
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            return _error_response(None, INVALID_REQUEST, "בקשה לא תקינה")
+
+        request_id = request.get('id')
+        method = request['method']
+        params = request.get('params') or {}
+
+        try:
+            with self._lock_for(method, params):
+                if method == 'initialize':
+                    result = {
+                        'protocolVersion': PROTOCOL_VERSION,
+                        'capabilities': {'tools': {}},
+                        'serverInfo': {'name': 'yad2-mcp', 'version': '1.0'},
+                    }
+                elif method.startswith('notifications/'):
+                    return None
+                elif method == 'ping':
+                    result = {}
+                elif method == 'tools/list':
+                    result = {'tools': [_tool_description(name, description) for name, description in TOOLS]}
+                elif method == 'tools/call':
+                    result = self.call_tool(params.get('name'), (params.get('arguments') or {}).get('args'))
+                elif method == 'scan_topics':
+                    result = self.scan_topics(params.get('topics'))
+                elif method == 'since' and 'args' not in params:
+                    result = self.since(params.get('cursor', 0), params.get('topics'), params.get('limit', 100))
+                elif method == 'run':
+                    result = {'text': self.run_command(params.get('command', 'help'), params.get('args'))}
+                elif method in dict(TOOLS):
+                    result = {'text': self.run_command(method, params.get('args'))}
+                else:
+                    return _error_response(request_id, METHOD_NOT_FOUND, f"שיטה לא מוכרת: '{method}'")
+        except Exception as e:
+            return _error_response(request_id, INTERNAL_ERROR, str(e))
+
+        if request_id is None:
+            return None
+        return {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+def _tool_description(name, description):
+    """תיאור כלי MCP עבור tools/list"""
+    return {
+        'name': name,
+        'description': description,
+        'inputSchema': {
+            'type': 'object',
+            'properties': {'args': {'type': 'array', 'items': {'type': 'string'}}},
+        },
+    }
+
+def _error_response(request_id, code, message):
+    """תשובת שגיאה של JSON-RPC"""
+    return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+def _claim_stdout():
+    """שמירת ה-stdout המקורי לתשובות בלבד, והפניית כל פלט אחר של התהליך ל-stderr
+
+    גם פלט שנכתב מתהליכוני רקע אחרי שהבקשה הסתיימה (התראות, טעינה מוקדמת, בקשות שחרגו
+    מהזמן) לא מגיע לערוץ התשובות - גם לא דרך ה-file descriptor עצמו.
+    """
+    sys.stdout.flush()
+    responses = os.fdopen(os.dup(sys.stdout.fileno()), 'w', encoding='utf-8')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+    return responses
+
+def serve(stdin=None, stdout=None):
+    """לולאת השרת - קריאת בקשות מ-stdin עד לסגירתו
+
+    ללא stdout - התשובות נכתבות ל-stdout של התהליך, וכל שאר הפלט מופנה ל-stderr.
+    בסגירת stdin, ההתראות שבתור (כולל התקציר וניסיונות חוזרים) נשלחות לפני היציאה.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or _claim_stdout()
+    server = Yad2Server()
+
+    # נקודת הקצה של המדדים (אם metrics_port מוגדר) - ההודעה נכתבת ל-stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        start_metrics_server(server.get_config())
+
+    try:
+        for line in stdin:
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                response = _error_response(None, PARSE_ERROR, str(e))
+            else:
+                # כל הפלט של הסורק עובר ל-stderr; stdout שמור לתשובות בלבד
+                with contextlib.redirect_stdout(sys.stderr):
+                    response = server.handle(request)
+
+            if response is not None:
+                stdout.write(json.dumps(response, ensure_ascii=False) + '\n')
+                stdout.flush()
+    finally:
+        # תהליכון ההתראות הוא daemon - בלי המתנה, התראות שבתור היו אובדות ביציאה
+        if not get_dispatcher().drain(DRAIN_TIMEOUT_SECONDS):
+            print("לא כל ההתראות נשלחו לפני סגירת השרת.", file=sys.stderr)
+
+def _pid_path(config):
+    return os.path.join(config.get('data_dir', 'data'), PID_FILE)
+
+def _write_token(path):
+    """יצירת סוד חדש לחיבורים לשרת המשותף, בקובץ שרק המשתמש הנוכחי יכול לקרוא (0600)"""
+    token = secrets.token_hex(32)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(tmp_path)
+    with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), 'w', encoding='utf-8') as f:
+        f.write(token)
+    os.replace(tmp_path, path)
+    return token
+
+def _is_authentication(request, token):
+    """האם הבקשה היא authenticate עם הסוד הנכון"""
+    if not isinstance(request, dict) or request.get('method') != 'authenticate':
+        return False
+    params = request.get('params')
+    return isinstance(params, dict) and hmac.compare_digest(str(params.get('token', '')), token)
+
+def _write_response(writer, response):
+    writer.write(json.dumps(response, ensure_ascii=False) + '\n')
+    writer.flush()
+
+class _Activity:
+    """מעקב אחרי חיבורים פעילים וזמן הפעילות האחרון, לסגירת שרת משותף שאינו בשימוש"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = 0
+        self._last = time.monotonic()
+
+    @contextlib.contextmanager
+    def connection(self):
+        with self._lock:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._last = time.monotonic()
+
+    def idle_seconds(self):
+        with self._lock:
+            return 0.0 if self._active else time.monotonic() - self._last
+
+def _serve_connection(server, conn, activity, token):
+    """טיפול בחיבור אחד לשרת המשותף - בקשה בכל שורה, עד לסגירת החיבור
+
+    ההודעה הראשונה חייבת להיות authenticate עם הסוד שבקובץ ה-token. חיבור שלא הזדהה,
+    או ששלח שורה שאינה JSON (למשל בקשת HTTP מדפדפן), מקבל שגיאה ונסגר מיד.
+    """
+    with activity.connection(), conn, \
+            conn.makefile('r', encoding='utf-8', errors='replace') as reader, \
+            conn.makefile('w', encoding='utf-8') as writer:
+        try:
+            authenticated = False
+            for line in reader:
+                line = line.strip()
+                if not line:
+                    continue
+
+                try:
+                    request = json.loads(line)
+                except ValueError as e:
+                    _write_response(writer, _error_response(None, PARSE_ERROR, str(e)))
+                    return
+
+                if not authenticated:
+                    if not _is_authentication(request, token):
+                        _write_response(writer, _error_response(None, UNAUTHORIZED, "נדרשת הזדהות"))
+                        return
+                    authenticated = True
+                    response = {'jsonrpc': '2.0', 'id': request.get('id'), 'result': {}}
+                else:
+                    response = server.handle(request)
+
+                if response is not None:
+                    _write_response(writer, response)
+        except OSError:
+            pass  # הלקוח התנתק
+
+def serve_socket(port, idle_minutes=0):
+    """שרת תושב משותף - בקשות JSON-RPC (שורה לכל הודעה) בחיבורי TCP מקומיים (127.0.0.1:port)
+
+    כל תהליך לקוח (claude_interface, auto_yad2) מתחבר לאותו שרת, כך שההגדרות, החיבורים,
+    המאגר והמדדים נשמרים בין פקודות. אחרי idle_minutes ללא חיבורים השרת נסגר (0 - לעולם לא).
+    סוד חדש נכתב לקובץ ה-token בכל הפעלה, אחרי שהפורט נתפס ולפני שמתקבלים חיבורים.
+    """
+    server = Yad2Server()
+    config = server.get_config()
+    start_metrics_server(config)
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if os.name != 'nt':
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(('127.0.0.1', port))
+    token = _write_token(os.path.join(config.get('data_dir', 'data'), TOKEN_FILE))
+    listener.listen()
+    listener.settimeout(60)
+
+    pid_path = _pid_path(config)
+    os.makedirs(os.path.dirname(pid_path) or '.', exist_ok=True)
+    with open(pid_path, 'w', encoding='utf-8') as f:
+        f.write(str(os.getpid()))
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] השרת התושב מאזין ב-127.0.0.1:{port}")
+
+    activity = _Activity()
+    try:
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except socket.timeout:
+                if idle_minutes and activity.idle_seconds() > idle_minutes * 60:
+                    print(f"השרת התושב נסגר אחרי {idle_minutes} דקות ללא שימוש.")
+                    break
+                continue
+            threading.Thread(target=_serve_connection, args=(server, conn, activity, token), daemon=True).start()
+    finally:
+        listener.close()
+        with contextlib.suppress(OSError):
+            os.remove(pid_path)
+        if not get_dispatcher().drain(DRAIN_TIMEOUT_SECONDS):
+            print("לא כל ההתראות נשלחו לפני סגירת השרת.")
+
+class Yad2ServerClient:
+    """לקוח לשרת התושב המשותף (TCP מקומי)
+
+    אם השרת עוד לא רץ, הלקוח מפעיל אותו ברקע (כתהליך עצמאי שממשיך לרוץ אחרי שהלקוח
+    יוצא, עם הפלט שלו בקובץ לוג) ומתחבר אליו. כל חיבור מזדהה בסוד שבקובץ ה-token.
+    כשהשרת לא ענה בזמן או לא זמין, רק החיבור של הלקוח הזה נסגר (השרת ממשיך לשרת לקוחות
+    אחרים) והבקשה רצה בתוך התהליך הנוכחי.
+    """
+
+    def __init__(self, port=DEFAULT_PORT, cwd=None, log_path=LOG_FILE, token_path=TOKEN_FILE):
+        self.port = port
+        self.cwd = cwd
+        self.log_path = log_path
+        self.token_path = token_path
+        self._local = None
+        self._socket = None
+        self._reader = None
+        self._writer = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _start(self):
+        """הפעלת השרת המשותף ברקע, מנותק מהתהליך הנוכחי"""
+        log_path = os.path.join(self.cwd or '.', self.log_path)
+        os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+        if os.name == 'nt':
+            detach = {'creationflags': subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP}
+        else:
+            detach = {'start_new_session': True}
+
+        with open(log_path, 'a', encoding='utf-8') as log:
+            subprocess.Popen(
+                [sys.executable, SERVER_SCRIPT, '--listen'],
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=log,
+                cwd=self.cwd,
+                env=dict(os.environ, PYTHONIOENCODING='utf-8'),
+                **detach
+            )
+
+    def _connect(self):
+        """חיבור לשרת, עם הפעלה שלו אם אינו רץ"""
+        try:
+            conn = socket.create_connection(('127.0.0.1', self.port), timeout=CONNECT_TIMEOUT_SECONDS)
+        except OSError:
+            self._start()
+            started = time.monotonic()
+            while True:
+                time.sleep(0.2)
+                try:
+                    conn = socket.create_connection(('127.0.0.1', self.port), timeout=CONNECT_TIMEOUT_SECONDS)
+                    break
+                except OSError:
+                    if time.monotonic() - started > START_TIMEOUT_SECONDS:
+                        raise ConnectionError(f"לא ניתן להפעיל את השרת התושב (ראו {self.log_path})")
+
+        self._socket = conn
+        self._reader = conn.makefile('r', encoding='utf-8')
+        self._writer = conn.makefile('w', encoding='utf-8')
+
+        try:
+            with open(os.path.join(self.cwd or '.', self.token_path), encoding='utf-8') as f:
+                token = f.read().strip()
+            response = self._exchange('authenticate', {'token': token}, CONNECT_TIMEOUT_SECONDS)
+        except Exception:
+            self.close()
+            raise
+        if 'error' in response:
+            self.close()
+            raise ConnectionError(f"השרת התושב דחה את ההזדהות: {response['error'].get('message')}")
+
+    def _request(self, method, params, timeout=None):
+        """שליחת בקשה אחת וקריאת התשובה שלה (TimeoutError אם לא התקבלה תוך timeout שניות)"""
+        if self._socket is None:
+            self._connect()
+        return self._exchange(method, params, timeout)
+
+    def _exchange(self, method, params, timeout):
+        """כתיבת בקשה לחיבור הפתוח וקריאת התשובה"""
+        self._next_id += 1
+        request = {'jsonrpc': '2.0', 'id': self._next_id, 'method': method, 'params': params}
+        self._socket.settimeout(timeout)
+        self._writer.write(json.dumps(request, ensure_ascii=False) + '\n')
+        self._writer.flush()
+
+        try:
+            line = self._reader.readline()
+        except socket.timeout:
+            raise TimeoutError(f"שרת ה-MCP לא ענה תוך {timeout} שניות")
+        if not line:
+            raise ConnectionError("שרת ה-MCP נסגר באופן לא צפוי")
+        return json.loads(line)
+
+    def _remote(self, method, params, timeout):
+        """הבקשה בשרת המשותף. חיבור שנותק (למשל שרת שנסגר אחרי זמן סרק) מנוסה שוב פעם אחת"""
+        try:
+            return self._request(method, params, timeout)
+        except TimeoutError:
+            # רק החיבור הזה נסגר - השרת עצמו משמש גם לקוחות אחרים
+            self.close()
+            raise
+        except (OSError, ValueError):
+            self.close()
+            return self._request(method, params, timeout)
+
+    def _run_locally(self, method, params):
+        """הרצת הבקשה בתוך התהליך הנוכחי, כשהשרת המשותף לא ענה או לא זמין"""
+        if self._local is None:
+            self._local = Yad2Server(os.path.join(self.cwd or '.', 'config.json'))
+        with contextlib.redirect_stdout(sys.stderr):
+            return self._local.handle({'jsonrpc': '2.0', 'id': 0, 'method': method, 'params': params})
+
+    def request(self, method, params=None, timeout=None):
+        """שליחת בקשת JSON-RPC לשרת והחזרת ה-result שלה
+        timeout - זמן ההמתנה המרבי לתשובה בשניות (None - ללא הגבלה). כשהשרת לא ענה בזמן או
+        לא זמין, הבקשה רצה בתוך התהליך הנוכחי"""
+        params = params or {}
+
+        with self._lock:
+            try:
+                response = self._remote(method, params, timeout)
+            except (OSError, ValueError) as e:
+                print(f"השרת התושב לא זמין ({e}) - הפקודה רצה בתהליך הנוכחי.", file=sys.stderr)
+                response = self._run_locally(method, params)
+
+        if 'error' in response:
+            raise RuntimeError(response['error'].get('message', 'שגיאה לא ידועה'))
+        return response['result']
+
+    def call(self, command, args=None, timeout=None):
+        """הרצת פקודת MCP בשרת והחזרת הטקסט שלה (args - רשימה, או שורת ארגומנטים גולמית אחת)"""
+        args = args if isinstance(args, str) else list(args or [])
+        return self.request('run', {'command': command, 'args': args}, timeout)['text']
+
+    def close(self):
+        """סגירת החיבור (השרת המשותף ממשיך לרוץ)"""
+        if self._socket is None:
+            return
+
+        for stream in (self._reader, self._writer, self._socket):
+            with contextlib.suppress(OSError):
+                stream.close()
+        self._socket = self._reader = self._writer = None
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """קבלת הלקוח המשותף לשרת התושב, לפי server_port בקובץ ההגדרות (החיבור נסגר ביציאה)"""
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            manager = get_config_manager()
+            config = manager.get() if manager.exists() else {}
+            data_dir = config.get('data_dir', 'data')
+            _client = Yad2ServerClient(
+                int(config.get('server_port', DEFAULT_PORT)),
+                log_path=os.path.join(data_dir, LOG_FILE),
+                token_path=os.path.join(data_dir, TOKEN_FILE)
+            )
+            atexit.register(_client.close)
+        return _client
+
+if __name__ == "__main__":
+    if hasattr(sys.stdout, 'reconfigure'):
+        sys.stdin.reconfigure(encoding='utf-8')
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+    if '--listen' in sys.argv[1:]:
+        config = Yad2Server().get_config()
+        serve_socket(int(config.get('server_port', DEFAULT_PORT)), float(config.get('server_idle_minutes', 0)))
+    else:
+        serve()
@@ -0,0 +1,769 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+מאגר המודעות של Yad2 MCP - מבוסס SQLite
+
+מחליף את קבצי ה-JSON לכל נושא (data/<topic>.json). כל מודעה נשמרת פעם אחת
+בלבד לפי המזהה שלה, והשיוך שלה לכל הנושאים שבהם נמצאה נשמר בטבלת memberships.
+בזכות האינדקסים, זיהוי מודעות חדשות עולה בערך אותו דבר ללא קשר לגודל ההיסטוריה.
+
+היסטוריה ישנה (לפי history_retention - גיל או מספר מודעות לנושא) עוברת מהטבלאות
+"החמות" לקטעי היסטוריה דחוסים (gzip) שנכתבים פעם אחת ולא משתנים. המודעות שבהם
+עדיין נחשבות מוכרות, ו-get_items, count ו-search מחזירים את כל ההיסטוריה - גם
+את החלק הדחוס.
+"""
+
+import os
+import re
+import gzip
+import json
+import time
+import sqlite3
+import threading
+
+from yad2_listing import Listing, as_dict, parse_price, fields_hash, field_changes
+from yad2_metrics import timed_stage
+
+DB_FILE = 'listings.db'
+
+# שינויי סכמה לפי הסדר. הגרסה הנוכחית נשמרת ב-PRAGMA user_version
+MIGRATIONS = [
+    """
+    CREATE TABLE listings (
+        topic TEXT NOT NULL,
+        item_id TEXT NOT NULL,
+        data TEXT NOT NULL,
+        first_seen REAL NOT NULL
+    );
+    CREATE UNIQUE INDEX idx_listings_topic_item ON listings (topic, item_id);
+    CREATE TABLE imported_files (
+        path TEXT PRIMARY KEY,
+        imported_at REAL NOT NULL
+    );
+    """,
+    # אינדקסים משניים לחיפוש: מחיר מספרי, זמן גילוי ומילות הכתובת והכותרת
+    """
+    ALTER TABLE listings ADD COLUMN price INTEGER;
+    CREATE INDEX idx_listings_price ON listings (price);
+    CREATE INDEX idx_listings_first_seen ON listings (first_seen);
+    CREATE INDEX idx_listings_topic_seen ON listings (topic, first_seen);
+    CREATE INDEX idx_listings_topic_price ON listings (topic, price);
+    CREATE TABLE listing_tokens (
+        token TEXT NOT NULL,
+        listing_id INTEGER NOT NULL,
+        PRIMARY KEY (token, listing_id)
+    ) WITHOUT ROWID;
+    """,
+    lambda conn: _backfill_search_index(conn),
+    # אינדקס גלובלי: כל מודעה נשמרת פעם אחת, עם שיוך לכל הנושאים שבהם נמצאה
+    """
+    CREATE TABLE listings_global (
+        item_id TEXT NOT NULL,
+        data TEXT NOT NULL,
+        first_seen REAL NOT NULL,
+        price INTEGER
+    );
+    CREATE UNIQUE INDEX idx_listings_global_item ON listings_global (item_id);
+    INSERT OR IGNORE INTO listings_global (item_id, data, first_seen, price)
+        SELECT item_id, data, first_seen, price FROM listings ORDER BY first_seen, rowid;
+    CREATE TABLE memberships (
+        topic TEXT NOT NULL,
+        listing_id INTEGER NOT NULL,
+        first_seen REAL NOT NULL,
+        PRIMARY KEY (topic, listing_id)
+    ) WITHOUT ROWID;
+    INSERT OR IGNORE INTO memberships (topic, listing_id, first_seen)
+        SELECT old.topic, new.rowid, old.first_seen
+        FROM listings old JOIN listings_global new ON new.item_id = old.item_id;
+    DROP TABLE listings;
+    DROP TABLE listing_tokens;
+    DROP INDEX idx_listings_global_item;
+    ALTER TABLE listings_global RENAME TO listings;
+    CREATE UNIQUE INDEX idx_listings_item ON listings (item_id);
+    CREATE INDEX idx_listings_price ON listings (price);
+    CREATE INDEX idx_listings_first_seen ON listings (first_seen);
+    CREATE INDEX idx_memberships_listing ON memberships (listing_id);
+    CREATE INDEX idx_memberships_topic_seen ON memberships (topic, first_seen);
+    CREATE TABLE listing_tokens (
+        token TEXT NOT NULL,
+        listing_id INTEGER NOT NULL,
+        PRIMARY KEY (token, listing_id)
+    ) WITHOUT ROWID;
+    """,
+    lambda conn: _backfill_search_index(conn),
+    # גיבוב השדות של כל מודעה, לזיהוי שינויים (מחיר, כותרת וכו') במודעות מוכרות
+    """
+    ALTER TABLE listings ADD COLUMN fields_hash INTEGER;
+    """,
+    lambda conn: _backfill_fields_hash(conn),
+    # קטעי היסטוריה דחוסים. מודעה בקטע תקפה רק אם archived_items של הנושא מצביעה על הקטע
+    """
+    CREATE TABLE history_segments (
+        id INTEGER PRIMARY KEY,
+        topic TEXT NOT NULL,
+        created REAL NOT NULL,
+        first_seen_min REAL NOT NULL,
+        first_seen_max REAL NOT NULL,
+        price_min INTEGER,
+        price_max INTEGER,
+        item_count INTEGER NOT NULL,
+        data BLOB NOT NULL
+    );
+    CREATE INDEX idx_history_segments_topic ON history_segments (topic, first_seen_min);
+    CREATE TABLE archived_items (
+        topic TEXT NOT NULL,
+        item_id TEXT NOT NULL,
+        segment_id INTEGER NOT NULL,
+        fields_hash INTEGER,
+        PRIMARY KEY (topic, item_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX idx_archived_items_segment ON archived_items (segment_id);
+    """,
+    # מספר סידורי עולה לכל שיוך של מודעה לנושא, לקריאה מצטברת של מה שנשמר (פקודת since).
+    # המונה נשמר בנפרד, כך שמספר לא חוזר גם אחרי שהשיוך עבר להיסטוריה הדחוסה
+    """
+    ALTER TABLE memberships ADD COLUMN seq INTEGER;
+    CREATE TABLE sequences (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+    """,
+    lambda conn: _backfill_sequence(conn),
+    """
+    CREATE UNIQUE INDEX idx_memberships_seq ON memberships (seq);
+    """,
+    # המספר הסידורי נשמר גם למודעה שעברה להיסטוריה הדחוסה: since ממשיך להחזיר אותה, ומודעה
+    # ששוחזרה למאגר החם שומרת על המספר המקורי. במודעות שנדחסו לפני כן הערך ריק
+    """
+    ALTER TABLE archived_items ADD COLUMN seq INTEGER;
+    CREATE INDEX idx_archived_items_seq ON archived_items (seq);
+    """,
+]
+
+# מיון תוצאות החיפוש - כל מיון נקרא ישירות מאינדקס, כך ש-LIMIT עוצר מוקדם
+SEARCH_ORDER = {
+    'newest': 'l.first_seen DESC',
+    'oldest': 'l.first_seen ASC',
+    'price': 'l.price ASC',
+    '-price': 'l.price DESC',
+}
+
+# מילה (או נושא) שמופיעה בפחות מודעות מזה מסננת מראש דרך האינדקס שלה; ערך נפוץ נבדק לכל מודעה
+_SELECTIVE_ROWS = 2000
+
+_TOKEN_RE = re.compile(r'\w+')
+
+# מגבלת הפרמטרים של SQLite בשאילתת IN
+_QUERY_CHUNK = 500
+
+# דחיסה לקטעי היסטוריה נעשית רק כשהצטברו מספיק מודעות (כדי לא ליצור קטעים זעירים בכל סבב)
+_SEGMENT_MIN_ITEMS = 200
+_SEGMENT_MAX_ITEMS = 5000
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def item_key(item):
+    """מפתח המודעה באינדקס. למודעה ללא מזהה יש מפתח ריק (כמו בקבצי ה-JSON)"""
+    item_id = item.get('id')
+    return str(item_id) if item_id is not None else ''
+
+def search_tokens(text):
+    """מילות החיפוש שבטקסט (אותיות קטנות, ללא כפילויות)"""
+    return sorted({token.lower() for token in _TOKEN_RE.findall(text or '')})
+
+def _index_rows(items_with_rowids):
+    """שורות listing_tokens עבור (rowid, מודעה)"""
+    rows = []
+    for rowid, item in items_with_rowids:
+        for token in search_tokens(f"{item.get('address') or ''} {item.get('title') or ''}"):
+            rows.append((token, rowid))
+    return rows
+
+def _backfill_search_index(conn):
+    """מילוי המחיר ומילות החיפוש למודעות שנשמרו לפני הוספת האינדקסים"""
+    rows = conn.execute('SELECT rowid, data FROM listings').fetchall()
+    items = [(rowid, json.loads(data)) for rowid, data in rows]
+    conn.executemany(
+        'UPDATE listings SET price = ? WHERE rowid = ?',
+        [(parse_price(item.get('price')), rowid) for rowid, item in items]
+    )
+    conn.executemany('INSERT OR IGNORE INTO listing_tokens (token, listing_id) VALUES (?, ?)', _index_rows(items))
+
+def _encode_segment(entries):
+    """תוכן קטע היסטוריה: JSON lines של [מזהה, זמן גילוי, מודעה], דחוס ב-gzip"""
+    lines = (json.dumps([key, first_seen, item], ensure_ascii=False) for key, first_seen, item in entries)
+    return gzip.compress('\n'.join(lines).encode('utf-8'))
+
+def _decode_segment(blob):
+    """רשימת (מזהה, זמן גילוי, מילון מודעה) מתוך קטע היסטוריה"""
+    return [tuple(json.loads(line)) for line in gzip.decompress(blob).decode('utf-8').splitlines()]
+
+def _backfill_fields_hash(conn):
+    """חישוב גיבוב השדות למודעות שנשמרו לפני הוספת זיהוי השינויים"""
+    rows = conn.execute('SELECT rowid, data FROM listings').fetchall()
+    conn.executemany(
+        'UPDATE listings SET fields_hash = ? WHERE rowid = ?',
+        [(fields_hash(json.loads(data)), rowid) for rowid, data in rows]
+    )
+
+def _backfill_sequence(conn):
+    """מספור השיוכים הקיימים לפי זמן הגילוי, ואתחול המונה"""
+    rows = conn.execute('SELECT topic, listing_id FROM memberships ORDER BY first_seen, listing_id, topic').fetchall()
+    conn.executemany(
+        'UPDATE memberships SET seq = ? WHERE topic = ? AND listing_id = ?',
+        [(seq, topic, listing_id) for seq, (topic, listing_id) in enumerate(rows, 1)]
+    )
+    conn.execute("INSERT INTO sequences (name, value) VALUES ('memberships', ?)", (len(rows),))
+
+class ListingStore:
+    """מאגר מודעות לכל הנושאים, בקובץ SQLite יחיד במצב WAL"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._migrate()
+
+    def _migrate(self):
+        """החלת שינויי סכמה שטרם הוחלו"""
+        with self._lock:
+            version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+            for index, script in enumerate(MIGRATIONS[version:], start=version + 1):
+                with self._conn:
+                    if callable(script):
+                        script(self._conn)
+                    else:
+                        self._conn.executescript(script)
+                    self._conn.execute(f'PRAGMA user_version = {index}')
+
+    def close(self):
+        """סגירת החיבור למסד הנתונים"""
+        with self._lock:
+            self._conn.close()
+
+    def known_ids(self, topic, item_ids):
+        """החזרת קבוצת המזהים מתוך item_ids שכבר שמורים בנושא (כולל בהיסטוריה הדחוסה)"""
+        item_ids = set(item_ids)
+        known = set(self._known_rows(topic, item_ids))
+        return known | set(self._archived_rows(topic, item_ids - known))
+
+    def _known_rows(self, topic, item_ids):
+        """{מזהה: (rowid, גיבוב השדות)} למזהים מתוך item_ids שכבר שמורים בנושא"""
+        item_ids = list(item_ids)
+        known = {}
+
+        with self._lock:
+            for start in range(0, len(item_ids), _QUERY_CHUNK):
+                chunk = item_ids[start:start + _QUERY_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f'SELECT l.item_id, l.rowid, l.fields_hash FROM listings l WHERE l.item_id IN ({placeholders}) '
+                    'AND EXISTS (SELECT 1 FROM memberships m WHERE m.topic = ? AND m.listing_id = l.rowid)',
+                    chunk + [topic]
+                )
+                known.update((item_id, (rowid, stored_hash)) for item_id, rowid, stored_hash in rows)
+
+        return known
+
+    def _archived_rows(self, topic, item_ids):
+        """{מזהה: (קטע, גיבוב השדות)} למזהים מתוך item_ids שנמצאים בהיסטוריה הדחוסה של הנושא"""
+        item_ids = list(item_ids)
+        archived = {}
+
+        with self._lock:
+            for start in range(0, len(item_ids), _QUERY_CHUNK):
+                chunk = item_ids[start:start + _QUERY_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f'SELECT item_id, segment_id, fields_hash FROM archived_items WHERE topic = ? AND item_id IN ({placeholders})',
+                    [topic] + chunk
+                )
+                archived.update((item_id, (segment_id, stored_hash)) for item_id, segment_id, stored_hash in rows)
+
+        return archived
+
+    def is_known(self, topic, item, same_fields=False):
+        """בדיקה אם מודעה כבר שמורה בנושא (חיפוש יחיד באינדקס)
+
+        same_fields - המודעה נחשבת מוכרת רק אם גם השדות שלה לא השתנו (לפי הגיבוב).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT l.fields_hash FROM listings l CROSS JOIN memberships m ON m.listing_id = l.rowid '
+                'WHERE l.item_id = ? AND m.topic = ?', (item_key(item), topic)
+            ).fetchone()
+            if row is None:
+                row = self._conn.execute(
+                    'SELECT fields_hash FROM archived_items WHERE topic = ? AND item_id = ?', (topic, item_key(item))
+                ).fetchone()
+        if row is None:
+            return False
+        return not same_fields or row[0] == fields_hash(item)
+
+    def add_new_items(self, topic, items):
+        """שמירת המודעות שעדיין לא קיימות בנושא והחזרתן, לפי סדר הופעתן
+
+        מודעה שכבר שמורה בנושא אחר לא נשמרת שוב - רק משויכת גם לנושא הזה.
+        """
+        return self.apply_scan(topic, items)[0]
+
+    def apply_scan(self, topic, items, detect_changes=False, seen_at=None):
+        """שמירת תוצאות סריקה: מודעות חדשות נוספות, ובמצב detect_changes גם מודעות מוכרות
+        ששדותיהן השתנו מתעדכנות. seen_at - זמן הסריקה (ברירת מחדל עכשיו; בעיבוד מחדש מהארכיון
+        זמן הבקשה המקורית).
+
+        מוחזרים (מודעות חדשות, [(מודעה, {שדה: [ישן, חדש]})]). במודעות שלא השתנו - רוב המודעות
+        בכל סריקה - משווים רק את הגיבוב השמור. מודעה מההיסטוריה הדחוסה שהשתנתה חוזרת למאגר החם.
+        """
+        with self._lock:
+            with timed_stage('diff', topic):
+                keys = {item_key(item) for item in items}
+                known = self._known_rows(topic, keys)
+                archived = self._archived_rows(topic, keys - known.keys())
+                known.update((key, (None, stored_hash)) for key, (_, stored_hash) in archived.items())
+
+                new_items = []
+                seen = set(known)
+                for item in items:
+                    key = item_key(item)
+                    if key not in seen:
+                        seen.add(key)
+                        new_items.append(item)
+
+                changes = self._changed_items(topic, items, known, archived) if detect_changes and known else []
+
+            if new_items or changes:
+                with timed_stage('persist', topic), self._conn:
+                    if new_items:
+                        self._insert(topic, new_items, seen_at or time.time())
+                    if changes:
+                        changes = self._restore(topic, changes)
+                        self._update(changes)
+
+        return new_items, [(item, delta) for item, delta, _ in changes if delta]
+
+    def _changed_items(self, topic, items, known, archived):
+        """המודעות המוכרות שהגיבוב שלהן שונה מהשמור: [(מודעה, שינויים, rowid)]. לא כותב למאגר
+
+        known - {מזהה: (rowid, גיבוב שמור)} כפי שהוחזר מ-_known_rows (rowid הוא None למודעה
+        מההיסטוריה הדחוסה); archived - {מזהה: (קטע, גיבוב שמור)} מ-_archived_rows.
+        """
+        changes = []
+        checked = set()
+        segments = {}
+        for item in items:
+            key = item_key(item)
+            if key not in known or key in checked:
+                continue
+            checked.add(key)
+            rowid, stored_hash = known[key]
+            if stored_hash == fields_hash(item):
+                continue
+            if rowid is None:
+                segment_id = archived[key][0]
+                if segment_id not in segments:
+                    segments[segment_id] = {entry[0]: entry[1:] for entry in self._segment_entries(segment_id)}
+                first_seen, old = segments[segment_id][key]
+                # המודעה תשוחזר למאגר החם עם זמן הגילוי המקורי (ב-_restore)
+                rowid = ('archived', first_seen)
+            else:
+                old = json.loads(self._conn.execute('SELECT data FROM listings WHERE rowid = ?', (rowid,)).fetchone()[0])
+            # שינוי ריק (גיבוב שחושב אחרת בעבר) רק מרענן את הרשומה השמורה ולא מדווח
+            changes.append((item, field_changes(old, item), rowid))
+        return changes
+
+    def _restore(self, topic, changes):
+        """החזרת מודעות ששונו מההיסטוריה הדחוסה למאגר החם. מחזיר את changes עם rowid לכל מודעה.
+        יש לקרוא בתוך טרנזקציה"""
+        restored = []
+        for item, delta, rowid in changes:
+            if isinstance(rowid, tuple):
+                key = item_key(item)
+                segment_id, seq = self._conn.execute(
+                    'SELECT segment_id, seq FROM archived_items WHERE topic = ? AND item_id = ?', (topic, key)
+                ).fetchone()
+                self._insert(topic, [item], rowid[1], seq)
+                self._conn.execute('DELETE FROM archived_items WHERE topic = ? AND item_id = ?', (topic, key))
+                self._drop_segment_if_empty(segment_id)
+                rowid = self._conn.execute('SELECT rowid FROM listings WHERE item_id = ?', (key,)).fetchone()[0]
+            restored.append((item, delta, rowid))
+        return restored
+
+    def _update(self, changes):
+        """שמירת הגרסה החדשה של מודעות ששונו, כולל האינדקסים לחיפוש. יש לקרוא בתוך טרנזקציה"""
+        for item, _, rowid in changes:
+            self._conn.execute(
+                'UPDATE listings SET data = ?, price = ?, fields_hash = ? WHERE rowid = ?',
+                (json.dumps(as_dict(item), ensure_ascii=False), parse_price(item.get('price')), fields_hash(item), rowid)
+            )
+            self._conn.execute('DELETE FROM listing_tokens WHERE listing_id = ?', (rowid,))
+        self._conn.executemany(
+            'INSERT OR IGNORE INTO listing_tokens (token, listing_id) VALUES (?, ?)',
+            _index_rows([(rowid, item) for item, _, rowid in changes])
+        )
+
+    def _insert(self, topic, items, first_seen, restored_seq=None):
+        """שיוך מודעות לנושא - מודעה שלא נראתה באף נושא נשמרת (יחד עם האינדקסים לחיפוש).
+        restored_seq - המספר הסידורי המקורי של מודעה שחוזרת מההיסטוריה הדחוסה (ללא ערך - מוקצה
+        מספר חדש). מחזיר את מספר המודעות שנוספו לנושא. יש לקרוא בתוך טרנזקציה"""
+        inserted = []
+        added = 0
+        # המונה נקרא רק אחרי נעילת המסד לכתיבה - חיבור אחר (למשל סריקה מתהליך אחר) לא יכול
+        # להקצות את אותם מספרים בין הקריאה לכתיבה
+        if not self._conn.in_transaction:
+            self._conn.execute('BEGIN IMMEDIATE')
+        seq = self._sequence()
+        for item in items:
+            key = item_key(item)
+            cursor = self._conn.execute(
+                'INSERT OR IGNORE INTO listings (item_id, data, first_seen, price, fields_hash) VALUES (?, ?, ?, ?, ?)',
+                (key, json.dumps(as_dict(item), ensure_ascii=False), first_seen, parse_price(item.get('price')),
+                 fields_hash(item))
+            )
+            if cursor.rowcount:
+                listing_id = cursor.lastrowid
+                inserted.append((listing_id, item))
+            else:
+                listing_id = self._conn.execute('SELECT rowid FROM listings WHERE item_id = ?', (key,)).fetchone()[0]
+
+            added_row = self._conn.execute(
+                'INSERT INTO memberships (topic, listing_id, first_seen, seq) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (topic, listing_id) DO NOTHING',
+                (topic, listing_id, first_seen, seq + 1 if restored_seq is None else restored_seq)
+            ).rowcount
+            if restored_seq is None:
+                seq += added_row
+            added += added_row
+
+        self._conn.execute("UPDATE sequences SET value = ? WHERE name = 'memberships'", (seq,))
+        self._conn.executemany(
+            'INSERT OR IGNORE INTO listing_tokens (token, listing_id) VALUES (?, ?)', _index_rows(inserted)
+        )
+        return added
+
+    def _sequence(self):
+        """המספר הסידורי האחרון שהוקצה לשיוך"""
+        return self._conn.execute("SELECT value FROM sequences WHERE name = 'memberships'").fetchone()[0]
+
+    def since(self, cursor=0, topics=None, limit=100):
+        """המודעות ששויכו לנושא אחרי cursor (המספר הסידורי של השיוך), לפי סדר השמירה
+
+        מוחזרים ([(מספר סידורי, נושא, Listing, זמן גילוי)], cursor הבא). ה-cursor הבא הוא המספר
+        של השיוך האחרון שהוחזר אם התוצאות נחתכו ב-limit, ואחרת המספר האחרון שהוקצה - כך שהקריאה
+        הבאה לא עוברת שוב על שיוכים של נושאים אחרים, ו-cursor ממאגר אחר (גדול מהקיים) מתאפס.
+        מודעה שעברה להיסטוריה הדחוסה מוחזרת עם המספר המקורי שלה, כך שהדחיסה לא משמיטה מודעות
+        מקורא שה-cursor שלו ישן (מודעות שנדחסו לפני הוספת המספור לא מוחזרות).
+        """
+        hot_filter = archived_filter = ''
+        topic_params = []
+        if topics:
+            placeholders = ','.join('?' * len(topics))
+            hot_filter = f' AND m.topic IN ({placeholders})'
+            archived_filter = f' AND topic IN ({placeholders})'
+            topic_params = list(topics)
+        limit = max(1, int(limit))
+
+        with self._lock:
+            # המונה נקרא לפני השיוכים, והשאילתה מוגבלת אליו: שיוך שנכתב בין שתי הקריאות (מחיבור
+            # אחר) לא מוחזר, ולכן גם לא יידלג כשה-cursor הבא מתקדם עד latest
+            latest = self._sequence()
+            params = [cursor, latest] + topic_params + [limit]
+            rows = [(seq, topic, json.loads(data), first_seen) for seq, topic, data, first_seen in self._conn.execute(
+                'SELECT m.seq, m.topic, l.data, m.first_seen FROM memberships m '
+                'JOIN listings l ON l.rowid = m.listing_id '
+                f'WHERE m.seq > ? AND m.seq <= ?{hot_filter} ORDER BY m.seq LIMIT ?', params
+            )]
+            archived = self._conn.execute(
+                # מודעות שעברו להיסטוריה הדחוסה אחרי שנשמרו - התוכן נקרא מהקטע שלהן
+                'SELECT seq, topic, item_id, segment_id FROM archived_items '
+                f'WHERE seq > ? AND seq <= ?{archived_filter} ORDER BY seq LIMIT ?', params
+            ).fetchall()
+            segments = {}
+            for seq, topic, key, segment_id in archived:
+                if segment_id not in segments:
+                    blob = self._conn.execute('SELECT data FROM history_segments WHERE id = ?', (segment_id,)).fetchone()[0]
+                    segments[segment_id] = {entry[0]: entry[1:] for entry in _decode_segment(blob)}
+                first_seen, item = segments[segment_id][key]
+                rows.append((seq, topic, item, first_seen))
+
+        rows = sorted(rows, key=lambda row: row[0])[:limit]
+        next_cursor = rows[-1][0] if len(rows) == limit else latest
+        return [(seq, topic, Listing.from_dict(item), first_seen) for seq, topic, item, first_seen in rows], next_cursor
+
+    def _narrowing_condition(self, count_sql, count_params, in_sql, exists_sql):
+        """תנאי סינון לפי אינדקס משני: ערך נדיר מסנן מראש (IN), ערך נפוץ נבדק לכל מודעה (EXISTS),
+        כך שהמיון לפי האינדקס הראשי ו-LIMIT ממשיכים לעצור מוקדם"""
+        matches = self._conn.execute(
+            f'SELECT COUNT(*) FROM ({count_sql} LIMIT ?)', list(count_params) + [_SELECTIVE_ROWS]
+        ).fetchone()[0]
+        return in_sql if matches < _SELECTIVE_ROWS else exists_sql
+
+    def search(self, topics=None, min_price=None, max_price=None, since=None, text=None, order='newest', limit=20):
+        """חיפוש מודעות שמורות לפי האינדקסים המשניים
+
+        topics - רשימת נושאים (ללא ערך - כל הנושאים); min_price/max_price - טווח מחיר (₪);
+        since - זמן גילוי מינימלי (epoch); text - מילים שכולן מופיעות בכתובת או בכותרת;
+        order - newest, oldest, price או -price.
+        מוחזרת רשימת (הנושאים שבהם נמצאה המודעה, Listing, זמן גילוי ראשון). גם ההיסטוריה
+        הדחוסה נבדקת - רק בקטעים שטווחי הזמן והמחיר שלהם מתאימים לסינון.
+        """
+        conditions = []
+        params = []
+
+        if min_price is not None:
+            conditions.append('l.price >= ?')
+            params.append(min_price)
+        if max_price is not None:
+            conditions.append('l.price <= ?')
+            params.append(max_price)
+        if since is not None:
+            conditions.append('l.first_seen >= ?')
+            params.append(since)
+        if order not in SEARCH_ORDER:
+            order = 'newest'
+        if order in ('price', '-price'):
+            conditions.append('l.price IS NOT NULL')
+
+        with self._lock:
+            if topics:
+                placeholders = ','.join('?' * len(topics))
+                conditions.append(self._narrowing_condition(
+                    f'SELECT 1 FROM memberships WHERE topic IN ({placeholders})', topics,
+                    f'l.rowid IN (SELECT listing_id FROM memberships WHERE topic IN ({placeholders}))',
+                    f'EXISTS (SELECT 1 FROM memberships m WHERE m.topic IN ({placeholders}) AND m.listing_id = l.rowid)'
+                ))
+                params.extend(topics)
+            for token in search_tokens(text):
+                conditions.append(self._narrowing_condition(
+                    'SELECT 1 FROM listing_tokens WHERE token = ?', [token],
+                    'l.rowid IN (SELECT listing_id FROM listing_tokens WHERE token = ?)',
+                    'EXISTS (SELECT 1 FROM listing_tokens t WHERE t.token = ? AND t.listing_id = l.rowid)'
+                ))
+                params.append(token)
+
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+            query = ("SELECT (SELECT group_concat(topic, ', ') FROM memberships WHERE listing_id = l.rowid), "
+                     f'l.data, l.first_seen FROM listings l {where} '
+                     f'ORDER BY {SEARCH_ORDER[order]} LIMIT ?')
+            rows = self._conn.execute(query, params + [max(1, int(limit))]).fetchall()
+            archived = self._search_archived(topics, min_price, max_price, since, text, order == 'price' or order == '-price')
+
+        results = {}
+        for found_topics, data, first_seen in rows:
+            item = json.loads(data)
+            results[item_key(item)] = [found_topics.split(', ') if found_topics else [], item, first_seen]
+        for topic, first_seen, item in archived:
+            entry = results.setdefault(item_key(item), [[], item, first_seen])
+            if topic not in entry[0]:
+                entry[0].append(topic)
+
+        results = list(results.values())
+        if archived:
+            if order in ('price', '-price'):
+                results.sort(key=lambda entry: parse_price(entry[1].get('price')), reverse=order == '-price')
+            else:
+                results.sort(key=lambda entry: entry[2], reverse=order == 'newest')
+        return [(', '.join(found_topics), Listing.from_dict(item), first_seen)
+                for found_topics, item, first_seen in results[:max(1, int(limit))]]
+
+    def _search_archived(self, topics, min_price, max_price, since, text, priced_only):
+        """המודעות בהיסטוריה הדחוסה שמתאימות לסינון של search: [(נושא, זמן גילוי, מילון מודעה)]"""
+        tokens = set(search_tokens(text))
+        matches = []
+        for topic, first_seen, item in self._archived_entries(topics, min_price, max_price, since):
+            price = parse_price(item.get('price'))
+            if price is None and (priced_only or min_price is not None or max_price is not None):
+                continue
+            if (min_price is not None and price < min_price) or (max_price is not None and price > max_price):
+                continue
+            if since is not None and first_seen < since:
+                continue
+            if tokens and not tokens.issubset(search_tokens(f"{item.get('address') or ''} {item.get('title') or ''}")):
+                continue
+            matches.append((topic, first_seen, item))
+        return matches
+
+    def get_items(self, topic):
+        """כל המודעות השמורות בנושא (כרשומות Listing), לפי סדר השמירה - כולל ההיסטוריה הדחוסה"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT m.first_seen, l.data FROM memberships m JOIN listings l ON l.rowid = m.listing_id '
+                'WHERE m.topic = ? ORDER BY m.first_seen, l.rowid', (topic,)
+            ).fetchall()
+            entries = [(first_seen, item) for _, first_seen, item in self._archived_entries(topic)]
+        entries.extend((first_seen, json.loads(data)) for first_seen, data in rows)
+        entries.sort(key=lambda entry: entry[0])
+        return [Listing.from_dict(item) for _, item in entries]
+
+    def count(self, topic):
+        """מספר המודעות השמורות בנושא (כולל ההיסטוריה הדחוסה)"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT (SELECT COUNT(*) FROM memberships WHERE topic = ?) + '
+                '(SELECT COUNT(*) FROM archived_items WHERE topic = ?)', (topic, topic)
+            ).fetchone()[0]
+
+    def compact_history(self, topic, max_age_days=0, max_items=0):
+        """העברת ההיסטוריה הישנה של נושא לקטעים דחוסים
+
+        max_age_days - מודעות שנמצאו לפני יותר ימים מזה; max_items - מודעות מעבר ל-max_items
+        האחרונות שנמצאו בנושא (0 - ללא מגבלה). הסדר הוא לפי זמן הגילוי ואחריו לפי סדר ההוספה,
+        כך שבקבוצה שנמצאה באותו זמן (למשל ייבוא) נשארות בדיוק max_items מודעות.
+        ההעברה נעשית רק כשהצטברו לפחות _SEGMENT_MIN_ITEMS מודעות. מחזיר את מספר המודעות שהועברו.
+        """
+        conditions = []
+        params = [topic]
+        if max_age_days and max_age_days > 0:
+            conditions.append('m.first_seen < ?')
+            params.append(time.time() - max_age_days * 86400)
+        if max_items and max_items > 0:
+            conditions.append(
+                'm.listing_id IN (SELECT listing_id FROM memberships WHERE topic = ? '
+                'ORDER BY first_seen DESC, listing_id DESC LIMIT -1 OFFSET ?)'
+            )
+            params.extend([topic, int(max_items)])
+        if not conditions:
+            return 0
+
+        with self._lock:
+            where = f"m.topic = ? AND ({' OR '.join(conditions)})"
+            due = self._conn.execute(
+                f'SELECT COUNT(*) FROM (SELECT 1 FROM memberships m WHERE {where} LIMIT ?)', params + [_SEGMENT_MIN_ITEMS]
+            ).fetchone()[0]
+            if due < _SEGMENT_MIN_ITEMS:
+                return 0
+
+            with timed_stage('compact', topic):
+                rows = self._conn.execute(
+                    f'SELECT m.listing_id, m.first_seen, l.item_id, l.data, l.price, l.fields_hash, m.seq '
+                    f'FROM memberships m JOIN listings l ON l.rowid = m.listing_id WHERE {where} '
+                    'ORDER BY m.first_seen, l.rowid', params
+                ).fetchall()
+
+                with self._conn:
+                    for start in range(0, len(rows), _SEGMENT_MAX_ITEMS):
+                        self._write_segment(topic, rows[start:start + _SEGMENT_MAX_ITEMS])
+
+        print(f"{len(rows)} מודעות ישנות בנושא '{topic}' הועברו להיסטוריה הדחוסה.")
+        return len(rows)
+
+    def _write_segment(self, topic, rows):
+        """כתיבת קטע היסטוריה דחוס והסרת המודעות שבו מהמאגר החם. יש לקרוא בתוך טרנזקציה"""
+        prices = [row[4] for row in rows if row[4] is not None]
+        segment_id = self._conn.execute(
+            'INSERT INTO history_segments (topic, created, first_seen_min, first_seen_max, price_min, price_max, '
+            'item_count, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (topic, time.time(), rows[0][1], rows[-1][1], min(prices, default=None), max(prices, default=None),
+             len(rows), _encode_segment((key, first_seen, json.loads(data)) for _, first_seen, key, data, *_ in rows))
+        ).lastrowid
+
+        self._conn.executemany(
+            'INSERT OR REPLACE INTO archived_items (topic, item_id, segment_id, fields_hash, seq) VALUES (?, ?, ?, ?, ?)',
+            [(topic, key, segment_id, stored_hash, seq) for _, _, key, _, _, stored_hash, seq in rows]
+        )
+
+        listing_ids = [row[0] for row in rows]
+        for start in range(0, len(listing_ids), _QUERY_CHUNK):
+            chunk = listing_ids[start:start + _QUERY_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            self._conn.execute(f'DELETE FROM memberships WHERE topic = ? AND listing_id IN ({placeholders})', [topic] + chunk)
+
+            # מודעה שאינה משויכת עוד לאף נושא נמחקת מהמאגר החם (העותק שלה נשמר בקטע)
+            orphans = [row[0] for row in self._conn.execute(
+                f'SELECT rowid FROM listings WHERE rowid IN ({placeholders}) '
+                'AND NOT EXISTS (SELECT 1 FROM memberships m WHERE m.listing_id = listings.rowid)', chunk
+            )]
+            if orphans:
+                orphan_placeholders = ','.join('?' * len(orphans))
+                self._conn.execute(f'DELETE FROM listing_tokens WHERE listing_id IN ({orphan_placeholders})', orphans)
+                self._conn.execute(f'DELETE FROM listings WHERE rowid IN ({orphan_placeholders})', orphans)
+
+    def _drop_segment_if_empty(self, segment_id):
+        """מחיקת קטע שאף מודעה בו אינה תקפה עוד. יש לקרוא בתוך טרנזקציה"""
+        if not self._conn.execute('SELECT 1 FROM archived_items WHERE segment_id = ? LIMIT 1', (segment_id,)).fetchone():
+            self._conn.execute('DELETE FROM history_segments WHERE id = ?', (segment_id,))
+
+    def _segment_entries(self, segment_id):
+        """המודעות התקפות בקטע: [(מזהה, זמן גילוי, מילון מודעה)]"""
+        row = self._conn.execute('SELECT topic, data FROM history_segments WHERE id = ?', (segment_id,)).fetchone()
+        if row is None:
+            return []
+        live = {key for (key,) in self._conn.execute(
+            'SELECT item_id FROM archived_items WHERE topic = ? AND segment_id = ?', (row[0], segment_id)
+        )}
+        return [entry for entry in _decode_segment(row[1]) if entry[0] in live]
+
+    def _archived_entries(self, topics=None, min_price=None, max_price=None, since=None):
+        """המודעות שבהיסטוריה הדחוסה: (נושא, זמן גילוי, מילון מודעה). קטעים שלפי הטווחים
+        השמורים שלהם (זמן ומחיר) לא יכולים להתאים לסינון לא נפתחים כלל"""
+        conditions = []
+        params = []
+        if isinstance(topics, str):
+            topics = [topics]
+        if topics:
+            conditions.append(f"topic IN ({','.join('?' * len(topics))})")
+            params.extend(topics)
+        if min_price is not None:
+            conditions.append('price_max >= ?')
+            params.append(min_price)
+        if max_price is not None:
+            conditions.append('price_min <= ?')
+            params.append(max_price)
+        if since is not None:
+            conditions.append('first_seen_max >= ?')
+            params.append(since)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        segments = self._conn.execute(
+            f'SELECT id, topic FROM history_segments {where} ORDER BY first_seen_min, id', params
+        ).fetchall()
+        for segment_id, topic in segments:
+            for _, first_seen, item in self._segment_entries(segment_id):
+                yield topic, first_seen, item
+
+    def import_legacy_json(self, topic, file_path):
+        """ייבוא חד-פעמי של קובץ JSON ישן של נושא למאגר"""
+        if not os.path.exists(file_path):
+            return 0
+
+        abs_path = os.path.abspath(file_path)
+        with self._lock:
+            if self._conn.execute('SELECT 1 FROM imported_files WHERE path = ?', (abs_path,)).fetchone():
+                return 0
+
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    saved_items = json.load(f)
+            except Exception as e:
+                print(f"שגיאה בקריאת קובץ {file_path}: {e}")
+                return 0
+
+            now = time.time()
+            with self._conn:
+                imported = self._insert(topic, saved_items, now)
+                self._conn.execute(
+                    'INSERT INTO imported_files (path, imported_at) VALUES (?, ?)', (abs_path, now)
+                )
+
+        print(f"יובאו {imported} מודעות מהקובץ {file_path} למאגר.")
+        return imported
+
+def get_store(config):
+    """קבלת המאגר של תיקיית הנתונים (נפתח פעם אחת לכל תהליך)"""
+    data_dir = config.get('data_dir', 'data')
+    path = os.path.abspath(os.path.join(data_dir, DB_FILE))
+
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            os.makedirs(data_dir, exist_ok=True)
+            store = ListingStore(path)
+            _stores[path] = store
+        return store
+
+def legacy_json_path(topic, config):
+    """הנתיב של קובץ ה-JSON הישן של נושא"""
+    return os.path.join(config.get('data_dir', 'data'), f"{topic.replace(' ', '_')}.json")